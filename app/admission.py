@@ -0,0 +1,177 @@
+import math
+import time
+import asyncio
+import threading
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+
+from app.metrics import ADMISSION_IN_FLIGHT, ADMISSION_QUEUED, ADMISSION_REJECTED, ADMISSION_WAIT
+
+
+class Overloaded(RuntimeError):
+    """A request was turned away by admission control.
+
+    status is 429 when the wait queue was full and 503 when the request waited
+    queue_timeout seconds without getting a slot; retry_after is a hint in seconds.
+    """
+
+    def __init__(self, name, reason, retry_after):
+        super().__init__(f"{name} is overloaded ({reason.replace('_', ' ')}), retry in {retry_after}s")
+        self.reason = reason
+        self.status = 429 if reason == "queue_full" else 503
+        self.retry_after = retry_after
+
+
+class _Admission:
+    """Bookkeeping shared by the thread and asyncio admission controllers.
+
+    At most max_in_flight requests run at once, up to max_queue more wait for a slot
+    (priority waiters first, FIFO otherwise) and everything beyond that is rejected
+    right away. A freed slot is handed straight to the next waiter so new arrivals
+    can't jump the queue. Limits are per process.
+    """
+
+    def __init__(self, name, max_in_flight, max_queue, queue_timeout):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._queues = {True: deque(), False: deque()}  # priority -> waiters
+        # Moving average of how long a slot is held, for Retry-After
+        self._service_time = 1.0
+
+    @property
+    def queued(self):
+        return len(self._queues[True]) + len(self._queues[False])
+
+    def _retry_after(self):
+        waves = (self.queued + 1) / max(1, self.max_in_flight)
+        return max(1, math.ceil(waves * self._service_time))
+
+    def _reject(self, reason):
+        ADMISSION_REJECTED.labels(self.name, reason).inc()
+        raise Overloaded(self.name, reason, self._retry_after())
+
+    def _admit_now(self):
+        """Take a free slot if there is one and nobody is waiting for it."""
+        if self.in_flight < self.max_in_flight and not self.queued:
+            self.in_flight += 1
+            ADMISSION_IN_FLIGHT.labels(self.name).inc()
+            return True
+        if self.queued >= self.max_queue:
+            self._reject("queue_full")
+        return False
+
+    def _next_waiter(self):
+        for priority in (True, False):
+            if self._queues[priority]:
+                ADMISSION_QUEUED.labels(self.name).dec()
+                return self._queues[priority].popleft()
+        return None
+
+    def _enqueue(self, waiter, priority):
+        self._queues[priority].append(waiter)
+        ADMISSION_QUEUED.labels(self.name).inc()
+
+    def _dequeue(self, waiter, priority):
+        self._queues[priority].remove(waiter)
+        ADMISSION_QUEUED.labels(self.name).dec()
+
+    def _finished(self, held):
+        self._service_time += 0.1 * (held - self._service_time)
+
+
+class AdmissionController(_Admission):
+    """Bounded concurrency with a short wait queue, for threaded servers."""
+
+    def __init__(self, name, max_in_flight, max_queue, queue_timeout):
+        super().__init__(name, max_in_flight, max_queue, queue_timeout)
+        self._lock = threading.Lock()
+
+    def acquire(self, priority=False, timeout=None):
+        """Block until a slot is free; raises Overloaded when the queue is full or the wait times out."""
+        started = time.monotonic()
+        timeout = self.queue_timeout if timeout is None else min(timeout, self.queue_timeout)
+        with self._lock:
+            if self._admit_now():
+                ADMISSION_WAIT.labels(self.name, str(priority).lower()).observe(0.0)
+                return
+            granted = threading.Event()
+            self._enqueue(granted, priority)
+
+        if not granted.wait(timeout):
+            with self._lock:
+                # The slot may have been handed over between the timeout and taking the lock
+                if not granted.is_set():
+                    self._dequeue(granted, priority)
+                    self._reject("queue_timeout")
+        ADMISSION_WAIT.labels(self.name, str(priority).lower()).observe(time.monotonic() - started)
+
+    def release(self, held=None):
+        with self._lock:
+            if held is not None:
+                self._finished(held)
+            waiter = self._next_waiter()
+            if waiter is not None:
+                waiter.set()
+            else:
+                self.in_flight -= 1
+                ADMISSION_IN_FLIGHT.labels(self.name).dec()
+
+    @contextmanager
+    def slot(self, priority=False, timeout=None):
+        self.acquire(priority, timeout)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+
+class AsyncAdmissionController(_Admission):
+    """asyncio counterpart of AdmissionController, for one event loop."""
+
+    async def acquire(self, priority=False, timeout=None):
+        started = time.monotonic()
+        timeout = self.queue_timeout if timeout is None else min(timeout, self.queue_timeout)
+        if self._admit_now():
+            ADMISSION_WAIT.labels(self.name, str(priority).lower()).observe(0.0)
+            return
+        granted = asyncio.get_running_loop().create_future()
+        self._enqueue(granted, priority)
+        try:
+            await asyncio.wait_for(asyncio.shield(granted), timeout)
+        except asyncio.CancelledError:
+            if granted.done():
+                # Handed a slot just as the client went away: pass it on
+                self.release()
+            else:
+                granted.cancel()
+                self._dequeue(granted, priority)
+            raise
+        except asyncio.TimeoutError:
+            if not granted.done():
+                granted.cancel()
+                self._dequeue(granted, priority)
+                self._reject("queue_timeout")
+        ADMISSION_WAIT.labels(self.name, str(priority).lower()).observe(time.monotonic() - started)
+
+    def release(self, held=None):
+        if held is not None:
+            self._finished(held)
+        waiter = self._next_waiter()
+        if waiter is not None:
+            waiter.set_result(None)
+        else:
+            self.in_flight -= 1
+            ADMISSION_IN_FLIGHT.labels(self.name).dec()
+
+    @asynccontextmanager
+    async def slot(self, priority=False, timeout=None):
+        await self.acquire(priority, timeout)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
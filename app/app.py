@@ -1,22 +1,54 @@
-from flask import Flask, request, jsonify, Response
-import uuid, logging
-from app.rag import rag, initialize_rag_components
-from app.db import save_conversation, save_feedback
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from flask import Flask, request, jsonify, Response, stream_with_context
+import os, uuid, logging, json, threading
+from app.rag import rag, rag_stream, rag_batch, likely_cached, startup_with_retry, readiness, READY
+from app.config_loader import (BATCH_MAX_QUESTIONS, BATCH_DEADLINE, RAG_DEADLINE, ADMISSION_MAX_IN_FLIGHT,
+                               ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT, ADMISSION_PRIORITIZE_CACHED,
+                               ADMISSION_BATCH_MAX_IN_FLIGHT)
+from app.admission import AdmissionController, Overloaded
+from app.resilience import Deadline, DeadlineExceeded, CircuitOpenError
+from app.write_behind import enqueue_conversation, enqueue_feedback
+from app.metrics import REQUEST_COUNT, REQUEST_LATENCY, FEEDBACK_COUNT, LLM_TIME_TO_FIRST_TOKEN, metrics_payload
 import time
 
 app = Flask(__name__)
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 
-# Prometheus metrics
-REQUEST_COUNT = Counter("api_requests_total", "Total API requests", ["endpoint", "method", "status"])
-REQUEST_LATENCY = Histogram("api_request_latency_seconds", "Request latency in seconds", ["endpoint"])
-FEEDBACK_COUNT = Counter("feedback_total", "Feedback counts", ["feedback"])
+# Bounds how many requests run the RAG pipeline at once; the rest queue briefly or are turned away
+rag_admission = AdmissionController("rag", ADMISSION_MAX_IN_FLIGHT, ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT)
+# A batch makes up to BATCH_LLM_CONCURRENCY LLM calls at once, so batches have their own, smaller limit
+batch_admission = AdmissionController("rag_batch", ADMISSION_BATCH_MAX_IN_FLIGHT, ADMISSION_MAX_QUEUE,
+                                      ADMISSION_QUEUE_TIMEOUT)
+
+def not_ready():
+    """503 returned while the worker is still starting up."""
+    return jsonify({'error': 'Service is starting up'}), 503, {'Retry-After': '5'}
+
+def overloaded(endpoint, e):
+    """429 (queue full) or 503 (queue timeout) with Retry-After for a request admission control turned away."""
+    REQUEST_COUNT.labels(endpoint, "POST", str(e.status)).inc()
+    logging.warning(f"Rejected {endpoint}: {e}")
+    return jsonify({'error': str(e)}), e.status, {'Retry-After': str(e.retry_after)}
+
+def admission_priority(question):
+    """Questions likely to be answered from the cache are cheap, so they skip ahead in the queue."""
+    return ADMISSION_PRIORITIZE_CACHED and likely_cached(question)
+
+@app.route('/healthz')
+def healthz():
+    """Liveness: the process is up and serving HTTP."""
+    return jsonify({'status': 'ok'})
+
+@app.route('/readyz')
+def readyz():
+    """Readiness: components are loaded and warmed up."""
+    ready, details = readiness()
+    return jsonify({'ready': ready, **details}), 200 if ready else 503
 
 @app.route('/metrics')
 def metrics():
     """Expose Prometheus metrics."""
-    return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
+    payload, content_type = metrics_payload()
+    return Response(payload, mimetype=content_type)
 
 @app.route('/ask', methods=['POST'])
 def ask():
@@ -27,21 +59,139 @@ def ask():
         REQUEST_COUNT.labels("/ask", "POST", "400").inc()
         return jsonify({'error': 'Question is required'}), 400
 
+    if not READY.is_set():
+        REQUEST_COUNT.labels("/ask", "POST", "503").inc()
+        return not_ready()
+
     conversation_id = str(uuid.uuid4())
+    deadline = Deadline(RAG_DEADLINE)
     try:
-        initialize_rag_components
-        answer = rag(question)
-        save_conversation(conversation_id, question, answer)
+        with rag_admission.slot(admission_priority(question), deadline.remaining()):
+            answer = rag(question, deadline)
+        enqueue_conversation(conversation_id, question, answer)
         latency = time.time() - start
         REQUEST_COUNT.labels("/ask", "POST", "200").inc()
         REQUEST_LATENCY.labels("/ask").observe(latency)
 
         return jsonify({'conversation_id': conversation_id, 'question': question, 'answer': answer})
+    except Overloaded as e:
+        return overloaded("/ask", e)
+    except DeadlineExceeded as e:
+        REQUEST_COUNT.labels("/ask", "POST", "504").inc()
+        logging.error(f"Error: {e}")
+        return jsonify({'error': str(e)}), 504
+    except CircuitOpenError as e:
+        REQUEST_COUNT.labels("/ask", "POST", "503").inc()
+        logging.error(f"Error: {e}")
+        return jsonify({'error': str(e)}), 503, {'Retry-After': str(max(1, round(e.retry_after)))}
     except Exception as e:
         REQUEST_COUNT.labels("/ask", "POST", "500").inc()
         logging.error(f"Error: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/ask/batch', methods=['POST'])
+def ask_batch():
+    """Answer a list of questions with batched retrieval; conversations go through the write-behind queue."""
+    start = time.time()
+    data = request.get_json()
+    questions = data.get('questions')
+    if not isinstance(questions, list) or not questions or not all(isinstance(q, str) and q for q in questions):
+        REQUEST_COUNT.labels("/ask/batch", "POST", "400").inc()
+        return jsonify({'error': 'questions must be a non-empty list of strings'}), 400
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        REQUEST_COUNT.labels("/ask/batch", "POST", "400").inc()
+        return jsonify({'error': f'At most {BATCH_MAX_QUESTIONS} questions per batch'}), 400
+
+    if not READY.is_set():
+        REQUEST_COUNT.labels("/ask/batch", "POST", "503").inc()
+        return not_ready()
+
+    deadline = Deadline(BATCH_DEADLINE)
+    try:
+        with batch_admission.slot(timeout=deadline.remaining()):
+            results = rag_batch(questions, deadline=deadline)
+        items = []
+        for question, result in zip(questions, results):
+            item = {'question': question, **result}
+            if 'answer' in result:
+                item['conversation_id'] = str(uuid.uuid4())
+                # Queued like /ask, so a slow or failing database can't throw the answers away
+                enqueue_conversation(item['conversation_id'], question, result['answer'])
+            items.append(item)
+        REQUEST_COUNT.labels("/ask/batch", "POST", "200").inc()
+        REQUEST_LATENCY.labels("/ask/batch").observe(time.time() - start)
+
+        return jsonify({'results': items})
+    except Overloaded as e:
+        return overloaded("/ask/batch", e)
+    except Exception as e:
+        REQUEST_COUNT.labels("/ask/batch", "POST", "500").inc()
+        logging.error(f"Error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+def sse(data, event=None):
+    """Format one Server-Sent Event."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+def stream_error(e):
+    """(status, SSE error payload) for an error raised mid-stream, mapped like /ask maps it."""
+    if isinstance(e, DeadlineExceeded):
+        return 504, {'error': str(e), 'status': 504, 'reason': 'deadline_exceeded'}
+    if isinstance(e, CircuitOpenError):
+        return 503, {'error': str(e), 'status': 503, 'reason': 'circuit_open',
+                     'retry_after': max(1, round(e.retry_after))}
+    return 500, {'error': str(e), 'status': 500, 'reason': 'internal'}
+
+@app.route('/ask/stream', methods=['POST'])
+def ask_stream():
+    """Like /ask, but streams the answer as Server-Sent Events while it is generated."""
+    start = time.time()
+    data = request.get_json()
+    question = data.get('question')
+    if not question:
+        REQUEST_COUNT.labels("/ask/stream", "POST", "400").inc()
+        return jsonify({'error': 'Question is required'}), 400
+
+    if not READY.is_set():
+        REQUEST_COUNT.labels("/ask/stream", "POST", "503").inc()
+        return not_ready()
+
+    deadline = Deadline(RAG_DEADLINE)
+    try:
+        rag_admission.acquire(admission_priority(question), deadline.remaining())
+    except Overloaded as e:
+        return overloaded("/ask/stream", e)
+    admitted = time.time()
+    conversation_id = str(uuid.uuid4())
+
+    def generate():
+        yield sse({'conversation_id': conversation_id, 'question': question}, event="start")
+        parts = []
+        try:
+            for text in rag_stream(question, deadline):
+                if not parts:
+                    LLM_TIME_TO_FIRST_TOKEN.labels("/ask/stream").observe(time.time() - start)
+                parts.append(text)
+                yield sse({'token': text})
+        except Exception as e:
+            status, payload = stream_error(e)
+            REQUEST_COUNT.labels("/ask/stream", "POST", str(status)).inc()
+            logging.error(f"Error: {e}")
+            yield sse(payload, event="error")
+            return
+
+        answer = "".join(parts).strip()
+        enqueue_conversation(conversation_id, question, answer)
+        REQUEST_COUNT.labels("/ask/stream", "POST", "200").inc()
+        REQUEST_LATENCY.labels("/ask/stream").observe(time.time() - start)
+        yield sse({'answer': answer}, event="done")
+
+    response = Response(stream_with_context(generate()), mimetype="text/event-stream")
+    # The slot is held until the stream is closed, whether it finished or the client went away
+    response.call_on_close(lambda: rag_admission.release(time.time() - admitted))
+    return response
+
 @app.route('/feedback', methods=['POST'])
 def feedback():
     start = time.time()
@@ -54,17 +204,32 @@ def feedback():
         return jsonify({'error': 'Feedback must be +1 or -1'}), 400
 
     try:
-        save_feedback(conversation_id, feedback_value)
+        enqueue_feedback(conversation_id, feedback_value)
         FEEDBACK_COUNT.labels(str(feedback_value)).inc()
         latency = time.time() - start
         REQUEST_COUNT.labels("/feedback", "POST", "200").inc()
         REQUEST_LATENCY.labels("/feedback").observe(latency)
 
         return jsonify({'message': 'Feedback recorded'})
+    except ValueError as e:
+        REQUEST_COUNT.labels("/feedback", "POST", "400").inc()
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         REQUEST_COUNT.labels("/feedback", "POST", "500").inc()
         logging.error(f"Error saving feedback: {e}")
         return jsonify({'error': str(e)}), 500
 
+def start_components():
+    """Load and warm up components in the background; /readyz reports when they are done."""
+    threading.Thread(target=startup_with_retry, name="rag-startup", daemon=True).start()
+
+def create_app():
+    """App factory for WSGI servers, e.g. gunicorn 'app.app:create_app()'."""
+    start_components()
+    return app
+
 if __name__ == '__main__':
+    # The debug reloader runs this file twice; only its child process (WERKZEUG_RUN_MAIN) serves requests
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_components()
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -0,0 +1,112 @@
+"""Prebuilt artifact bundle for fast worker start-up.
+
+    python -m app.artifacts
+
+writes the parsed corpus, its embedding matrix and (for Qdrant) a collection
+snapshot to ARTIFACT_PATH. Workers load the bundle instead of parsing the CSV
+and embedding the corpus; a bundle built from a different CSV or model is ignored.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+
+import numpy as np
+
+from app.config_loader import (DATA_PATH, MODEL, EMBEDDING_DIMENSIONALITY, COLLECTION_NAME, ARTIFACT_PATH,
+                               SEARCH_BACKEND, QDRANT_SNAPSHOT_DIR)
+
+MANIFEST = "manifest.json"
+DOCUMENTS = "documents.json"
+VECTORS = "vectors.npy"
+
+
+class Bundle:
+    def __init__(self, documents, vectors, manifest):
+        self.documents = documents
+        self.vectors = vectors
+        self.manifest = manifest
+
+
+def file_sha1(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def build_artifacts(path=ARTIFACT_PATH, data_path=DATA_PATH, snapshot=SEARCH_BACKEND == "qdrant"):
+    """Parse the CSV, embed it and write the bundle (plus a Qdrant snapshot when requested)."""
+    from app.get_data import load_data, document_text, collection_version, create_collection_and_upsert
+    from app.embedding_store import embed_documents
+
+    os.makedirs(path, exist_ok=True)
+    documents = load_data(data_path)
+    vectors = np.vstack(embed_documents([document_text(doc) for doc in documents])).astype(np.float32)
+
+    manifest = {
+        "model": MODEL,
+        "dim": EMBEDDING_DIMENSIONALITY,
+        "data_sha1": file_sha1(data_path),
+        "collection_version": collection_version(documents),
+        "count": len(documents),
+        "created_at": time.time(),
+        "snapshot": None,
+    }
+    if snapshot:
+        client = create_collection_and_upsert(documents)
+        manifest["snapshot"] = client.create_snapshot(collection_name=COLLECTION_NAME).name
+
+    with open(os.path.join(path, DOCUMENTS), "w") as f:
+        json.dump(documents, f, default=str)
+    np.save(os.path.join(path, VECTORS), vectors)
+    # Manifest last: a bundle without one is treated as incomplete
+    with open(os.path.join(path, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    logging.info(f"Wrote artifact bundle with {len(documents)} documents to {path}")
+    return manifest
+
+
+def load_artifacts(path=ARTIFACT_PATH, data_path=DATA_PATH):
+    """Return the Bundle, or None when it is missing or was built from another CSV or model."""
+    manifest_path = os.path.join(path, MANIFEST)
+    if not os.path.exists(manifest_path):
+        logging.info(f"No artifact bundle at {path}")
+        return None
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+
+    if manifest.get("model") != MODEL or manifest.get("dim") != EMBEDDING_DIMENSIONALITY:
+        logging.warning("Artifact bundle was built for another embedding model, ignoring it")
+        return None
+    if os.path.exists(data_path) and manifest.get("data_sha1") != file_sha1(data_path):
+        logging.warning("Artifact bundle is older than the recipe CSV, ignoring it")
+        return None
+
+    with open(os.path.join(path, DOCUMENTS)) as f:
+        documents = json.load(f)
+    vectors = np.load(os.path.join(path, VECTORS), mmap_mode="r")
+    logging.info(f"Loaded artifact bundle with {len(documents)} documents from {path}")
+    return Bundle(documents, vectors, manifest)
+
+
+def restore_collection(client, bundle, collection_name=COLLECTION_NAME):
+    """Recover a missing Qdrant collection from the bundle's snapshot. Returns True on success."""
+    name = bundle.manifest.get("snapshot")
+    if not name or client.collection_exists(collection_name=collection_name):
+        return False
+    location = f"file://{os.path.join(QDRANT_SNAPSHOT_DIR, collection_name, name)}"
+    try:
+        client.recover_snapshot(collection_name=collection_name, location=location)
+        logging.info(f"Restored collection {collection_name} from snapshot {name}")
+        return True
+    except Exception as e:
+        logging.warning(f"Could not restore snapshot {location}: {e}")
+        return False
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    print(json.dumps(build_artifacts(), indent=2))
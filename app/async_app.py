@@ -0,0 +1,284 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from quart import Quart, request, jsonify, Response
+
+from app.rag import arag, arag_stream, arag_batch, likely_cached, startup_with_retry, readiness, READY
+from app.config_loader import (BATCH_MAX_QUESTIONS, BATCH_DEADLINE, RAG_DEADLINE, ADMISSION_MAX_IN_FLIGHT,
+                               ADMISSION_MAX_QUEUE, ADMISSION_QUEUE_TIMEOUT, ADMISSION_PRIORITIZE_CACHED,
+                               ADMISSION_BATCH_MAX_IN_FLIGHT)
+from app.admission import AsyncAdmissionController, Overloaded
+from app.resilience import Deadline, DeadlineExceeded, CircuitOpenError
+from app.write_behind import enqueue_conversation, enqueue_feedback, flush_writes
+from app.metrics import REQUEST_COUNT, REQUEST_LATENCY, FEEDBACK_COUNT, LLM_TIME_TO_FIRST_TOKEN, metrics_payload
+
+# Threads used for embedding and vector search so they never block the event loop
+RAG_THREADS = int(os.getenv("RAG_THREADS", 8))
+
+# Bounds how many requests run the RAG pipeline at once; the rest queue briefly or are turned away
+rag_admission = AsyncAdmissionController("rag", ADMISSION_MAX_IN_FLIGHT, ADMISSION_MAX_QUEUE,
+                                         ADMISSION_QUEUE_TIMEOUT)
+# A batch makes up to BATCH_LLM_CONCURRENCY LLM calls at once, so batches have their own, smaller limit
+batch_admission = AsyncAdmissionController("rag_batch", ADMISSION_BATCH_MAX_IN_FLIGHT, ADMISSION_MAX_QUEUE,
+                                           ADMISSION_QUEUE_TIMEOUT)
+
+app = Quart(__name__)
+logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+
+@app.before_serving
+async def start_components():
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=RAG_THREADS, thread_name_prefix="rag"))
+    # Not awaited: /healthz and /readyz answer while components load and warm up
+    loop.run_in_executor(None, startup_with_retry)
+
+
+@app.after_serving
+async def shutdown():
+    await asyncio.get_running_loop().run_in_executor(None, flush_writes)
+
+
+def not_ready():
+    """503 returned while the worker is still starting up."""
+    return jsonify({'error': 'Service is starting up'}), 503, {'Retry-After': '5'}
+
+
+def overloaded(endpoint, e):
+    """429 (queue full) or 503 (queue timeout) with Retry-After for a request admission control turned away."""
+    REQUEST_COUNT.labels(endpoint, "POST", str(e.status)).inc()
+    logging.warning(f"Rejected {endpoint}: {e}")
+    return jsonify({'error': str(e)}), e.status, {'Retry-After': str(e.retry_after)}
+
+
+def admission_priority(question):
+    """Questions likely to be answered from the cache are cheap, so they skip ahead in the queue."""
+    return ADMISSION_PRIORITIZE_CACHED and likely_cached(question)
+
+
+class CloseCallbackBody:
+    """Async iterator over a response body that calls on_close exactly once when Quart closes it.
+
+    Quart has no call_on_close, and the finally of an async generator never runs if the
+    generator wasn't started, e.g. when the client went away before the first chunk.
+    """
+
+    def __init__(self, body, on_close):
+        self._body = body
+        self._on_close = on_close
+        self._closed = False
+
+    def __aiter__(self):
+        return self
+
+    def __anext__(self):
+        return self._body.__anext__()
+
+    async def aclose(self):
+        try:
+            await self._body.aclose()
+        finally:
+            if not self._closed:
+                self._closed = True
+                self._on_close()
+
+
+@app.route('/healthz')
+async def healthz():
+    """Liveness: the process is up and serving HTTP."""
+    return jsonify({'status': 'ok'})
+
+
+@app.route('/readyz')
+async def readyz():
+    """Readiness: components are loaded and warmed up."""
+    ready, details = readiness()
+    return jsonify({'ready': ready, **details}), 200 if ready else 503
+
+
+@app.route('/metrics')
+async def metrics():
+    """Expose Prometheus metrics."""
+    payload, content_type = metrics_payload()
+    return Response(payload, mimetype=content_type)
+
+
+@app.route('/ask', methods=['POST'])
+async def ask():
+    start = time.time()
+    data = await request.get_json()
+    question = data.get('question')
+    if not question:
+        REQUEST_COUNT.labels("/ask", "POST", "400").inc()
+        return jsonify({'error': 'Question is required'}), 400
+
+    if not READY.is_set():
+        REQUEST_COUNT.labels("/ask", "POST", "503").inc()
+        return not_ready()
+
+    conversation_id = str(uuid.uuid4())
+    deadline = Deadline(RAG_DEADLINE)
+    try:
+        async with rag_admission.slot(admission_priority(question), deadline.remaining()):
+            answer = await arag(question, deadline)
+        enqueue_conversation(conversation_id, question, answer)
+        REQUEST_COUNT.labels("/ask", "POST", "200").inc()
+        REQUEST_LATENCY.labels("/ask").observe(time.time() - start)
+
+        return jsonify({'conversation_id': conversation_id, 'question': question, 'answer': answer})
+    except Overloaded as e:
+        return overloaded("/ask", e)
+    except DeadlineExceeded as e:
+        REQUEST_COUNT.labels("/ask", "POST", "504").inc()
+        logging.error(f"Error: {e}")
+        return jsonify({'error': str(e)}), 504
+    except CircuitOpenError as e:
+        REQUEST_COUNT.labels("/ask", "POST", "503").inc()
+        logging.error(f"Error: {e}")
+        return jsonify({'error': str(e)}), 503, {'Retry-After': str(max(1, round(e.retry_after)))}
+    except Exception as e:
+        REQUEST_COUNT.labels("/ask", "POST", "500").inc()
+        logging.error(f"Error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/ask/batch', methods=['POST'])
+async def ask_batch():
+    """Answer a list of questions with batched retrieval; conversations go through the write-behind queue."""
+    start = time.time()
+    data = await request.get_json()
+    questions = data.get('questions')
+    if not isinstance(questions, list) or not questions or not all(isinstance(q, str) and q for q in questions):
+        REQUEST_COUNT.labels("/ask/batch", "POST", "400").inc()
+        return jsonify({'error': 'questions must be a non-empty list of strings'}), 400
+    if len(questions) > BATCH_MAX_QUESTIONS:
+        REQUEST_COUNT.labels("/ask/batch", "POST", "400").inc()
+        return jsonify({'error': f'At most {BATCH_MAX_QUESTIONS} questions per batch'}), 400
+
+    if not READY.is_set():
+        REQUEST_COUNT.labels("/ask/batch", "POST", "503").inc()
+        return not_ready()
+
+    deadline = Deadline(BATCH_DEADLINE)
+    try:
+        async with batch_admission.slot(timeout=deadline.remaining()):
+            results = await arag_batch(questions, deadline=deadline)
+        items = []
+        for question, result in zip(questions, results):
+            item = {'question': question, **result}
+            if 'answer' in result:
+                item['conversation_id'] = str(uuid.uuid4())
+                # Queued like /ask, so a slow or failing database can't throw the answers away
+                enqueue_conversation(item['conversation_id'], question, result['answer'])
+            items.append(item)
+        REQUEST_COUNT.labels("/ask/batch", "POST", "200").inc()
+        REQUEST_LATENCY.labels("/ask/batch").observe(time.time() - start)
+
+        return jsonify({'results': items})
+    except Overloaded as e:
+        return overloaded("/ask/batch", e)
+    except Exception as e:
+        REQUEST_COUNT.labels("/ask/batch", "POST", "500").inc()
+        logging.error(f"Error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+def sse(data, event=None):
+    """Format one Server-Sent Event."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+def stream_error(e):
+    """(status, SSE error payload) for an error raised mid-stream, mapped like /ask maps it."""
+    if isinstance(e, DeadlineExceeded):
+        return 504, {'error': str(e), 'status': 504, 'reason': 'deadline_exceeded'}
+    if isinstance(e, CircuitOpenError):
+        return 503, {'error': str(e), 'status': 503, 'reason': 'circuit_open',
+                     'retry_after': max(1, round(e.retry_after))}
+    return 500, {'error': str(e), 'status': 500, 'reason': 'internal'}
+
+
+@app.route('/ask/stream', methods=['POST'])
+async def ask_stream():
+    """Like /ask, but streams the answer as Server-Sent Events while it is generated."""
+    start = time.time()
+    data = await request.get_json()
+    question = data.get('question')
+    if not question:
+        REQUEST_COUNT.labels("/ask/stream", "POST", "400").inc()
+        return jsonify({'error': 'Question is required'}), 400
+
+    if not READY.is_set():
+        REQUEST_COUNT.labels("/ask/stream", "POST", "503").inc()
+        return not_ready()
+
+    deadline = Deadline(RAG_DEADLINE)
+    try:
+        await rag_admission.acquire(admission_priority(question), deadline.remaining())
+    except Overloaded as e:
+        return overloaded("/ask/stream", e)
+    admitted = time.time()
+    conversation_id = str(uuid.uuid4())
+
+    async def generate():
+        yield sse({'conversation_id': conversation_id, 'question': question}, event="start")
+        parts = []
+        try:
+            async for text in arag_stream(question, deadline):
+                if not parts:
+                    LLM_TIME_TO_FIRST_TOKEN.labels("/ask/stream").observe(time.time() - start)
+                parts.append(text)
+                yield sse({'token': text})
+        except Exception as e:
+            status, payload = stream_error(e)
+            REQUEST_COUNT.labels("/ask/stream", "POST", str(status)).inc()
+            logging.error(f"Error: {e}")
+            yield sse(payload, event="error")
+            return
+
+        answer = "".join(parts).strip()
+        enqueue_conversation(conversation_id, question, answer)
+        REQUEST_COUNT.labels("/ask/stream", "POST", "200").inc()
+        REQUEST_LATENCY.labels("/ask/stream").observe(time.time() - start)
+        yield sse({'answer': answer}, event="done")
+
+    # The slot is held until the stream is closed, whether it finished or the client went away
+    body = CloseCallbackBody(generate(), lambda: rag_admission.release(time.time() - admitted))
+    return Response(body, mimetype="text/event-stream")
+
+
+@app.route('/feedback', methods=['POST'])
+async def feedback():
+    start = time.time()
+    data = await request.get_json()
+    conversation_id = data.get('conversation_id')
+    feedback_value = data.get('feedback')
+
+    if feedback_value not in [+1, -1]:
+        REQUEST_COUNT.labels("/feedback", "POST", "400").inc()
+        return jsonify({'error': 'Feedback must be +1 or -1'}), 400
+
+    try:
+        enqueue_feedback(conversation_id, feedback_value)
+        FEEDBACK_COUNT.labels(str(feedback_value)).inc()
+        REQUEST_COUNT.labels("/feedback", "POST", "200").inc()
+        REQUEST_LATENCY.labels("/feedback").observe(time.time() - start)
+
+        return jsonify({'message': 'Feedback recorded'})
+    except ValueError as e:
+        REQUEST_COUNT.labels("/feedback", "POST", "400").inc()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        REQUEST_COUNT.labels("/feedback", "POST", "500").inc()
+        logging.error(f"Error saving feedback: {e}")
+        return jsonify({'error': str(e)}), 500
+
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=5000)
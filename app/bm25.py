@@ -0,0 +1,65 @@
+import re
+import math
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from app.filters import PayloadColumns
+
+TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(str(text).lower())
+
+
+class BM25Index:
+    """In-process inverted index with Okapi BM25 scoring."""
+
+    def __init__(self, texts, payloads, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.payloads = list(payloads)
+        self.columns = PayloadColumns(self.payloads)
+
+        postings = defaultdict(lambda: ([], []))
+        lengths = []
+        for i, text in enumerate(texts):
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings[term][0].append(i)
+                postings[term][1].append(tf)
+
+        self.doc_len = np.asarray(lengths, dtype=np.float32)
+        self.avg_len = float(self.doc_len.mean()) if len(lengths) else 0.0
+        n = len(lengths)
+        self.postings = {}
+        for term, (ids, tfs) in postings.items():
+            idf = math.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+            self.postings[term] = (np.asarray(ids, dtype=np.int64), np.asarray(tfs, dtype=np.float32), idf)
+
+    def scores(self, query):
+        scores = np.zeros(len(self.payloads), dtype=np.float32)
+        if not self.avg_len:
+            return scores
+        for term in set(tokenize(query)):
+            entry = self.postings.get(term)
+            if entry is None:
+                continue
+            ids, tfs, idf = entry
+            norm = self.k1 * (1 - self.b + self.b * self.doc_len[ids] / self.avg_len)
+            scores[ids] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+        return scores
+
+    def search(self, query, top_k=10, constraints=None):
+        scores = self.scores(query)
+        mask = self.columns.mask(constraints)
+        if mask is not None:
+            scores[~mask] = 0
+        k = min(top_k, int((scores > 0).sum()))
+        if k <= 0:
+            return []
+        idx = np.argpartition(-scores, k - 1)[:k]
+        idx = idx[np.argsort(-scores[idx])]
+        return [self.payloads[i] for i in idx]
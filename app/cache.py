@@ -0,0 +1,176 @@
+import re
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+from app.metrics import CACHE_HITS, CACHE_MISSES, CACHE_EVICTIONS, CACHE_SIZE
+
+
+def normalize_question(question):
+    """Case- and whitespace-insensitive cache key for a question."""
+    return re.sub(r"\s+", " ", question).strip().lower()
+
+
+class LRUCache:
+    """Bounded, thread-safe LRU cache that reports hits/misses/evictions to Prometheus."""
+
+    def __init__(self, name, maxsize):
+        self.name = name
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                CACHE_HITS.labels(self.name).inc()
+                return self._data[key]
+        CACHE_MISSES.labels(self.name).inc()
+        return default
+
+    def peek(self, key, default=None):
+        """Like get(), but leaves the LRU order and the hit/miss counters alone."""
+        with self._lock:
+            return self._data.get(key, default)
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                CACHE_EVICTIONS.labels(self.name).inc()
+            CACHE_SIZE.labels(self.name).set(len(self._data))
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            CACHE_SIZE.labels(self.name).set(0)
+
+
+class SemanticCache:
+    """Answer cache matched on question-embedding similarity.
+
+    An entry is reused when the new question retrieved the same documents and
+    its embedding has cosine similarity >= threshold with the cached one.
+    Entries expire after ttl seconds and the least recently used are evicted past maxsize.
+    The cache is cleared whenever the index version changes.
+
+    Entries live in fixed slots: unit vectors in one (maxsize, dim) matrix, so a lookup
+    is a single matrix-vector product plus masks rather than a loop over the entries.
+    """
+
+    def __init__(self, name, maxsize, ttl, threshold):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self.version = None
+        self._vectors = None  # (maxsize, dim) unit vectors, allocated on the first put
+        self._doc_ids = [None] * maxsize
+        self._answers = [None] * maxsize
+        self._doc_keys = np.zeros(maxsize, dtype=np.int64)  # hash(doc_ids), to match them vectorized
+        self._created = np.zeros(maxsize)
+        self._used = np.zeros(maxsize, dtype=np.int64)  # recency tick, for LRU eviction
+        self._live = np.zeros(maxsize, dtype=bool)
+        self._tick = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return int(self._live.sum())
+
+    @staticmethod
+    def _unit(vector):
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def _drop(self, mask):
+        for slot in np.flatnonzero(mask):
+            self._doc_ids[slot] = self._answers[slot] = None
+        self._live &= ~mask
+
+    def _expire(self, now):
+        expired = self._live & (now - self._created > self.ttl)
+        count = int(expired.sum())
+        if count:
+            self._drop(expired)
+            CACHE_EVICTIONS.labels(self.name).inc(count)
+            CACHE_SIZE.labels(self.name).set(len(self))
+
+    def _scores(self, query, mask):
+        """Cosine similarity of query with every slot in mask, -inf elsewhere."""
+        if self._vectors is None or self._vectors.shape[1] != query.shape[0] or not mask.any():
+            return None
+        return np.where(mask, self._vectors @ query, -np.inf)
+
+    def get(self, vector, doc_ids):
+        """Return the cached answer closest to vector for the same doc_ids, or None."""
+        doc_ids = tuple(doc_ids)
+        query = self._unit(vector)
+        with self._lock:
+            self._expire(time.time())
+            scores = self._scores(query, self._live & (self._doc_keys == hash(doc_ids)))
+            if scores is not None:
+                matches = np.flatnonzero(scores >= self.threshold)
+                # Best first; the tuple check guards against hash collisions
+                for slot in matches[np.argsort(-scores[matches])]:
+                    if self._doc_ids[slot] == doc_ids:
+                        self._tick += 1
+                        self._used[slot] = self._tick
+                        CACHE_HITS.labels(self.name).inc()
+                        return self._answers[slot]
+        CACHE_MISSES.labels(self.name).inc()
+        return None
+
+    def has_similar(self, vector):
+        """Whether any live answer is close enough to vector, whatever documents it was for.
+
+        A cheap probe that doesn't count as a hit or miss; get() still decides.
+        """
+        query = self._unit(vector)
+        now = time.time()
+        with self._lock:
+            scores = self._scores(query, self._live & (now - self._created <= self.ttl))
+            return scores is not None and bool((scores >= self.threshold).any())
+
+    def put(self, vector, doc_ids, answer):
+        if self.maxsize <= 0:
+            return
+        v = self._unit(vector)
+        with self._lock:
+            if self._vectors is None or self._vectors.shape[1] != v.shape[0]:
+                self._vectors = np.zeros((self.maxsize, v.shape[0]), dtype=np.float32)
+                self._drop(self._live)
+            free = np.flatnonzero(~self._live)
+            if free.size:
+                slot = int(free[0])
+            else:
+                slot = int(np.argmin(self._used))
+                CACHE_EVICTIONS.labels(self.name).inc()
+            doc_ids = tuple(doc_ids)
+            self._tick += 1
+            self._vectors[slot] = v
+            self._doc_ids[slot], self._answers[slot] = doc_ids, answer
+            self._doc_keys[slot] = hash(doc_ids)
+            self._created[slot] = time.time()
+            self._used[slot] = self._tick
+            self._live[slot] = True
+            CACHE_SIZE.labels(self.name).set(len(self))
+
+    def clear(self):
+        with self._lock:
+            self._drop(self._live)
+            CACHE_SIZE.labels(self.name).set(0)
+
+    def set_version(self, version):
+        """Drop all answers if the index they were computed against changed."""
+        if version != self.version:
+            self.clear()
+            self.version = version
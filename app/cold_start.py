@@ -0,0 +1,189 @@
+"""Cold-start benchmark: per-module import time and time-to-first-answer.
+
+    python -m app.cold_start                      # imports only
+    python -m app.cold_start --first-answer       # also start a fresh worker and answer one question
+    python -m app.cold_start --no-record          # measure without appending to the history
+
+Every measurement runs in a fresh interpreter (`python -X importtime`), so nothing
+is shared with this process. Results are appended to data/benchmarks/cold_start.jsonl
+(local, not in git) and compared with the previous run on the same host and Python; the
+exit code is 1 when a module got slower than --max-regression allows or when it pulls in
+a heavy dependency it should not need.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+
+from app.config_loader import PROJECT_ROOT
+
+HISTORY_PATH = os.path.join(PROJECT_ROOT, "data", "benchmarks", "cold_start.jsonl")
+
+HEAVY_DEPENDENCIES = ["pandas", "fastembed", "onnxruntime", "qdrant_client", "groq"]
+
+# Module -> heavy dependencies it must not import on its own
+MODULES = {
+    "app.config_loader": ["pandas", "fastembed", "qdrant_client", "groq"],
+    "app.db": ["pandas", "fastembed", "qdrant_client", "groq"],
+    "app.db_prep": ["pandas", "fastembed", "qdrant_client", "groq"],
+    "app.get_data": ["pandas", "fastembed", "qdrant_client", "groq"],
+    "app.rag": ["pandas", "fastembed", "qdrant_client", "groq"],
+    "app.app": ["pandas", "fastembed", "qdrant_client", "groq"],
+    "app.async_app": ["pandas", "fastembed", "qdrant_client", "groq"],
+}
+
+FIRST_ANSWER_SCRIPT = """
+import sys, json, time
+spawned = float(sys.argv[1])
+start = time.time()
+from app import rag
+imported = time.time()
+rag.startup()
+if not rag.READY.is_set():
+    print(json.dumps({"error": rag.startup_error}))
+    sys.exit(1)
+ready = time.time()
+rag.rag(sys.argv[2])
+answered = time.time()
+print(json.dumps({
+    "interpreter_s": start - spawned,
+    "import_s": imported - start,
+    "startup_s": ready - imported,
+    "first_answer_s": answered - ready,
+    "time_to_first_answer_s": answered - spawned,
+}))
+"""
+
+
+def _run(args, timeout=None):
+    return subprocess.run([sys.executable, *args], cwd=PROJECT_ROOT, capture_output=True, text=True,
+                          timeout=timeout)
+
+
+def parse_importtime(stderr, module):
+    """Cumulative import time of `module` in microseconds from `-X importtime` output."""
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module and parts[1].strip().isdigit():
+            return int(parts[1].strip())
+    return None
+
+
+def measure_import(module, repeats=5):
+    """Median cumulative import time (ms) over fresh interpreters, plus the heavy modules it loaded."""
+    code = (f"import sys, json; import {module}; "
+            f"print(json.dumps([m for m in {HEAVY_DEPENDENCIES!r} if m in sys.modules]))")
+    times, loaded = [], []
+    for _ in range(repeats):
+        proc = _run(["-X", "importtime", "-c", code])
+        if proc.returncode != 0:
+            return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "failed"}
+        micros = parse_importtime(proc.stderr, module)
+        if micros is not None:
+            times.append(micros / 1000)
+        loaded = json.loads(proc.stdout.strip().splitlines()[-1])
+    return {"import_ms": round(statistics.median(times), 1) if times else None, "heavy": loaded}
+
+
+def measure_first_answer(question, timeout=600):
+    """Spawn a worker process, run startup() and answer one question; returns the phase timings."""
+    proc = _run(["-c", FIRST_ANSWER_SCRIPT, repr(time.time()), question], timeout=timeout)
+    lines = proc.stdout.strip().splitlines()
+    if not lines:
+        return {"error": proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "no output"}
+    result = json.loads(lines[-1])
+    return {k: round(v, 3) if isinstance(v, float) else v for k, v in result.items()}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=PROJECT_ROOT, capture_output=True,
+                              text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def load_history(path=HISTORY_PATH):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def previous_run(history, run):
+    """Latest run from the same host and Python version; timings from other machines don't compare."""
+    for entry in reversed(history):
+        if entry.get("host") == run["host"] and entry.get("python") == run["python"]:
+            return entry
+    return None
+
+
+def compare(current, previous, max_regression=0.25, min_delta_ms=50.0):
+    """List of problems: forbidden heavy imports and import-time regressions against `previous`."""
+    problems = []
+    for module, result in current["imports"].items():
+        forbidden = sorted(set(result.get("heavy", [])) & set(MODULES.get(module, [])))
+        if forbidden:
+            problems.append(f"{module} imports {', '.join(forbidden)}")
+        before = (previous or {}).get("imports", {}).get(module, {}).get("import_ms")
+        after = result.get("import_ms")
+        if before and after and after - before > max(min_delta_ms, before * max_regression):
+            problems.append(f"{module} import {before:.0f}ms -> {after:.0f}ms")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start import time and time-to-first-answer.")
+    parser.add_argument("--repeats", type=int, default=5, help="fresh interpreters per module (median is kept)")
+    parser.add_argument("--modules", default=",".join(MODULES), help="comma-separated modules to import")
+    parser.add_argument("--first-answer", action="store_true",
+                        help="also measure startup and the first rag() answer (needs Qdrant/Groq or a bundle)")
+    parser.add_argument("--question", default="What can I cook for my 8 month old for dinner?")
+    parser.add_argument("--history", default=HISTORY_PATH, help="JSONL file the results are appended to")
+    parser.add_argument("--no-record", action="store_true", help="don't append this run to the history")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="allowed relative import-time increase over the previous run on this host")
+    args = parser.parse_args()
+
+    run = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "imports": {m: measure_import(m, args.repeats) for m in args.modules.split(",")},
+    }
+    if args.first_answer:
+        run["first_answer"] = measure_first_answer(args.question)
+
+    history = load_history(args.history)
+    previous = previous_run(history, run)
+    problems = compare(run, previous, args.max_regression)
+
+    for module, result in run["imports"].items():
+        before = (previous or {}).get("imports", {}).get(module, {}).get("import_ms")
+        change = f"  (prev {before:.0f}ms)" if before else ""
+        if "error" in result:
+            print(f"{module:<20} error: {result['error']}")
+        else:
+            print(f"{module:<20} {result['import_ms']:>8.1f}ms{change}  heavy={','.join(result['heavy']) or '-'}")
+    if "first_answer" in run:
+        print(json.dumps(run["first_answer"], indent=2))
+    for problem in problems:
+        print(f"REGRESSION: {problem}")
+
+    if not args.no_record:
+        os.makedirs(os.path.dirname(args.history), exist_ok=True)
+        with open(args.history, "a") as f:
+            f.write(json.dumps(run) + "\n")
+
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -21,3 +21,75 @@ GROQ_MODEL = _config['GROQ_MODEL']
 MODEL = _config['MODEL']
 EMBEDDING_DIMENSIONALITY = _config['EMBEDDING_DIMENSIONALITY']
 COLLECTION_NAME = _config['COLLECTION_NAME']
+
+# "sync" re-embeds only added/changed recipes, "recreate" rebuilds the collection
+INDEX_MODE = _config['INDEX_MODE']
+
+EMBEDDING_STORE_PATH = os.path.join(PROJECT_ROOT, _config['EMBEDDING_STORE_PATH'])
+QUERY_EMBEDDING_STORE_SIZE = _config['QUERY_EMBEDDING_STORE_SIZE']
+QUERY_EMBEDDING_CACHE_SIZE = _config['QUERY_EMBEDDING_CACHE_SIZE']
+
+# Semantic answer cache for rag()
+ANSWER_CACHE_SIZE = _config['ANSWER_CACHE_SIZE']
+ANSWER_CACHE_TTL = _config['ANSWER_CACHE_TTL']
+ANSWER_CACHE_THRESHOLD = _config['ANSWER_CACHE_THRESHOLD']
+
+# "qdrant" queries the Qdrant collection, "local" searches an in-process NumPy matrix
+SEARCH_BACKEND = _config['SEARCH_BACKEND']
+
+# Retrieval: "vector" (dense only) or "hybrid" (BM25 + dense fused with RRF)
+RETRIEVAL_MODE = _config['RETRIEVAL_MODE']
+HYBRID_CANDIDATES = _config['HYBRID_CANDIDATES']
+HYBRID_DENSE_WEIGHT = _config['HYBRID_DENSE_WEIGHT']
+HYBRID_LEXICAL_WEIGHT = _config['HYBRID_LEXICAL_WEIGHT']
+RRF_K = _config['RRF_K']
+# Pre-filter on age/allergen/iron/meal type/cooking time extracted from the question
+STRUCTURED_FILTERS = _config['STRUCTURED_FILTERS']
+
+# /ask/batch
+BATCH_MAX_QUESTIONS = _config['BATCH_MAX_QUESTIONS']
+BATCH_LLM_CONCURRENCY = _config['BATCH_LLM_CONCURRENCY']
+
+# Warm start: prebuilt artifact bundle and warm-up before the worker reports ready
+ARTIFACT_PATH = os.path.join(PROJECT_ROOT, _config['ARTIFACT_PATH'])
+QDRANT_SNAPSHOT_DIR = _config['QDRANT_SNAPSHOT_DIR']
+WARMUP_ROUNDS = _config['WARMUP_ROUNDS']
+STARTUP_RETRY_DELAY = _config['STARTUP_RETRY_DELAY']
+STARTUP_RETRY_MAX_DELAY = _config['STARTUP_RETRY_MAX_DELAY']
+
+# Prompt context: estimated token budget and the corpus share above which a recipe step
+# is factored out into the shared note
+CONTEXT_TOKEN_BUDGET = _config['CONTEXT_TOKEN_BUDGET']
+CONTEXT_SHARED_MIN_SHARE = _config['CONTEXT_SHARED_MIN_SHARE']
+
+# Concurrent identical prompts share one in-flight LLM call
+LLM_SINGLE_FLIGHT = _config['LLM_SINGLE_FLIGHT']
+
+# Deadline budget for rag(), hedged LLM requests and the circuit breaker around Groq
+RAG_DEADLINE = _config['RAG_DEADLINE']
+LLM_HEDGE = _config['LLM_HEDGE']
+LLM_HEDGE_PERCENTILE = _config['LLM_HEDGE_PERCENTILE']
+LLM_HEDGE_DEFAULT_DELAY = _config['LLM_HEDGE_DEFAULT_DELAY']
+LLM_HEDGE_MIN_DELAY = _config['LLM_HEDGE_MIN_DELAY']
+LLM_CALL_THREADS = _config['LLM_CALL_THREADS']
+BREAKER_FAILURE_THRESHOLD = _config['BREAKER_FAILURE_THRESHOLD']
+BREAKER_RESET_TIMEOUT = _config['BREAKER_RESET_TIMEOUT']
+
+# Admission control: bounded concurrency and a short wait queue in front of the RAG pipeline
+ADMISSION_MAX_IN_FLIGHT = _config['ADMISSION_MAX_IN_FLIGHT']
+ADMISSION_MAX_QUEUE = _config['ADMISSION_MAX_QUEUE']
+ADMISSION_QUEUE_TIMEOUT = _config['ADMISSION_QUEUE_TIMEOUT']
+ADMISSION_PRIORITIZE_CACHED = _config['ADMISSION_PRIORITIZE_CACHED']
+ADMISSION_BATCH_MAX_IN_FLIGHT = _config['ADMISSION_BATCH_MAX_IN_FLIGHT']
+BATCH_DEADLINE = _config['BATCH_DEADLINE']
+
+# Quantized vectors (Qdrant collection and local index) with full-precision rescoring
+VECTOR_QUANTIZATION = _config['VECTOR_QUANTIZATION']
+QUANTIZATION_RESCORE = _config['QUANTIZATION_RESCORE']
+QUANTIZATION_OVERSAMPLING = _config['QUANTIZATION_OVERSAMPLING']
+
+# Streaming ingest of large CSVs
+INGEST_CHUNK_SIZE = _config['INGEST_CHUNK_SIZE']
+INGEST_BATCH_SIZE = _config['INGEST_BATCH_SIZE']
+INGEST_WORKERS = _config['INGEST_WORKERS']
+INGEST_MAX_IN_FLIGHT = _config['INGEST_MAX_IN_FLIGHT']
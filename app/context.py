@@ -0,0 +1,216 @@
+import re
+import math
+from collections import Counter
+
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+# Rough size of a token for English prose; good enough to budget prompts without a tokenizer
+CHARS_PER_TOKEN = 4
+# A truncated hit must keep at least this many tokens, otherwise it's dropped
+MIN_BLOCK_TOKENS = 40
+
+CONTEXT_FIELDS = ["dish_name", "baby_age", "iron_rich", "allergen", "ingredients", "cooking_time", "texture",
+                  "meal_type", "calories", "preparation_difficulty", "recipe"]
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _doc_key(doc):
+    return doc.get("id", doc.get("dish_name"))
+
+
+def _recipe_steps(doc):
+    """Recipe sentences, with the ingredient list (already shown in its own field) replaced by a reference."""
+    recipe = doc.get("recipe")
+    if not isinstance(recipe, str):
+        return []
+    ingredients = doc.get("ingredients")
+    if isinstance(ingredients, str) and ingredients:
+        recipe = recipe.replace(ingredients, "the listed ingredients")
+    return [s.strip() for s in SENTENCE_RE.split(recipe) if s.strip()]
+
+
+class ContextBlock:
+    """A recipe rendered for the prompt: inline, and with every shared step cut."""
+    __slots__ = ("name", "body", "fields", "steps", "shared", "inline", "factored", "full_tokens")
+
+    def __init__(self, name, fields, steps, inline, factored):
+        self.name = name
+        self.fields = fields
+        self.steps = steps        # [(shared step index or None, sentence)]
+        self.shared = frozenset(i for i, _ in steps if i is not None)
+        self.inline = inline
+        self.factored = factored
+        self.full_tokens = estimate_tokens(inline)
+        # Variants that differ only in the dish name have the same body
+        self.body = inline.partition("\n")[2]
+
+
+class ContextBuilder:
+    """Pre-rendered, deduplicated context blocks for the prompt, packed into a token budget.
+
+    Recipe steps shared by at least `shared_min_share` of the corpus (washing, storage, ...)
+    are candidates for a shared note. A step is only moved into the note when at least two
+    of the recipes in the context have it, and only when that makes the context smaller;
+    the note names the recipes a step belongs to unless every recipe in the context has it.
+    A single hit is rendered inline, as is.
+    """
+
+    def __init__(self, documents, entry_template, token_budget, shared_min_share=0.5):
+        self.entry_template = entry_template
+        self.token_budget = token_budget
+
+        # Counter keeps first-seen order, so the shared note lists steps in recipe order
+        counts = Counter()
+        for doc in documents:
+            for step in dict.fromkeys(_recipe_steps(doc)):
+                counts[step] += 1
+        threshold = max(2, shared_min_share * len(documents))
+        self.shared_steps = [step for step, n in counts.items() if n >= threshold]
+        self._shared_index = {step: i for i, step in enumerate(self.shared_steps)}
+
+        self.blocks = {}
+        for doc in documents:
+            self.blocks[_doc_key(doc)] = self.render(doc)
+
+    def render(self, doc):
+        """Render one document into a ContextBlock."""
+        fields = {k: doc.get(k, "N/A") for k in CONTEXT_FIELDS}
+        steps = [(self._shared_index.get(step), step) for step in _recipe_steps(doc)]
+        inline = self.entry_template.format(**fields)
+        block = ContextBlock(str(fields["dish_name"]), fields, steps, inline, inline)
+        if block.shared:
+            block.factored = self._format(block, block.shared)
+        return block
+
+    def _format(self, block, cut):
+        own = [step for i, step in block.steps if i not in cut]
+        recipe = " ".join(own) + (" " if own else "") + "(plus the shared steps above)"
+        return self.entry_template.format(**{**block.fields, "recipe": recipe})
+
+    def _text(self, block, factored):
+        """The block's text with the factored steps cut."""
+        cut = block.shared & factored
+        if not cut:
+            return block.inline
+        return block.factored if cut == block.shared else self._format(block, cut)
+
+    def _block(self, doc):
+        block = self.blocks.get(_doc_key(doc))
+        return block if block is not None else self.render(doc)
+
+    @staticmethod
+    def _factored(blocks):
+        """Shared steps that at least two different recipes among blocks have."""
+        owners = {}
+        for block in blocks:
+            for i in block.shared:
+                owners.setdefault(i, set()).add(block.body)
+        return frozenset(i for i, bodies in owners.items() if len(bodies) >= 2)
+
+    def _note(self, blocks, factored):
+        owners = {}
+        for block in blocks:
+            for i in block.shared & factored:
+                owners.setdefault(i, []).append(block.name)
+        # Steps grouped by the recipes that have them, in recipe order within each group
+        groups = {}
+        for i in sorted(owners):
+            names = None if len(owners[i]) == len(blocks) else tuple(dict.fromkeys(owners[i]))
+            groups.setdefault(names, []).append(self.shared_steps[i])
+        lines = []
+        if None in groups:
+            lines.append("Shared steps for every recipe below: " + " ".join(groups.pop(None)))
+        for names, steps in groups.items():
+            lines.append(f"Steps for {', '.join(names)} only: " + " ".join(steps))
+        return "\n".join(lines)
+
+    def _pack(self, blocks, factored):
+        """Pack blocks in order into the budget; returns (included, parts, truncated)."""
+        # The note for all candidates is about an upper bound for the note of the ones that fit
+        budget = self.token_budget - estimate_tokens(self._note(blocks, factored))
+        included, parts, by_body, truncated = [], [], {}, 0
+        for block in blocks:
+            text = self._text(block, factored)
+            # Variants that differ only in the dish name ("... (Freezer-Friendly)") share one block
+            head, _, body = text.partition("\n")
+            if body in by_body:
+                i = by_body[body]
+                first, _, rest = parts[i].partition("\n")
+                merged = f"{first}; {head.split(': ', 1)[-1]}\n{rest}"
+                cost = estimate_tokens(merged) - estimate_tokens(parts[i])
+                if cost <= budget:
+                    parts[i] = merged
+                    included.append(block)
+                    budget -= cost
+                    continue
+                break
+            # Each block also costs the blank line that separates it from the previous one
+            tokens = estimate_tokens(text)
+            if tokens + 1 <= budget:
+                by_body[body] = len(parts)
+                included.append(block)
+                parts.append(text)
+                budget -= tokens + 1
+                continue
+            if budget >= MIN_BLOCK_TOKENS or not parts:
+                lines = text.splitlines()
+                while len(lines) > 1 and estimate_tokens("\n".join(lines)) + 1 > budget:
+                    lines.pop()
+                included.append(block)
+                parts.append("\n".join(lines))
+                truncated = 1
+            break
+        return included, parts, truncated
+
+    @staticmethod
+    def _join(note, parts):
+        return "\n\n".join(([note] if note else []) + parts)
+
+    def build(self, search_results):
+        """Pack hits in rank order into the budget; returns (context, stats).
+
+        A hit that doesn't fit is truncated line by line when enough budget is left,
+        otherwise it and every lower-ranked hit are dropped. tokens_saved is negative
+        when the context came out larger than the plain entries would have been.
+        """
+        full_tokens = 0
+        seen, blocks = set(), []
+        for hit in search_results:
+            doc = hit if isinstance(hit, dict) else getattr(hit, "payload", {}) or {}
+            block = self._block(doc)
+            full_tokens += block.full_tokens
+            key = _doc_key(doc)
+            if key not in seen:
+                seen.add(key)
+                blocks.append(block)
+
+        # Which steps are factored out depends on which blocks fit; repack until they agree.
+        # Each round drops at least one block, so this ends.
+        candidates = blocks
+        while True:
+            factored = self._factored(candidates)
+            included, parts, truncated = self._pack(candidates, factored)
+            if self._factored(included) == factored:
+                break
+            candidates = included
+        context = self._join(self._note(included, factored), parts)
+
+        # Short shared steps can cost more in the note than they save, so keep the plain
+        # layout unless the factored one fits more hits or is smaller
+        if factored:
+            plain_included, plain_parts, plain_truncated = self._pack(blocks, frozenset())
+            plain = self._join("", plain_parts)
+            if (len(plain_included), -estimate_tokens(plain)) >= (len(included), -estimate_tokens(context)):
+                included, truncated, context = plain_included, plain_truncated, plain
+
+        tokens = estimate_tokens(context)
+        return context, {
+            "hits": len(search_results),
+            "included": len(included),
+            "truncated": truncated,
+            "dropped": len(blocks) - len(included),
+            "tokens": tokens,
+            "tokens_saved": full_tokens - tokens,
+        }
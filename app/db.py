@@ -1,10 +1,32 @@
 import os
+import time
+import logging
+import threading
+import weakref
+from contextlib import contextmanager
+
 import psycopg2
-from psycopg2.extras import DictCursor
+from psycopg2 import pool
+from psycopg2.extras import DictCursor, execute_values
+from prometheus_client import Gauge, Counter, Histogram
 
-def get_db_connection():
-    """Create a PostgreSQL connection using environment variables."""
-    return psycopg2.connect(
+from app.metrics import DB_WRITE_LATENCY, track_latency
+
+DB_POOL_CONNECTIONS = Gauge("db_pool_connections", "Pooled Postgres connections", ["state"],
+                            multiprocess_mode="livesum")
+DB_POOL_MAX = Gauge("db_pool_max_connections", "Maximum size of the Postgres pool", multiprocess_mode="livesum")
+DB_POOL_WAIT = Histogram("db_pool_wait_seconds", "Time spent waiting for a pooled connection")
+DB_POOL_RECONNECTS = Counter("db_pool_reconnects_total", "Broken pooled connections that were replaced")
+
+POOL_MIN_SIZE = int(os.getenv("POSTGRES_POOL_MIN", 1))
+POOL_MAX_SIZE = int(os.getenv("POSTGRES_POOL_MAX", 10))
+POOL_TIMEOUT = float(os.getenv("POSTGRES_POOL_TIMEOUT", 10))
+# Connections idle for longer than this are pinged before being handed out
+POOL_HEALTHCHECK_AFTER = float(os.getenv("POSTGRES_POOL_HEALTHCHECK_AFTER", 30))
+
+
+def _connection_kwargs():
+    return dict(
         host=os.getenv("POSTGRES_HOST", "postgres"),
         database=os.getenv("POSTGRES_DB", "babydb"),
         user=os.getenv("POSTGRES_USER", "postgres"),
@@ -13,10 +35,123 @@ def get_db_connection():
     )
 
 
+def get_db_connection():
+    """Create a PostgreSQL connection using environment variables."""
+    return psycopg2.connect(**_connection_kwargs())
+
+
+class ConnectionPool:
+    """Thread-safe Postgres pool with a blocking checkout, health checks and metrics."""
+
+    def __init__(self, minconn=POOL_MIN_SIZE, maxconn=POOL_MAX_SIZE, timeout=POOL_TIMEOUT):
+        self.pid = os.getpid()
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self._pool = pool.ThreadedConnectionPool(minconn, maxconn, **_connection_kwargs())
+        # ThreadedConnectionPool raises when exhausted; the semaphore makes callers wait instead
+        self._slots = threading.BoundedSemaphore(maxconn)
+        # Keyed weakly by the connection itself: id() values are reused once a connection is closed
+        self._last_used = weakref.WeakKeyDictionary()
+        self._in_use = 0
+        self._lock = threading.Lock()
+        DB_POOL_MAX.set(maxconn)
+        self._update_metrics()
+
+    def _update_metrics(self):
+        idle = len(getattr(self._pool, "_pool", []))
+        DB_POOL_CONNECTIONS.labels("in_use").set(self._in_use)
+        DB_POOL_CONNECTIONS.labels("idle").set(idle)
+
+    def _healthy(self, conn):
+        if conn.closed:
+            return False
+        if time.time() - self._last_used.get(conn, 0) < POOL_HEALTHCHECK_AFTER:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        start = time.time()
+        if not self._slots.acquire(timeout=self.timeout):
+            raise pool.PoolError(f"No Postgres connection available within {self.timeout}s")
+        try:
+            conn = self._pool.getconn()
+            if not self._healthy(conn):
+                logging.warning("Replacing broken pooled Postgres connection")
+                DB_POOL_RECONNECTS.inc()
+                self._pool.putconn(conn, close=True)
+                conn = self._pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+        DB_POOL_WAIT.observe(time.time() - start)
+        with self._lock:
+            self._in_use += 1
+            self._update_metrics()
+        return conn
+
+    def putconn(self, conn, close=False):
+        self._last_used[conn] = time.time()
+        try:
+            self._pool.putconn(conn, close=close or conn.closed)
+        finally:
+            self._slots.release()
+            with self._lock:
+                self._in_use -= 1
+                self._update_metrics()
+
+    def closeall(self):
+        self._pool.closeall()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+# Pools inherited across a fork. They are kept referenced for the life of the process:
+# once garbage-collected, psycopg2 would close their connections and send Terminate
+# over sockets the parent is still using.
+_inherited_pools = []
+
+
+def get_pool():
+    """Process-wide pool, recreated after a fork so children never share parent sockets."""
+    global _pool
+    if _pool is None or _pool.pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool.pid != os.getpid():
+                # Don't close (or drop) an inherited pool: that would terminate the parent's sessions
+                if _pool is not None:
+                    _inherited_pools.append(_pool)
+                _pool = ConnectionPool()
+    return _pool
+
+
+@contextmanager
+def pooled_connection():
+    """Borrow a connection; rolls back on error and returns it to the pool."""
+    db_pool = get_pool()
+    conn = db_pool.getconn()
+    broken = False
+    try:
+        yield conn
+    except psycopg2.InterfaceError:
+        broken = True
+        raise
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        db_pool.putconn(conn, close=broken)
+
+
 def init_db():
     """Initialize database schema for conversations and feedback."""
-    conn = get_db_connection()
-    try:
+    with pooled_connection() as conn:
         with conn.cursor() as cur:
             cur.execute("""
                 CREATE TABLE IF NOT EXISTS conversations (
@@ -35,39 +170,46 @@ def init_db():
                 );
             """)
         conn.commit()
-    finally:
-        conn.close()
 
 
-def save_conversation(conversation_id, question, answer):
+def save_conversation(conversation_id, question, answer, timestamp=None):
     """Save a conversation record."""
-    conn = get_db_connection()
-    try:
+    with track_latency(DB_WRITE_LATENCY, "save_conversation"), pooled_connection() as conn:
         with conn.cursor() as cur:
             cur.execute(
+                """
+                INSERT INTO conversations (id, question, answer, created_at)
+                VALUES (%s, %s, %s, COALESCE(%s, CURRENT_TIMESTAMP));
+                """,
+                (conversation_id, question, answer, timestamp)
+            )
+        conn.commit()
+
+
+def save_conversations(rows):
+    """Save many (conversation_id, question, answer) records in one transaction."""
+    with track_latency(DB_WRITE_LATENCY, "save_conversations"), pooled_connection() as conn:
+        with conn.cursor() as cur:
+            execute_values(
+                cur,
                 """
                 INSERT INTO conversations (id, question, answer)
-                VALUES (%s, %s, %s);
+                VALUES %s;
                 """,
-                (conversation_id, question, answer)
+                rows
             )
         conn.commit()
-    finally:
-        conn.close()
 
 
-def save_feedback(conversation_id, feedback):
+def save_feedback(conversation_id, feedback, timestamp=None):
     """Save user feedback (-1 or +1) for a conversation."""
-    conn = get_db_connection()
-    try:
+    with track_latency(DB_WRITE_LATENCY, "save_feedback"), pooled_connection() as conn:
         with conn.cursor() as cur:
             cur.execute(
                 """
-                INSERT INTO feedback (conversation_id, feedback)
-                VALUES (%s, %s);
+                INSERT INTO feedback (conversation_id, feedback, created_at)
+                VALUES (%s, %s, COALESCE(%s, CURRENT_TIMESTAMP));
                 """,
-                (conversation_id, feedback)
+                (conversation_id, feedback, timestamp)
             )
         conn.commit()
-    finally:
-        conn.close()
@@ -0,0 +1,292 @@
+import os
+import re
+import json
+import fcntl
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+
+from app.config_loader import (PROJECT_ROOT, MODEL, EMBEDDING_DIMENSIONALITY, EMBEDDING_STORE_PATH,
+                               QUERY_EMBEDDING_STORE_SIZE)
+
+INITIAL_ROWS = 1024
+# Hits buffered before their recency is written to the log
+RECENCY_FLUSH = 256
+# The log is compacted once it has more than COMPACT_FACTOR lines per entry (and COMPACT_MIN_LINES)
+COMPACT_FACTOR = 4
+COMPACT_MIN_LINES = 4096
+
+
+def text_hash(text):
+    """Key used for a text inside the store."""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """On-disk embedding cache keyed by (model, text hash).
+
+    Vectors live in a memory-mapped float32 matrix (<name>.f32), so several processes
+    can share them. Which text is in which row is kept in an append-only log next to it
+    (<name>.index.log): a write appends one line per stored vector, and a process only
+    reads the lines added since it last looked. The log is compacted to one line per
+    entry once it is several times longer than that.
+
+    Reads hold a shared file lock and writes an exclusive one, so a row can't be
+    reused for another text while someone reads it. When capacity is set the least
+    recently used rows are reused once the store is full; hits are logged in batches,
+    with the next write or every RECENCY_FLUSH hits, so recency survives a reload.
+    """
+
+    def __init__(self, namespace, model=MODEL, dim=EMBEDDING_DIMENSIONALITY, path=EMBEDDING_STORE_PATH,
+                 capacity=None):
+        self.model = model
+        self.dim = dim
+        self.capacity = capacity
+        os.makedirs(path, exist_ok=True)
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", model)
+        base = os.path.join(path, f"{namespace}-{slug}")
+        self.matrix_path = base + ".f32"
+        self.log_path = base + ".index.log"
+        self.lock_path = base + ".lock"
+
+        self._lock = threading.Lock()
+        self._rows = OrderedDict()  # text hash -> row, least recently used first
+        self._owners = {}           # row -> text hash
+        self._next_row = 0
+        self._used = []             # hits not logged yet
+        self._log_inode = None
+        self._log_offset = 0
+        self._log_lines = 0
+        self._foreign = False       # the log on disk was written for another model
+        self._matrix = None
+        self._open_matrix()
+        with self._file_lock(fcntl.LOCK_SH):
+            self._sync()
+
+    # ---- file handling ----
+    def _open_matrix(self, min_rows=INITIAL_ROWS):
+        row_bytes = self.dim * 4
+        size = os.path.getsize(self.matrix_path) if os.path.exists(self.matrix_path) else 0
+        rows = max(size // row_bytes, min_rows, 1)
+        if size < rows * row_bytes:
+            with open(self.matrix_path, "ab") as f:
+                f.truncate(rows * row_bytes)
+        self._matrix = np.memmap(self.matrix_path, dtype=np.float32, mode="r+", shape=(rows, self.dim))
+
+    def _ensure_rows(self, rows, grow=False):
+        """Map at least `rows` rows; only writers (grow=True) extend the file."""
+        if rows <= self._matrix.shape[0]:
+            return
+        self._matrix.flush()
+        self._open_matrix(min_rows=max(rows, 2 * self._matrix.shape[0]) if grow else rows)
+
+    @contextmanager
+    def _file_lock(self, mode):
+        # Opened per call: a descriptor inherited across fork would share its lock with the parent
+        with open(self.lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _reset(self, inode=None):
+        self._rows.clear()
+        self._owners.clear()
+        self._next_row = 0
+        self._log_inode = inode
+        self._log_offset = self._log_lines = 0
+        self._foreign = False
+
+    def _apply(self, record):
+        if isinstance(record, dict):
+            if record.get("model") != self.model or record.get("dim") != self.dim:
+                logging.warning(f"Ignoring embedding index {self.log_path}: built for another model")
+                self._foreign = True
+            self._next_row = max(self._next_row, record.get("next_row", 0))
+        elif self._foreign:
+            return
+        elif record[0] == "put":
+            _, h, row = record
+            previous = self._owners.get(row)
+            if previous is not None and previous != h:
+                del self._rows[previous]
+            self._rows.pop(h, None)
+            self._rows[h] = row
+            self._owners[row] = h
+            self._next_row = max(self._next_row, row + 1)
+        elif record[0] == "use":
+            for h in record[1:]:
+                if h in self._rows:
+                    self._rows.move_to_end(h)
+
+    def _sync(self):
+        """Apply log lines written since the last sync; called with the file lock held."""
+        try:
+            stat = os.stat(self.log_path)
+        except FileNotFoundError:
+            if self._log_inode is not None:
+                self._reset()
+            return
+        if stat.st_ino != self._log_inode or stat.st_size < self._log_offset:
+            # First look, or the log was compacted by another process
+            self._reset(stat.st_ino)
+        if stat.st_size == self._log_offset:
+            return
+        with open(self.log_path, "rb") as f:
+            f.seek(self._log_offset)
+            data = f.read(stat.st_size - self._log_offset)
+        data = data[:data.rfind(b"\n") + 1]
+        for line in data.splitlines():
+            self._apply(json.loads(line))
+            self._log_lines += 1
+        self._log_offset += len(data)
+        self._ensure_rows(self._next_row)
+
+    def _append(self, records):
+        """Append already applied records to the log; called with the exclusive lock held and the log synced."""
+        data = "".join(json.dumps(r, separators=(",", ":")) + "\n" for r in records).encode("utf-8")
+        with open(self.log_path, "ab") as f:
+            f.write(data)
+        self._log_offset += len(data)
+        self._log_lines += len(records)
+
+    def _compact(self):
+        """Rewrite the log as a header plus one line per entry, in LRU order; exclusive lock held."""
+        self._foreign = False
+        header = {"model": self.model, "dim": self.dim, "next_row": self._next_row}
+        lines = [header] + [["put", h, row] for h, row in self._rows.items()]
+        tmp = f"{self.log_path}.{os.getpid()}.tmp"
+        with open(tmp, "w") as f:
+            f.writelines(json.dumps(r, separators=(",", ":")) + "\n" for r in lines)
+        os.replace(tmp, self.log_path)
+        stat = os.stat(self.log_path)
+        self._log_inode, self._log_offset, self._log_lines = stat.st_ino, stat.st_size, len(lines)
+
+    def _log_used(self):
+        """Apply and return the record for the buffered hits (if any)."""
+        used, self._used = list(dict.fromkeys(self._used)), []
+        if not used:
+            return []
+        record = ["use", *used]
+        self._apply(record)
+        return [record]
+
+    # ---- public API ----
+    def __len__(self):
+        return len(self._rows)
+
+    def get_many(self, texts):
+        """Return a list with a vector (copy) or None for each text."""
+        with self._lock:
+            with self._file_lock(fcntl.LOCK_SH):
+                self._sync()
+                out = []
+                for text in texts:
+                    h = text_hash(text)
+                    row = self._rows.get(h)
+                    if row is None:
+                        out.append(None)
+                        continue
+                    if self.capacity is not None:
+                        self._used.append(h)
+                    out.append(np.array(self._matrix[row]))
+            if len(self._used) >= RECENCY_FLUSH:
+                with self._file_lock(fcntl.LOCK_EX):
+                    self._sync()
+                    self._append(self._log_used())
+            return out
+
+    def get(self, text):
+        return self.get_many([text])[0]
+
+    def put_many(self, texts, vectors):
+        """Store vectors for texts, evicting least recently used rows when over capacity."""
+        with self._lock, self._file_lock(fcntl.LOCK_EX):
+            # Pick up rows written by other processes before allocating new ones
+            self._sync()
+            if self._log_inode is None or self._foreign:
+                self._reset()
+                self._compact()
+            records = self._log_used()
+            for text, vector in zip(texts, vectors):
+                h = text_hash(text)
+                row = self._rows.get(h)
+                if row is None:
+                    row = self._allocate_row()
+                    self._ensure_rows(row + 1, grow=True)
+                record = ["put", h, row]
+                self._apply(record)
+                records.append(record)
+                self._matrix[row] = np.asarray(vector, dtype=np.float32)
+            self._matrix.flush()
+            self._append(records)
+            if self._log_lines > max(COMPACT_MIN_LINES, COMPACT_FACTOR * len(self._rows)):
+                self._compact()
+
+    def put(self, text, vector):
+        self.put_many([text], [vector])
+
+    def _allocate_row(self):
+        if self.capacity is not None and len(self._rows) >= self.capacity:
+            # The put record that follows takes the row away from the least recently used text
+            return next(iter(self._rows.values()))
+        return self._next_row
+
+    def embed(self, texts, embed_fn):
+        """Return vectors for texts, calling embed_fn only for the ones not stored yet."""
+        texts = list(texts)
+        vectors = self.get_many(texts)
+        missing = [i for i, v in enumerate(vectors) if v is None]
+        if missing:
+            new_texts = [texts[i] for i in missing]
+            new_vectors = [np.asarray(v, dtype=np.float32) for v in embed_fn(new_texts)]
+            self.put_many(new_texts, new_vectors)
+            for i, v in zip(missing, new_vectors):
+                vectors[i] = v
+        return vectors
+
+
+_stores = {}
+_embedding_models = {}
+
+
+def get_store(namespace, model=MODEL):
+    """Shared store per (namespace, model). The "query" namespace is size capped."""
+    key = (namespace, model)
+    if key not in _stores:
+        capacity = QUERY_EMBEDDING_STORE_SIZE if namespace == "query" else None
+        _stores[key] = EmbeddingStore(namespace, model=model, capacity=capacity)
+    return _stores[key]
+
+
+def get_embedding_model(model=MODEL):
+    """Load the fastembed model once per process."""
+    if model not in _embedding_models:
+        from fastembed import TextEmbedding
+        logging.info(f"Loading embedding model: {model}")
+        _embedding_models[model] = TextEmbedding(model)
+    return _embedding_models[model]
+
+
+def embed_documents(texts, model=MODEL):
+    """Embed corpus texts, reusing vectors from the on-disk store."""
+    return get_store("corpus", model).embed(texts, lambda t: get_embedding_model(model).embed(t))
+
+
+def seed_documents(texts, vectors, model=MODEL):
+    """Add precomputed corpus vectors (e.g. from the artifact bundle) that the store doesn't have yet."""
+    store = get_store("corpus", model)
+    missing = [i for i, v in enumerate(store.get_many(texts)) if v is None]
+    if missing:
+        store.put_many([texts[i] for i in missing], [vectors[i] for i in missing])
+    return len(missing)
+
+
+def embed_queries(texts, model=MODEL):
+    """Embed questions, reusing vectors from the size-capped query store."""
+    return get_store("query", model).embed(texts, lambda t: get_embedding_model(model).embed(t))
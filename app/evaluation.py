@@ -0,0 +1,265 @@
+"""Parallel, resumable offline evaluation of retrieval (hit rate, MRR) and answers (cosine similarity).
+
+    python -m app.evaluation --sample 200 --checkpoint data/eval_checkpoint.jsonl
+    python -m app.evaluation --k-grid 1,3,5,10 --backends qdrant,local --modes vector,hybrid
+
+Per-question results are appended to the checkpoint as they finish, so an
+interrupted run picks up where it stopped when started again with the same
+checkpoint. Each record carries the settings it was made with (top_k, context_k,
+backend, retrieval mode, ...); records from runs with other settings are ignored. With --k-grid every question is retrieved once at the largest k and
+hit@k, MRR@k, recall@k and nDCG@k are computed for the whole grid.
+"""
+import os
+import json
+import time
+import random
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+import pandas as pd
+
+from app import rag
+from app.config_loader import PROJECT_ROOT, MODEL, RETRIEVAL_MODE, STRUCTURED_FILTERS, VECTOR_QUANTIZATION
+
+
+class RateLimiter:
+    """Thread-safe limiter that spaces calls to at most `rate` per second."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next, now)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def load_checkpoint(path, config=None):
+    """Return {index: record} for the questions already evaluated (with `config`, when given)."""
+    done = {}
+    if path and os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    rec = json.loads(line)
+                except json.JSONDecodeError:
+                    # A run killed mid-write can leave a truncated last line
+                    continue
+                if config is None or rec.get('config') == config:
+                    done[rec['index']] = rec
+    return done
+
+
+class EvaluationRunner:
+    """Runs ground-truth questions through batched retrieval and a rate-limited LLM worker pool."""
+
+    def __init__(self, checkpoint_path=None, top_k=5, context_k=1, batch_size=32, workers=4, rps=2.0,
+                 with_llm=True):
+        self.checkpoint_path = checkpoint_path
+        self.top_k = top_k
+        self.context_k = context_k
+        self.batch_size = batch_size
+        self.workers = workers
+        self.limiter = RateLimiter(rps)
+        self.with_llm = with_llm
+        self._write_lock = threading.Lock()
+
+    def config(self):
+        """Settings that change the results; stored in every record so a resume only reuses matching ones."""
+        return {
+            'top_k': self.top_k,
+            'context_k': self.context_k,
+            'backend': type(rag.search_backend).__name__,
+            'mode': RETRIEVAL_MODE,
+            'structured_filters': STRUCTURED_FILTERS,
+            'quantization': VECTOR_QUANTIZATION,
+            'model': MODEL,
+        }
+
+    def _record(self, rec):
+        if not self.checkpoint_path:
+            return
+        with self._write_lock, open(self.checkpoint_path, "a") as f:
+            f.write(json.dumps(rec, default=str) + "\n")
+
+    def _answer(self, rec, search_results):
+        self.limiter.wait()
+        prompt = rag.build_prompt(rec['question'], search_results[:self.context_k])
+        try:
+            rec['answer_llm'] = rag.llm(prompt)
+        except Exception as e:
+            logging.error(f"LLM call failed for question {rec['index']}: {e}")
+            rec['error'] = str(e)
+        return rec
+
+    def run(self, ground_truth):
+        config = self.config()
+        # Only reuse records made with the same settings for the same question (the sample may differ between runs)
+        results = {i: rec for i, rec in load_checkpoint(self.checkpoint_path, config).items()
+                   if i < len(ground_truth) and rec.get('question') == ground_truth[i].get('question', '')}
+        # Records that failed on the LLM call are retried on resume
+        pending = [i for i in range(len(ground_truth))
+                   if i not in results or (self.with_llm and 'answer_llm' not in results[i])]
+        logging.info(f"{len(results)} questions in checkpoint, {len(pending)} to evaluate")
+
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = []
+            for b in range(0, len(pending), self.batch_size):
+                batch = pending[b:b + self.batch_size]
+                questions = [ground_truth[i].get('question', '') for i in batch]
+                for i, search_results in zip(batch, rag.search_many(questions, top_k=self.top_k)):
+                    rec = {
+                        'index': i,
+                        'question': ground_truth[i].get('question', ''),
+                        'doc_id': ground_truth[i].get('id'),
+                        'retrieved_ids': [d.get('id') for d in search_results],
+                        'config': config,
+                    }
+                    if self.with_llm:
+                        futures.append(pool.submit(self._answer, rec, search_results))
+                    else:
+                        results[i] = rec
+                        self._record(rec)
+            for future in as_completed(futures):
+                rec = future.result()
+                results[rec['index']] = rec
+                self._record(rec)
+
+        elapsed = time.time() - start
+        return results, len(pending), elapsed
+
+
+def summarize(results, documents, evaluated, elapsed, with_llm=True):
+    """hit rate / MRR over all records, cosine similarity over answered ones, and throughput."""
+    records = [results[i] for i in sorted(results)]
+    relevance_total = [[d == r['doc_id'] for d in r['retrieved_ids']] for r in records]
+    report = {
+        'questions': len(records),
+        'evaluated_this_run': evaluated,
+        'elapsed_seconds': round(elapsed, 2),
+        'questions_per_second': round(evaluated / elapsed, 2) if elapsed else None,
+        'hit_rate': rag.hit_rate(relevance_total),
+        'mrr': rag.mrr(relevance_total),
+    }
+
+    answered = [r for r in records if r.get('answer_llm') is not None]
+    if with_llm and answered:
+        doc_idx = {d['id']: d for d in documents}
+        answers_orig = [rag.original_answer(doc_idx.get(r['doc_id'], {})) for r in answered]
+        similarity = rag.answer_similarity([str(r['answer_llm']) for r in answered], answers_orig)
+        report['cosine_mean'] = float(similarity.mean())
+        report['cosine_median'] = float(sorted(similarity)[len(similarity) // 2])
+        report['failed_llm_calls'] = len(records) - len(answered)
+    return report
+
+
+def relevant_ranks(ground_truth, max_k, batch_size=64, vectors=None, **search_kwargs):
+    """1-based rank of the relevant document for each question at depth max_k (0 = not retrieved).
+
+    vectors, when given, are precomputed question embeddings in ground_truth order.
+    """
+    retrieved = np.full((len(ground_truth), max_k), None, dtype=object)
+    for b in range(0, len(ground_truth), batch_size):
+        batch = ground_truth[b:b + batch_size]
+        results = rag.search_many([q.get('question', '') for q in batch], top_k=max_k,
+                                  vectors=vectors[b:b + batch_size] if vectors is not None else None,
+                                  **search_kwargs)
+        for row, docs in enumerate(results, start=b):
+            ids = [d.get('id') for d in docs[:max_k]]
+            retrieved[row, :len(ids)] = ids
+
+    gold = np.array([q.get('id') for q in ground_truth], dtype=object)
+    hits = retrieved == gold[:, None]
+    return np.where(hits.any(axis=1), hits.argmax(axis=1) + 1, 0)
+
+
+def metrics_at_k(ranks, ks):
+    """hit@k, MRR@k, recall@k and nDCG@k for every k, computed on the rank array.
+
+    With one relevant document per question recall@k equals hit@k and the ideal DCG is 1.
+    """
+    ranks = np.asarray(ranks)
+    ks = np.asarray(sorted(ks))
+    found = ranks > 0
+    # (len(ks), n) matrix: relevant doc retrieved within the first k
+    within = found[None, :] & (ranks[None, :] <= ks[:, None])
+    safe = np.where(found, ranks, 1)
+    reciprocal = np.where(within, 1.0 / safe, 0.0)
+    gain = np.where(within, 1.0 / np.log2(safe + 1), 0.0)
+    return pd.DataFrame({
+        'k': ks,
+        'hit_rate': within.mean(axis=1),
+        'mrr': reciprocal.mean(axis=1),
+        'recall': within.mean(axis=1),
+        'ndcg': gain.mean(axis=1),
+    }).set_index('k')
+
+
+def compare_retrievers(ground_truth, ks, backends=("qdrant",), modes=("vector",), batch_size=64):
+    """One metrics_at_k table per (backend, mode), stacked for side-by-side comparison."""
+    tables = {}
+    for backend in backends:
+        rag.search_backend = rag.build_search_backend(rag.documents, backend=backend)
+        for mode in modes:
+            start = time.time()
+            ranks = relevant_ranks(ground_truth, max(ks), batch_size=batch_size, mode=mode)
+            logging.info(f"{backend}/{mode}: retrieved {len(ranks)} questions in {time.time() - start:.2f}s")
+            tables[(backend, mode)] = metrics_at_k(ranks, ks)
+    return pd.concat(tables, names=['backend', 'mode'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate retrieval and answer quality on the ground-truth set.")
+    parser.add_argument("--checkpoint", default=os.path.join(PROJECT_ROOT, "data", "eval_checkpoint.jsonl"),
+                        help="JSONL file with per-question results; reused to resume a run")
+    parser.add_argument("--sample", type=int, default=None, help="evaluate a random sample of N questions")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--top-k", type=int, default=5, help="retrieval depth for hit rate / MRR")
+    parser.add_argument("--context-k", type=int, default=1, help="documents put into the prompt")
+    parser.add_argument("--batch-size", type=int, default=32, help="questions per batched retrieval call")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent LLM calls")
+    parser.add_argument("--rps", type=float, default=2.0, help="max LLM calls per second (0 = unlimited)")
+    parser.add_argument("--retrieval-only", action="store_true", help="skip the LLM and cosine similarity")
+    parser.add_argument("--k-grid", default=None,
+                        help="comma-separated k values; computes retrieval metrics for all of them in one pass")
+    parser.add_argument("--backends", default="qdrant", help="search backends to compare with --k-grid")
+    parser.add_argument("--modes", default="vector", help="retrieval modes to compare with --k-grid")
+    args = parser.parse_args()
+
+    rag.initialize_rag_components()
+    ground_truth = list(rag.ground_truth)
+    if args.sample:
+        ground_truth = random.Random(args.seed).sample(ground_truth, min(args.sample, len(ground_truth)))
+
+    if args.k_grid:
+        ks = [int(k) for k in args.k_grid.split(",")]
+        table = compare_retrievers(ground_truth, ks, backends=args.backends.split(","),
+                                   modes=args.modes.split(","), batch_size=args.batch_size)
+        print(table.round(4).to_string())
+        return
+
+    runner = EvaluationRunner(
+        checkpoint_path=args.checkpoint, top_k=args.top_k, context_k=args.context_k,
+        batch_size=args.batch_size, workers=args.workers, rps=args.rps, with_llm=not args.retrieval_only
+    )
+    results, evaluated, elapsed = runner.run(ground_truth)
+    report = summarize(results, rag.documents, evaluated, elapsed, with_llm=not args.retrieval_only)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
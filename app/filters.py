@@ -0,0 +1,179 @@
+import re
+
+import numpy as np
+
+# Words in a question that refer to an allergen tag used in the "allergen" column
+ALLERGEN_SYNONYMS = {
+    "dairy": "dairy", "milk": "dairy", "cheese": "dairy", "lactose": "dairy", "yogurt": "dairy",
+    "egg": "egg", "eggs": "egg",
+    "gluten": "gluten", "wheat": "gluten",
+    "fish": "fish", "seafood": "fish",
+    "nut": "nuts", "nuts": "nuts", "peanut": "nuts", "peanuts": "nuts",
+    "soy": "soy", "soya": "soy", "tofu": "soy",
+}
+MEAL_TYPES = {"breakfast": "Breakfast", "lunch": "Lunch", "dinner": "Dinner", "supper": "Dinner",
+              "snack": "Snack", "snacks": "Snack"}
+
+AGE_RANGE_RE = re.compile(r"(\d+)\s*(?:-|to)\s*(\d+)\s*-?\s*(months?|mo|years?|yrs?)\b", re.I)
+AGE_RE = re.compile(r"(\d+)\s*-?\s*(months?|mo|years?|yrs?)(?:\s*-?\s*old)?\b", re.I)
+EXCLUDE_RE = re.compile(r"\b(?:no|without|free of|avoid|avoiding|allergic to|not)\s+(\w+)", re.I)
+FREE_RE = re.compile(r"\b(\w+)[- ]free\b", re.I)
+# Asking for iron-rich food, not any mention of iron ("how much iron is in ...")
+IRON_RE = re.compile(
+    r"\biron[- ]?(?:rich|packed)\b|\b(?:high|rich) in iron\b|\b(?:lots of|plenty of|source of|packed with|full of) iron\b",
+    re.I
+)
+# Yes/no questions about a particular dish ("Is sweet potato puree iron rich?", "Does X contain dairy?").
+# Requests like "Is there ...", "Can you suggest ..." don't count.
+YES_NO_RE = re.compile(
+    r"^\s*(?:is|are|was|does|do|did|has|have|can|could|should|would|will)\s+(?!there\b|you\b|u\b|i\b|we\b|me\b)",
+    re.I
+)
+MEAL_RE = re.compile(r"\b(" + "|".join(MEAL_TYPES) + r")\b", re.I)
+MAX_TIME_RE = re.compile(
+    r"\b(?:under|less than|within|in|max|maximum|up to|no more than|at most)\s+(\d+)\s*(?:min|mins|minutes)\b", re.I
+)
+
+# Payload fields that get a Qdrant payload index
+PAYLOAD_INDEXES = {
+    "id": "keyword",
+    "iron_rich": "keyword",
+    "meal_type": "keyword",
+    "allergens": "keyword",
+    "age_min_months": "integer",
+    "age_max_months": "integer",
+    "cooking_time": "integer",
+}
+
+
+def _to_months(value, unit):
+    return int(value) * 12 if unit.lower().startswith("y") else int(value)
+
+
+def parse_age_range(text):
+    """Return (min_months, max_months) from text like "6-8 months" or "9 months", or None."""
+    text = str(text)
+    m = AGE_RANGE_RE.search(text)
+    if m:
+        return _to_months(m.group(1), m.group(3)), _to_months(m.group(2), m.group(3))
+    m = AGE_RE.search(text)
+    if m:
+        months = _to_months(m.group(1), m.group(2))
+        return months, months
+    return None
+
+
+def parse_allergens(value):
+    """Normalize the "allergen" column ("Dairy,Egg", "None", NaN) into a list of lower-case tags."""
+    if not isinstance(value, str):
+        return []
+    tags = [t.strip().lower() for t in value.split(",")]
+    return [t for t in tags if t and t not in ("none", "no")]
+
+
+def filter_fields(doc):
+    """Structured payload fields derived from a recipe, used for pre-filtering."""
+    fields = {"allergens": parse_allergens(doc.get("allergen"))}
+    age = parse_age_range(doc.get("baby_age", ""))
+    if age:
+        fields["age_min_months"], fields["age_max_months"] = age
+    return fields
+
+
+def extract_constraints(question):
+    """Pull structured constraints (age, excluded allergens, iron, meal type, max cooking time) from a question.
+
+    Only requests for recipes are constrained. A yes/no question about a dish gets no
+    constraints, as filtering on what it asks about could remove the dish itself.
+    """
+    constraints = {}
+    if YES_NO_RE.match(question):
+        return constraints
+
+    age = parse_age_range(question)
+    if age:
+        constraints["age_months"] = age
+
+    excluded = set()
+    for m in list(EXCLUDE_RE.finditer(question)) + list(FREE_RE.finditer(question)):
+        tag = ALLERGEN_SYNONYMS.get(m.group(1).lower())
+        if tag:
+            excluded.add(tag)
+    if excluded:
+        constraints["exclude_allergens"] = sorted(excluded)
+
+    if IRON_RE.search(question):
+        constraints["iron_rich"] = "Yes"
+
+    m = MEAL_RE.search(question)
+    if m:
+        constraints["meal_type"] = MEAL_TYPES[m.group(1).lower()]
+
+    m = MAX_TIME_RE.search(question)
+    if m:
+        constraints["max_cooking_time"] = int(m.group(1))
+
+    return constraints
+
+
+def to_qdrant_filter(constraints):
+    """Translate constraints into a Qdrant payload filter (None when there is nothing to filter on)."""
+    if not constraints:
+        return None
+    from qdrant_client import models
+
+    must, must_not = [], []
+    if "age_months" in constraints:
+        lo, hi = constraints["age_months"]
+        must.append(models.FieldCondition(key="age_min_months", range=models.Range(lte=hi)))
+        must.append(models.FieldCondition(key="age_max_months", range=models.Range(gte=lo)))
+    if "iron_rich" in constraints:
+        must.append(models.FieldCondition(key="iron_rich", match=models.MatchValue(value=constraints["iron_rich"])))
+    if "meal_type" in constraints:
+        must.append(models.FieldCondition(key="meal_type", match=models.MatchValue(value=constraints["meal_type"])))
+    if "max_cooking_time" in constraints:
+        must.append(models.FieldCondition(key="cooking_time", range=models.Range(lte=constraints["max_cooking_time"])))
+    if "exclude_allergens" in constraints:
+        must_not.append(models.FieldCondition(key="allergens", match=models.MatchAny(any=constraints["exclude_allergens"])))
+    return models.Filter(must=must or None, must_not=must_not or None)
+
+
+class PayloadColumns:
+    """Columnar copy of the filterable payload fields, so in-process indexes can build masks with NumPy."""
+
+    def __init__(self, payloads):
+        self.age_min = np.array([p.get("age_min_months", 0) for p in payloads], dtype=np.int32)
+        self.age_max = np.array([p.get("age_max_months", 10 ** 6) for p in payloads], dtype=np.int32)
+        self.iron_rich = np.array([str(p.get("iron_rich", "")) for p in payloads])
+        self.meal_type = np.array([str(p.get("meal_type", "")) for p in payloads])
+        self.cooking_time = np.array([_as_int(p.get("cooking_time")) for p in payloads], dtype=np.int64)
+        self.allergens = {}
+        for i, p in enumerate(payloads):
+            for tag in p.get("allergens", []):
+                self.allergens.setdefault(tag, []).append(i)
+        self.size = len(payloads)
+
+    def mask(self, constraints):
+        """Boolean mask of payloads that satisfy constraints, or None when unconstrained."""
+        if not constraints:
+            return None
+        mask = np.ones(self.size, dtype=bool)
+        if "age_months" in constraints:
+            lo, hi = constraints["age_months"]
+            mask &= (self.age_min <= hi) & (self.age_max >= lo)
+        if "iron_rich" in constraints:
+            mask &= self.iron_rich == constraints["iron_rich"]
+        if "meal_type" in constraints:
+            mask &= self.meal_type == constraints["meal_type"]
+        if "max_cooking_time" in constraints:
+            mask &= self.cooking_time <= constraints["max_cooking_time"]
+        for tag in constraints.get("exclude_allergens", []):
+            mask[self.allergens.get(tag, [])] = False
+        return mask
+
+
+def _as_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 10 ** 6
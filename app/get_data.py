@@ -1,77 +1,253 @@
-import pandas as pd
 import os
+import uuid
+import hashlib
+import logging
 from dotenv import load_dotenv
 
-from qdrant_client import QdrantClient, models
-#from fastembed import TextEmbedding
+# pandas and qdrant_client are imported inside the functions that use them, so importing
+# this module (and app.rag) stays cheap for workers and CLI tools
 
 
-from app.config_loader import DATA_PATH, GROUND_TRUTH_PATH, MODEL, COLLECTION_NAME, EMBEDDING_DIMENSIONALITY
+from app.embedding_store import embed_documents
+from app.filters import filter_fields, PAYLOAD_INDEXES
+from app.config_loader import (DATA_PATH, GROUND_TRUTH_PATH, MODEL, COLLECTION_NAME, EMBEDDING_DIMENSIONALITY,
+                               INDEX_MODE, VECTOR_QUANTIZATION)
 
 TEXT_FIELDS = ["dish_name", "baby_age", "iron_rich", "allergen", "ingredients", "cooking_time","recipe", "texture", 
                "meal_type", "calories", "preparation_difficulty"]
 
+# Namespace for deterministic point IDs, so the same recipe always maps to the same Qdrant point
+POINT_ID_NAMESPACE = uuid.UUID("6f1c2a52-3b8e-4c1e-9a57-0b2f4b8d7e11")
+SCROLL_BATCH_SIZE = 256
+# Points per upsert request, so large corpora aren't sent in one giant request
+UPSERT_BATCH_SIZE = 256
+# Bump when the payload layout changes so sync re-upserts every point (vectors come from the embedding store)
+PAYLOAD_SCHEMA_VERSION = 2
 
 
 def load_data(path=DATA_PATH):
+    import pandas as pd
+
     df = pd.read_csv(path, sep=';')
 
     documents = df.to_dict(orient='records')
     return documents
 
 
-def create_collection_and_upsert(documents, model=MODEL, collection_name=COLLECTION_NAME):
-    load_dotenv()
-    
-    QD_CLIENT = QdrantClient("http://localhost:6333")
+def get_qdrant_client():
+    from qdrant_client import QdrantClient
 
+    load_dotenv()
     qdrant_host = os.getenv("QDRANT_HOST", "localhost")
-    QD_CLIENT = QdrantClient(f"http://{qdrant_host}:6333")
-    
-    try:
-        QD_CLIENT.delete_collection(collection_name=collection_name)
-    except Exception as e:
-        print(f"Collection {collection_name} doesn't exist or couldn't be deleted: {e}")
-    
-    try:
-        QD_CLIENT.create_collection(
-            collection_name=COLLECTION_NAME,
+    return QdrantClient(f"http://{qdrant_host}:6333")
+
+
+def document_text(doc):
+    """Text that gets embedded for a recipe."""
+    return ' '.join(str(doc.get(field, "")) for field in TEXT_FIELDS)
+
+
+def content_hash(doc, model=MODEL):
+    """Hash of the embedding model, embedded fields and payload schema, used to detect changed recipes."""
+    return hashlib.sha1(f"{PAYLOAD_SCHEMA_VERSION}:{model}:{document_text(doc)}".encode("utf-8")).hexdigest()
+
+
+def collection_version(documents, model=MODEL):
+    """Fingerprint of the indexed corpus; changes whenever any recipe is added, changed or removed."""
+    hashes = sorted(f"{point_id(doc)}:{content_hash(doc, model)}" for doc in documents)
+    return hashlib.sha1("\n".join(hashes).encode("utf-8")).hexdigest()
+
+
+def document_payload(doc, model=MODEL):
+    """Payload stored with every point, including the derived fields used for filtering."""
+    return {**doc, **filter_fields(doc), "content_hash": content_hash(doc, model)}
+
+
+def point_id(doc):
+    """Stable point ID derived from the recipe id (or dish name when there is no id)."""
+    key = doc.get("id")
+    if key is None:
+        key = doc.get("dish_name", "")
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, str(key)))
+
+
+def quantization_config(quantization):
+    """Qdrant quantization config for "scalar" (int8) or "binary"; None for "none".
+
+    Quantized vectors are kept in RAM while the originals, only read for rescoring, stay on disk.
+    """
+    from qdrant_client import models
+
+    if quantization == "scalar":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    if quantization == "binary":
+        return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True))
+    if quantization == "none":
+        return None
+    raise ValueError(f"Unknown quantization {quantization!r}")
+
+
+def _quantization_mode(info):
+    """Quantization mode ("scalar", "binary" or "none") of an existing collection."""
+    config = info.config.quantization_config
+    if config is None:
+        return "none"
+    return "scalar" if getattr(config, "scalar", None) is not None else "binary"
+
+
+def _ensure_collection(client, collection_name, quantization=VECTOR_QUANTIZATION):
+    """Create the collection if it doesn't exist yet and make sure the payload indexes are there.
+
+    The quantization of an existing collection is switched in place; whether the original
+    vectors live on disk is only decided when the collection is created.
+    """
+    from qdrant_client import models
+
+    created = False
+    if not client.collection_exists(collection_name=collection_name):
+        client.create_collection(
+            collection_name=collection_name,
             vectors_config=models.VectorParams(
                 size=EMBEDDING_DIMENSIONALITY,
-                distance=models.Distance.COSINE
-            )
+                distance=models.Distance.COSINE,
+                on_disk=quantization != "none"
+            ),
+            quantization_config=quantization_config(quantization)
         )
-    except Exception as e:
-        print(f"Collection {COLLECTION_NAME} already exists. {e}")
+        created = True
+    elif _quantization_mode(client.get_collection(collection_name=collection_name)) != quantization:
+        logging.info(f"Switching {collection_name} to {quantization} quantization")
+        client.update_collection(
+            collection_name=collection_name,
+            quantization_config=quantization_config(quantization) or models.Disabled.DISABLED
+        )
+
+    # Creating an index that already exists is a no-op, so older collections pick up new indexes too
+    for field_name, field_schema in PAYLOAD_INDEXES.items():
+        client.create_payload_index(
+            collection_name=collection_name,
+            field_name=field_name,
+            field_schema=field_schema
+        )
+    return created
+
+
+def _stored_hashes(client, collection_name):
+    """Return {point_id: content_hash} for everything currently in the collection."""
+    stored = {}
+    offset = None
+    while True:
+        records, offset = client.scroll(
+            collection_name=collection_name,
+            limit=SCROLL_BATCH_SIZE,
+            offset=offset,
+            with_payload=["content_hash"],
+            with_vectors=False
+        )
+        for r in records:
+            stored[str(r.id)] = (r.payload or {}).get("content_hash")
+        if offset is None:
+            break
+    return stored
+
+
+def _build_points(documents, model):
+    """Build points, taking vectors from the embedding store and embedding only unseen texts."""
+    from qdrant_client import models
+
+    vectors = embed_documents([document_text(doc) for doc in documents], model=model)
+    return [
+        models.PointStruct(
+            id=point_id(doc),
+            vector=vector.tolist(),
+            payload=document_payload(doc, model)
+        )
+        for doc, vector in zip(documents, vectors)
+    ]
+
+
+def _upsert_documents(client, collection_name, documents, model):
+    """Embed and upsert documents UPSERT_BATCH_SIZE points at a time."""
+    for b in range(0, len(documents), UPSERT_BATCH_SIZE):
+        client.upsert(collection_name=collection_name, points=_build_points(documents[b:b + UPSERT_BATCH_SIZE], model))
+
+
+def sync_collection(client, documents, model=MODEL, collection_name=COLLECTION_NAME, quantization=VECTOR_QUANTIZATION):
+    """Bring the collection in line with documents, re-embedding only added or changed recipes.
+
+    Returns a dict with the number of added, updated, deleted and unchanged points.
+    """
+    _ensure_collection(client, collection_name, quantization)
+    stored = _stored_hashes(client, collection_name)
 
-    QD_CLIENT.create_payload_index(
-        collection_name=COLLECTION_NAME,
-        field_name="id",
-        field_schema="keyword"
-    )
+    wanted = {point_id(doc): doc for doc in documents}
+    changed = []
+    stats = {"added": 0, "updated": 0, "deleted": 0, "unchanged": 0}
 
-    points = []
+    for pid, doc in wanted.items():
+        if pid not in stored:
+            stats["added"] += 1
+        elif stored[pid] != content_hash(doc, model):
+            stats["updated"] += 1
+        else:
+            stats["unchanged"] += 1
+            continue
+        changed.append(doc)
 
-    for i, doc in enumerate(documents):
-        text = ' '.join(str(doc.get(field, "")) for field in TEXT_FIELDS)
+    stale = [pid for pid in stored if pid not in wanted]
+    stats["deleted"] = len(stale)
 
-        vector = models.Document(text=text, model=model)
-        point = models.PointStruct(
-            id=i,
-            vector=vector,
-            payload=doc
+    if changed:
+        _upsert_documents(client, collection_name, changed, model)
+    if stale:
+        from qdrant_client import models
+
+        client.delete(
+            collection_name=collection_name,
+            points_selector=models.PointIdsList(points=stale)
         )
-        points.append(point)
 
-    QD_CLIENT.upsert(
-        collection_name=collection_name,
-        points=points
-    )
-    
+    logging.info(f"Collection {collection_name} synced: {stats}")
+    return stats
+
+
+def recreate_collection(client, documents, model=MODEL, collection_name=COLLECTION_NAME,
+                        quantization=VECTOR_QUANTIZATION):
+    """Drop the collection and index every document from scratch."""
+    try:
+        client.delete_collection(collection_name=collection_name)
+    except Exception as e:
+        logging.warning(f"Collection {collection_name} doesn't exist or couldn't be deleted: {e}")
+
+    _ensure_collection(client, collection_name, quantization)
+    _upsert_documents(client, collection_name, documents, model)
+
+
+def create_collection_and_upsert(documents, model=MODEL, collection_name=COLLECTION_NAME, mode=INDEX_MODE,
+                                 quantization=VECTOR_QUANTIZATION):
+    """Index documents in Qdrant.
+
+    mode="sync" only re-embeds added or changed recipes and removes deleted ones;
+    mode="recreate" drops the collection and rebuilds it. quantization is "none",
+    "scalar" (int8) or "binary".
+    """
+    QD_CLIENT = get_qdrant_client()
+
+    if mode == "recreate":
+        recreate_collection(QD_CLIENT, documents, model=model, collection_name=collection_name,
+                            quantization=quantization)
+    else:
+        sync_collection(QD_CLIENT, documents, model=model, collection_name=collection_name,
+                        quantization=quantization)
+
     return QD_CLIENT
         
 
 def get_ground_truth(path=GROUND_TRUTH_PATH):
+    import pandas as pd
+
     df = pd.read_csv(path, sep=',')
     ground_truth = df.to_dict(orient='records')
     return ground_truth
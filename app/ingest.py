@@ -0,0 +1,191 @@
+"""Streaming ingest of a large recipe CSV into Qdrant with bounded memory.
+
+    python -m app.ingest --data data/synthetic/recipes.csv --collection recipes_1m --recreate
+    python -m app.ingest --data data/synthetic/recipes.csv --workers 8 --max-in-flight 4 --output ingest.json
+
+The CSV is read INGEST_CHUNK_SIZE rows at a time and cut into INGEST_BATCH_SIZE batches.
+Batches are embedded and turned into points across a process pool (the cores are split
+between the workers' models), then upserted from a few threads. At most
+INGEST_MAX_IN_FLIGHT upserts and two embedding batches per worker are pending at any
+time; when they are, reading waits, so memory is bounded by the pipeline depth, not the
+file size. Progress lines and the final report give rows per second and peak RSS: of this
+process, of the largest worker, and the sum of the workers' peaks (an upper bound for the
+pool, since the workers need not peak at the same time).
+
+Unlike create_collection_and_upsert() this never holds the corpus in memory and does
+not delete points missing from the CSV (use --recreate for a clean collection). Vectors
+go straight from the model to Qdrant, past the embedding store, which would otherwise keep
+a second float32 copy of the whole corpus on disk.
+"""
+import os
+import json
+import time
+import logging
+import argparse
+import resource
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from app.get_data import get_qdrant_client, document_text, document_payload, point_id, _ensure_collection
+from app.config_loader import (DATA_PATH, MODEL, COLLECTION_NAME, VECTOR_QUANTIZATION, INGEST_CHUNK_SIZE,
+                               INGEST_BATCH_SIZE, INGEST_WORKERS, INGEST_MAX_IN_FLIGHT)
+
+# Embedding model of a worker process
+_worker_model = None
+
+
+def load_model(model, threads):
+    from fastembed import TextEmbedding
+
+    return TextEmbedding(model, threads=threads)
+
+
+def _init_worker(model, threads):
+    global _worker_model
+    _worker_model = load_model(model, threads)
+
+
+def _prepare(documents, model):
+    """Worker side of a batch: point ids, vectors and payloads, ready to upsert, plus (pid, peak RSS in MB)."""
+    vectors = [v.tolist() for v in _worker_model.embed([document_text(doc) for doc in documents])]
+    prepared = [point_id(doc) for doc in documents], vectors, [document_payload(doc, model) for doc in documents]
+    return prepared, (os.getpid(), peak_rss_mb())
+
+
+def read_batches(path, chunk_size, batch_size):
+    """Yield lists of up to batch_size documents, reading the CSV chunk_size rows at a time."""
+    import pandas as pd
+
+    for chunk in pd.read_csv(path, sep=';', chunksize=chunk_size):
+        documents = chunk.to_dict(orient='records')
+        for b in range(0, len(documents), batch_size):
+            yield documents[b:b + batch_size]
+
+
+def peak_rss_mb():
+    """Peak resident set size of the calling process, in MB."""
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+class Ingest:
+    """Read -> embed (process pool) -> upsert (thread pool), with bounded queues between the stages."""
+
+    def __init__(self, client, collection_name, workers, max_in_flight, model=MODEL):
+        self.client = client
+        self.collection_name = collection_name
+        self.workers = workers
+        self.max_in_flight = max_in_flight
+        self.model = model
+        self.rows = 0
+        self.started = None
+        self._uploads = set()
+        self._worker_rss = {}  # worker pid -> peak RSS (MB) it last reported
+
+    def _upsert(self, ids, vectors, payloads):
+        from qdrant_client import models
+
+        # A columnar Batch is much cheaper to build than one PointStruct per row
+        self.client.upsert(
+            collection_name=self.collection_name,
+            points=models.Batch(ids=ids, vectors=vectors, payloads=payloads)
+        )
+        return len(ids)
+
+    def _drain_uploads(self, limit):
+        """Wait until at most `limit` upserts are pending; re-raises the first failure."""
+        while len(self._uploads) > limit:
+            done, self._uploads = wait(self._uploads, return_when=FIRST_COMPLETED)
+            for future in done:
+                self.rows += future.result()
+
+    def _progress(self):
+        elapsed = time.perf_counter() - self.started
+        logging.info(f"{self.rows:,} rows, {self.rows / elapsed:,.0f} rows/s, peak RSS {peak_rss_mb()} MB, "
+                     f"workers {self._workers_rss_mb()} MB")
+
+    def _workers_rss_mb(self):
+        """Sum of the workers' peak RSS; an upper bound for the pool as a whole."""
+        return round(sum(self._worker_rss.values()), 1)
+
+    def run(self, batches):
+        self.started = time.perf_counter()
+        embedding, last_report = deque(), 0
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        with ProcessPoolExecutor(self.workers, initializer=_init_worker, initargs=(self.model, threads)) as pool, \
+                ThreadPoolExecutor(self.max_in_flight, thread_name_prefix="upsert") as uploader:
+
+            def hand_over():
+                prepared, (pid, rss) = embedding.popleft().result()
+                self._worker_rss[pid] = rss
+                # Backpressure: wait for a free upsert slot before queueing another one
+                self._drain_uploads(self.max_in_flight - 1)
+                self._uploads.add(uploader.submit(self._upsert, *prepared))
+
+            for documents in batches:
+                embedding.append(pool.submit(_prepare, documents, self.model))
+                # ... and a free embedding slot before reading more of the file
+                while len(embedding) >= 2 * self.workers:
+                    hand_over()
+                if self.rows - last_report >= 50000:
+                    last_report = self.rows
+                    self._progress()
+            while embedding:
+                hand_over()
+            self._drain_uploads(0)
+
+        elapsed = time.perf_counter() - self.started
+        return {
+            "rows": self.rows,
+            "elapsed_s": round(elapsed, 2),
+            "rows_per_second": round(self.rows / elapsed, 1) if elapsed else None,
+            "workers": self.workers,
+            "max_in_flight": self.max_in_flight,
+            "peak_rss_mb": peak_rss_mb(),
+            "peak_rss_largest_worker_mb": max(self._worker_rss.values(), default=0.0),
+            "peak_rss_workers_sum_mb": self._workers_rss_mb(),
+        }
+
+
+def ingest(path=DATA_PATH, collection_name=COLLECTION_NAME, chunk_size=INGEST_CHUNK_SIZE,
+           batch_size=INGEST_BATCH_SIZE, workers=INGEST_WORKERS, max_in_flight=INGEST_MAX_IN_FLIGHT,
+           recreate=False, quantization=VECTOR_QUANTIZATION, model=MODEL):
+    """Stream the CSV at path into the collection; returns the report dict."""
+    client = get_qdrant_client()
+    if recreate and client.collection_exists(collection_name=collection_name):
+        client.delete_collection(collection_name=collection_name)
+    _ensure_collection(client, collection_name, quantization)
+
+    workers = workers or os.cpu_count() or 1
+    logging.info(f"Ingesting {path} into {collection_name} with {workers} embedding workers")
+    report = Ingest(client, collection_name, workers, max_in_flight, model).run(
+        read_batches(path, chunk_size, batch_size)
+    )
+    return {"source": path, "collection": collection_name, "chunk_size": chunk_size, "batch_size": batch_size,
+            **report}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream a recipe CSV into Qdrant with bounded memory.")
+    parser.add_argument("--data", default=DATA_PATH, help="';'-separated recipe CSV")
+    parser.add_argument("--collection", default=COLLECTION_NAME)
+    parser.add_argument("--chunk-size", type=int, default=INGEST_CHUNK_SIZE, help="rows read from the CSV at a time")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE, help="rows per embedding/upsert batch")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="embedding processes (0 = all cores)")
+    parser.add_argument("--max-in-flight", type=int, default=INGEST_MAX_IN_FLIGHT, help="concurrent upserts")
+    parser.add_argument("--recreate", action="store_true", help="drop the collection first")
+    parser.add_argument("--quantization", default=VECTOR_QUANTIZATION, choices=["none", "scalar", "binary"])
+    parser.add_argument("--output", default=None, help="also write the report as JSON to this file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    report = ingest(args.data, args.collection, args.chunk_size, args.batch_size, args.workers, args.max_in_flight,
+                    args.recreate, args.quantization)
+    print(json.dumps(report, indent=2))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""Replay the ground-truth questions against /ask and report latency, errors and throughput.
+
+    python -m app.load_test --rps 5 --requests 300
+    python -m app.load_test --concurrency 16 --duration 60 --output data/benchmarks/load_test.json
+
+--rps is an open-loop test: requests start on schedule whether or not earlier ones have
+finished, and latency is measured from the scheduled start so a slow server can't hide
+its queueing. --concurrency is a closed loop with that many clients. Per-stage latency
+comes from the difference of the server's /metrics before and after the run (with
+several workers this needs PROMETHEUS_MULTIPROC_DIR, as set by app.serve).
+
+Run it offline against the mock LLM: start `python -m app.mock_llm`, then the app with
+GROQ_BASE_URL=http://localhost:8000.
+"""
+import os
+import csv
+import json
+import time
+import random
+import argparse
+import threading
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+from app.config_loader import GROUND_TRUTH_PATH
+
+PERCENTILES = (50, 95, 99)
+
+_local = threading.local()
+
+
+def load_questions(path=GROUND_TRUTH_PATH, shuffle=False, seed=42):
+    with open(path, newline="") as f:
+        questions = [row["question"] for row in csv.DictReader(f) if row.get("question")]
+    if shuffle:
+        random.Random(seed).shuffle(questions)
+    return questions
+
+
+def _session():
+    if not hasattr(_local, "session"):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def send(url, question, timeout, started=None):
+    """POST one question; returns (status or error name, latency in seconds)."""
+    started = started if started is not None else time.perf_counter()
+    try:
+        response = _session().post(url, json={"question": question}, timeout=timeout)
+        outcome = response.status_code
+    except requests.RequestException as e:
+        outcome = type(e).__name__
+    return outcome, time.perf_counter() - started
+
+
+def run_open_loop(url, questions, rps, total, timeout, max_workers=256):
+    """Start `total` requests at a fixed rate; latency includes any wait for a free client."""
+    results = []
+    interval = 1.0 / rps
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        start = time.perf_counter()
+        futures = []
+        for i in range(total):
+            scheduled = start + i * interval
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(send, url, questions[i % len(questions)], timeout, scheduled))
+        results = [f.result() for f in futures]
+    return results, time.perf_counter() - start
+
+
+def run_closed_loop(url, questions, concurrency, total, duration, timeout):
+    """`concurrency` clients send back to back until `total` requests or `duration` seconds."""
+    results, lock = [], threading.Lock()
+    counter = iter(range(total if total else 2 ** 62))
+    start = time.perf_counter()
+    deadline = start + duration if duration else None
+
+    def client():
+        while deadline is None or time.perf_counter() < deadline:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            result = send(url, questions[i % len(questions)], timeout)
+            with lock:
+                results.append(result)
+
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, time.perf_counter() - start
+
+
+def scrape_histograms(metrics_url, names=("rag_stage_latency_seconds", "api_request_latency_seconds")):
+    """{(metric, label): {"buckets": {le: count}, "sum": s, "count": n}} from a /metrics page (None if down)."""
+    from prometheus_client.parser import text_string_to_metric_families
+
+    try:
+        text = requests.get(metrics_url, timeout=10).text
+    except requests.RequestException:
+        return None
+    histograms = defaultdict(lambda: {"buckets": {}, "sum": 0.0, "count": 0.0})
+    for family in text_string_to_metric_families(text):
+        if family.name not in names:
+            continue
+        for sample in family.samples:
+            label = sample.labels.get("stage") or sample.labels.get("endpoint")
+            entry = histograms[(family.name, label)]
+            if sample.name.endswith("_bucket"):
+                le = float(sample.labels["le"])
+                entry["buckets"][le] = entry["buckets"].get(le, 0.0) + sample.value
+            elif sample.name.endswith("_sum"):
+                entry["sum"] += sample.value
+            elif sample.name.endswith("_count"):
+                entry["count"] += sample.value
+    return histograms
+
+
+def bucket_quantile(q, buckets):
+    """Prometheus-style histogram_quantile over cumulative {le: count} buckets."""
+    bounds = sorted(buckets)
+    total = buckets[bounds[-1]] if bounds else 0
+    if not total:
+        return None
+    rank = q * total
+    prev_le, prev_count = 0.0, 0.0
+    for le in bounds:
+        count = buckets[le]
+        if count >= rank:
+            if le == float("inf"):
+                return prev_le
+            if count == prev_count:
+                return le
+            return prev_le + (le - prev_le) * (rank - prev_count) / (count - prev_count)
+        prev_le, prev_count = le, count
+    return prev_le
+
+
+def stage_report(before, after):
+    """Per-stage (and per-endpoint) count, mean and percentiles of what happened during the run."""
+    report = {}
+    for key, entry in after.items():
+        base = before.get(key, {"buckets": {}, "sum": 0.0, "count": 0.0})
+        count = entry["count"] - base["count"]
+        if count <= 0:
+            continue
+        buckets = {le: c - base["buckets"].get(le, 0.0) for le, c in entry["buckets"].items()}
+        metric, label = key
+        stats = {"count": int(count), "mean_ms": round(1000 * (entry["sum"] - base["sum"]) / count, 1)}
+        for p in PERCENTILES:
+            value = bucket_quantile(p / 100, buckets)
+            stats[f"p{p}_ms"] = round(1000 * value, 1) if value is not None else None
+        report[f"{'stage' if metric.startswith('rag_stage') else 'endpoint'}:{label}"] = stats
+    return report
+
+
+def summarize(results, elapsed):
+    outcomes = Counter(outcome for outcome, _ in results)
+    ok = [latency for outcome, latency in results if outcome == 200]
+    report = {
+        "requests": len(results),
+        "ok": len(ok),
+        "errors": {str(k): v for k, v in outcomes.items() if k != 200},
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(ok) / elapsed, 2) if elapsed else 0.0,
+        "offered_rps": round(len(results) / elapsed, 2) if elapsed else 0.0,
+    }
+    if ok:
+        latencies = np.asarray(ok) * 1000
+        for p in PERCENTILES:
+            report[f"p{p}_ms"] = round(float(np.percentile(latencies, p)), 1)
+        report["max_ms"] = round(float(latencies.max()), 1)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test /ask with the ground-truth questions.")
+    parser.add_argument("--url", default="http://localhost:5000", help="base URL of the app")
+    parser.add_argument("--endpoint", default="/ask")
+    parser.add_argument("--questions", default=GROUND_TRUTH_PATH, help="CSV with a question column")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--rps", type=float, default=None, help="open loop: requests started per second")
+    mode.add_argument("--concurrency", type=int, default=None, help="closed loop: parallel clients (default 8)")
+    parser.add_argument("--requests", type=int, default=200, help="requests to send (0 = until --duration)")
+    parser.add_argument("--duration", type=float, default=None, help="stop a closed-loop run after N seconds")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-request timeout in seconds")
+    parser.add_argument("--shuffle", action="store_true", help="replay the questions in random order")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default=None, help="also write the report as JSON to this file")
+    args = parser.parse_args()
+    if not args.rps and not args.requests and not args.duration:
+        parser.error("--requests 0 needs --duration")
+
+    questions = load_questions(args.questions, args.shuffle, args.seed)
+    url = args.url.rstrip("/") + args.endpoint
+    metrics_url = args.url.rstrip("/") + "/metrics"
+
+    before = scrape_histograms(metrics_url)
+    if args.rps:
+        total = args.requests or int(args.rps * (args.duration or 60))
+        results, elapsed = run_open_loop(url, questions, args.rps, total, args.timeout)
+    else:
+        results, elapsed = run_closed_loop(url, questions, args.concurrency or 8, args.requests, args.duration,
+                                           args.timeout)
+    after = scrape_histograms(metrics_url)
+
+    report = {
+        "target": url,
+        "mode": f"open loop at {args.rps} rps" if args.rps else f"closed loop with {args.concurrency or 8} clients",
+        **summarize(results, elapsed),
+    }
+    if before is not None and after is not None:
+        report["server"] = stage_report(before, after)
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
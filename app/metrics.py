@@ -0,0 +1,105 @@
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (Counter, Gauge, Histogram, CollectorRegistry, generate_latest, multiprocess,
+                               CONTENT_TYPE_LATEST)
+
+# API metrics, shared by the Flask and the async app
+REQUEST_COUNT = Counter("api_requests_total", "Total API requests", ["endpoint", "method", "status"])
+REQUEST_LATENCY = Histogram("api_request_latency_seconds", "Request latency in seconds", ["endpoint"])
+FEEDBACK_COUNT = Counter("feedback_total", "Feedback counts", ["feedback"])
+
+# Gauges are summed over live workers when running with several processes
+CACHE_HITS = Counter("cache_hits_total", "Cache hits", ["cache"])
+CACHE_MISSES = Counter("cache_misses_total", "Cache misses", ["cache"])
+CACHE_EVICTIONS = Counter("cache_evictions_total", "Cache evictions", ["cache"])
+CACHE_SIZE = Gauge("cache_entries", "Number of entries in the cache", ["cache"], multiprocess_mode="livesum")
+
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "llm_time_to_first_token_seconds", "Time from request start to the first streamed answer token", ["endpoint"]
+)
+
+# Per-stage breakdown of rag(): embed, search, lexical, fusion, cache_lookup, build_prompt, llm
+RAG_STAGE_LATENCY = Histogram(
+    "rag_stage_latency_seconds", "Latency of each RAG pipeline stage in seconds", ["stage"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+DB_WRITE_LATENCY = Histogram("db_write_latency_seconds", "Latency of Postgres writes in seconds", ["operation"])
+
+LLM_PROMPT_TOKENS = Counter("llm_prompt_tokens_total", "Prompt tokens sent to the LLM")
+LLM_COMPLETION_TOKENS = Counter("llm_completion_tokens_total", "Completion tokens returned by the LLM")
+CONTEXT_CHARACTERS = Counter("rag_context_characters_total", "Characters of retrieved context put into prompts")
+CONTEXT_DOCUMENTS = Counter("rag_context_documents_total", "Retrieved documents put into prompts")
+PROMPTS_BUILT = Counter("rag_prompts_total", "Prompts built by the RAG pipeline")
+CONTEXT_TOKENS = Counter("rag_context_tokens_total", "Estimated tokens of retrieved context put into prompts")
+CONTEXT_TOKENS_SAVED = Counter(
+    "rag_context_tokens_saved_total", "Estimated context tokens saved by deduplication and the token budget"
+)
+CONTEXT_TOKENS_ADDED = Counter(
+    "rag_context_tokens_added_total", "Estimated context tokens added over the plain entries (shared-step notes)"
+)
+CONTEXT_HITS_TRIMMED = Counter("rag_context_hits_trimmed_total", "Hits cut to fit the context budget", ["action"])
+
+# Single-flight: identical prompts in flight at the same time share one LLM call
+SINGLE_FLIGHT_CALLS = Counter(
+    "llm_single_flight_calls_total", "LLM calls that were executed or coalesced onto an identical in-flight call",
+    ["client", "outcome"]
+)
+SINGLE_FLIGHT_IN_FLIGHT = Gauge(
+    "llm_single_flight_in_flight", "Distinct LLM calls currently in flight", ["client"], multiprocess_mode="livesum"
+)
+
+# Deadlines, hedged LLM requests and the circuit breaker around Groq
+LLM_ATTEMPTS = Counter("llm_attempts_total", "LLM attempts by kind (primary/hedge) and outcome", ["kind", "outcome"])
+LLM_HEDGE_WINS = Counter("llm_hedge_wins_total", "Hedged LLM calls by the attempt that answered first",
+                         ["client", "winner"])
+DEADLINE_EXCEEDED = Counter("rag_deadline_exceeded_total", "Requests that ran out of their deadline", ["stage"])
+# 0 = closed, 1 = half-open, 2 = open; the worst worker wins
+BREAKER_STATE = Gauge("circuit_breaker_state", "Circuit breaker state", ["breaker"], multiprocess_mode="max")
+BREAKER_TRANSITIONS = Counter("circuit_breaker_transitions_total", "Circuit breaker state changes",
+                              ["breaker", "state"])
+BREAKER_REJECTED = Counter("circuit_breaker_rejected_total", "Calls rejected by an open circuit breaker", ["breaker"])
+
+# Admission control in front of the RAG pipeline
+ADMISSION_IN_FLIGHT = Gauge("admission_in_flight", "Requests holding an admission slot", ["pool"],
+                            multiprocess_mode="livesum")
+ADMISSION_QUEUED = Gauge("admission_queued", "Requests waiting for an admission slot", ["pool"],
+                         multiprocess_mode="livesum")
+ADMISSION_REJECTED = Counter("admission_rejected_total", "Requests turned away by admission control",
+                             ["pool", "reason"])
+ADMISSION_WAIT = Histogram(
+    "admission_wait_seconds", "Time spent waiting for an admission slot", ["pool", "priority"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+
+
+@contextmanager
+def track_latency(histogram, label):
+    """Observe the duration of the with-block in histogram.labels(label)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.labels(label).observe(time.perf_counter() - start)
+
+
+def track_stage(stage):
+    return track_latency(RAG_STAGE_LATENCY, stage)
+
+
+def record_usage(usage):
+    """Count prompt/completion tokens from an LLM response's usage block (if present)."""
+    if usage is None:
+        return
+    LLM_PROMPT_TOKENS.inc(getattr(usage, "prompt_tokens", 0) or 0)
+    LLM_COMPLETION_TOKENS.inc(getattr(usage, "completion_tokens", 0) or 0)
+
+
+def metrics_payload():
+    """Render metrics; aggregates all workers when PROMETHEUS_MULTIPROC_DIR is set."""
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
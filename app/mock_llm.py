@@ -0,0 +1,206 @@
+"""Offline stand-in for the Groq chat-completions API, for load tests and local development.
+
+    python -m app.mock_llm --port 8000 --latency lognormal --latency-ms 400 --tokens-per-sec 250 --error-rate 0.02
+    GROQ_BASE_URL=http://localhost:8000 GROQ_API_KEY=mock python -m app.app
+
+Serves POST /openai/v1/chat/completions (plain and streamed) in the shape the Groq SDK
+expects, including the usage block under x_groq on the last streamed chunk. The time
+to the first token is drawn from --latency, the rest of the answer is produced at
+--tokens-per-sec, and --error-rate of the requests fail with --error-status.
+"""
+import re
+import json
+import time
+import uuid
+import random
+import logging
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+COMPLETIONS_PATH = "/openai/v1/chat/completions"
+DISH_RE = re.compile(r"^Dish: (.+)$", re.M)
+CHARS_PER_TOKEN = 4
+
+ERROR_BODIES = {
+    429: {"message": "Rate limit reached (mock)", "type": "tokens", "code": "rate_limit_exceeded"},
+    500: {"message": "Internal server error (mock)", "type": "internal_server_error"},
+    503: {"message": "Service unavailable (mock)", "type": "service_unavailable"},
+}
+
+
+class MockSettings:
+    """Latency, token rate and error injection for the mock; draws are thread-safe and seeded."""
+
+    def __init__(self, latency="lognormal", latency_ms=300.0, latency_spread=0.5, tokens_per_sec=250.0,
+                 completion_tokens=120, think_tokens=0, error_rate=0.0, error_status=429, seed=None):
+        self.latency = latency
+        self.latency_ms = latency_ms
+        self.latency_spread = latency_spread
+        self.tokens_per_sec = tokens_per_sec
+        self.completion_tokens = completion_tokens
+        self.think_tokens = think_tokens
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def time_to_first_token(self):
+        """Seconds before the first token; latency_ms is the median (mean for exponential)."""
+        with self._lock:
+            if self.latency == "fixed":
+                ms = self.latency_ms
+            elif self.latency == "uniform":
+                ms = self._rng.uniform(self.latency_ms * (1 - self.latency_spread),
+                                       self.latency_ms * (1 + self.latency_spread))
+            elif self.latency == "exponential":
+                ms = self._rng.expovariate(1.0 / self.latency_ms)
+            else:
+                ms = self._rng.lognormvariate(0.0, self.latency_spread) * self.latency_ms
+        return max(ms, 0.0) / 1000
+
+    def should_fail(self):
+        with self._lock:
+            return self._rng.random() < self.error_rate
+
+
+def answer_tokens(prompt, completion_tokens, think_tokens=0):
+    """Word-sized tokens of a deterministic answer that names the dishes found in the prompt."""
+    dishes = DISH_RE.findall(prompt) or ["a simple purée"]
+    sentence = f"For this question I would suggest {', '.join(dishes)}; follow the recipe in the context."
+    words = sentence.split()
+    tokens = [(" " if i else "") + words[i % len(words)] for i in range(max(completion_tokens, len(words)))]
+    if think_tokens:
+        tokens = ["<think>"] + [" hmm"] * think_tokens + ["</think>\n"] + tokens
+    return tokens
+
+
+def usage(prompt, tokens):
+    prompt_tokens = max(1, len(prompt) // CHARS_PER_TOKEN)
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": len(tokens),
+            "total_tokens": prompt_tokens + len(tokens)}
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    settings = MockSettings()
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        logging.debug("%s - %s", self.address_string(), format % args)
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/healthz":
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if self.path != COMPLETIONS_PATH:
+            self._send_json(404, {"error": {"message": f"unknown path {self.path}"}})
+            return
+
+        settings = self.settings
+        ttft = settings.time_to_first_token()
+        if settings.should_fail():
+            time.sleep(ttft)
+            status = settings.error_status
+            headers = {"retry-after": "1"} if status == 429 else {}
+            self._send_json(status, {"error": ERROR_BODIES.get(status, ERROR_BODIES[500])}, headers)
+            return
+
+        prompt = "\n".join(str(m.get("content", "")) for m in request.get("messages", []))
+        tokens = answer_tokens(prompt, settings.completion_tokens, settings.think_tokens)
+        per_token = 1.0 / settings.tokens_per_sec if settings.tokens_per_sec else 0.0
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model = request.get("model", "mock")
+        time.sleep(ttft)
+
+        if request.get("stream"):
+            self._stream(completion_id, model, tokens, per_token, usage(prompt, tokens))
+            return
+
+        time.sleep(per_token * len(tokens))
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(tokens)},
+                         "finish_reason": "stop", "logprobs": None}],
+            "usage": usage(prompt, tokens),
+            "x_groq": {"id": completion_id},
+        })
+
+    def _stream(self, completion_id, model, tokens, per_token, usage_block):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def chunk(delta, finish_reason=None, **extra):
+            body = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                    "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                    **extra}
+            self.wfile.write(f"data: {json.dumps(body)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        chunk({"role": "assistant", "content": ""})
+        for token in tokens:
+            chunk({"content": token})
+            time.sleep(per_token)
+        chunk({}, "stop", x_groq={"id": completion_id, "usage": usage_block})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the Groq chat-completions API.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", choices=["fixed", "uniform", "exponential", "lognormal"], default="lognormal",
+                        help="distribution of the time to first token")
+    parser.add_argument("--latency-ms", type=float, default=300.0,
+                        help="median time to first token (mean for exponential)")
+    parser.add_argument("--latency-spread", type=float, default=0.5,
+                        help="sigma for lognormal, relative half-width for uniform")
+    parser.add_argument("--tokens-per-sec", type=float, default=250.0, help="generation speed (0 = instant)")
+    parser.add_argument("--completion-tokens", type=int, default=120, help="answer length in tokens")
+    parser.add_argument("--think-tokens", type=int, default=0, help="length of a leading <think> block")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, choices=sorted(ERROR_BODIES), default=429)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    MockHandler.settings = MockSettings(
+        latency=args.latency, latency_ms=args.latency_ms, latency_spread=args.latency_spread,
+        tokens_per_sec=args.tokens_per_sec, completion_tokens=args.completion_tokens,
+        think_tokens=args.think_tokens, error_rate=args.error_rate, error_status=args.error_status, seed=args.seed
+    )
+    server = ThreadingHTTPServer((args.host, args.port), MockHandler)
+    server.daemon_threads = True
+    logging.info(f"Mock Groq API on http://{args.host}:{args.port}{COMPLETIONS_PATH}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Compare vector quantization modes: memory footprint, query latency, hit rate and MRR.
+
+    python -m app.quantization_benchmark                              # local index, every mode
+    python -m app.quantization_benchmark --backends local,qdrant --top-k 5
+    python -m app.quantization_benchmark --distractors 50 --output data/benchmarks/quantization.json
+
+Every mode is built from the same document vectors and scored on ground-truth-data.csv.
+Question vectors are embedded once up front, so the latency is the vector search alone.
+Qdrant modes go to their own collections (<COLLECTION_NAME>_<mode>), leaving the live one
+alone; their memory is estimated from the vector size, as Qdrant doesn't report it per
+collection. --distractors adds that many random vectors per recipe (ids that never match),
+drawn with the corpus' per-dimension mean and spread so they sit in the same region as real
+recipes without being copies of any, to see how memory, latency and accuracy hold up on a
+larger corpus.
+"""
+import os
+import json
+import time
+import argparse
+import logging
+
+import numpy as np
+
+from app import rag
+from app.evaluation import metrics_at_k, relevant_ranks
+from app.get_data import load_data, get_ground_truth, document_text, document_payload
+from app.artifacts import load_artifacts
+from app.embedding_store import embed_documents, embed_queries
+from app.search_backend import QUANTIZATION_MODES, LocalBackend, QdrantBackend
+from app.config_loader import COLLECTION_NAME, GROUND_TRUTH_PATH, QUANTIZATION_RESCORE, QUANTIZATION_OVERSAMPLING
+
+def load_corpus(distractors=0, seed=42):
+    """(payloads, vectors) for the recipes, plus `distractors` random unit vectors per recipe."""
+    bundle = load_artifacts()
+    documents = bundle.documents if bundle is not None else load_data()
+    if bundle is not None:
+        vectors = np.asarray(bundle.vectors, dtype=np.float32)
+    else:
+        vectors = np.vstack(embed_documents([document_text(doc) for doc in documents])).astype(np.float32)
+    payloads = [document_payload(doc) for doc in documents]
+    if distractors:
+        rng = np.random.default_rng(seed)
+        unit = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        extra = rng.normal(unit.mean(axis=0), unit.std(axis=0), (len(vectors) * distractors, vectors.shape[1]))
+        extra /= np.linalg.norm(extra, axis=1, keepdims=True)
+        extra *= np.linalg.norm(vectors, axis=1).mean()
+        payloads += [{**p, "id": f"distractor-{i}"} for i, p in enumerate(payloads * distractors)]
+        vectors = np.vstack([vectors, extra.astype(np.float32)])
+    return payloads, vectors
+
+
+def vector_bytes(dim, quantization):
+    """Bytes per vector that have to stay in RAM for search."""
+    return {"none": 4 * dim, "scalar": dim, "binary": -(-dim // 8)}[quantization]
+
+
+def build_backend(backend, quantization, payloads, vectors, rescore, oversampling):
+    """(search backend, memory dict) for one backend/mode combination."""
+    if backend == "local":
+        index = LocalBackend(vectors, payloads, quantization=quantization, rescore=rescore, oversampling=oversampling)
+        return index, index.memory()
+
+    from qdrant_client import models
+    from app.get_data import get_qdrant_client, point_id, _ensure_collection
+
+    client = get_qdrant_client()
+    collection_name = f"{COLLECTION_NAME}_{quantization}"
+    if client.collection_exists(collection_name=collection_name):
+        client.delete_collection(collection_name=collection_name)
+    _ensure_collection(client, collection_name, quantization)
+    for b in range(0, len(payloads), 1024):
+        client.upsert(collection_name=collection_name, points=[
+            models.PointStruct(id=point_id(p), vector=v.tolist(), payload=p)
+            for p, v in zip(payloads[b:b + 1024], vectors[b:b + 1024])
+        ])
+    index = QdrantBackend(client, collection_name, quantization=quantization, rescore=rescore,
+                          oversampling=oversampling)
+    ram = len(payloads) * vector_bytes(vectors.shape[1], quantization)
+    disk = len(payloads) * vector_bytes(vectors.shape[1], "none") if quantization != "none" else 0
+    return index, {"index_bytes": ram, "rescore_bytes": disk, "estimated": True}
+
+
+def query_latency(index, query_vectors, top_k, repeats=1):
+    """p50/p95 latency of single unfiltered searches, in milliseconds."""
+    timings = []
+    for _ in range(repeats):
+        for vector in query_vectors:
+            start = time.perf_counter()
+            index.search(vector, top_k=top_k)
+            timings.append(time.perf_counter() - start)
+    timings = np.asarray(timings) * 1000
+    return {"p50_ms": round(float(np.percentile(timings, 50)), 3),
+            "p95_ms": round(float(np.percentile(timings, 95)), 3)}
+
+
+def run(backends, modes, top_k=5, distractors=0, rescore=QUANTIZATION_RESCORE,
+        oversampling=QUANTIZATION_OVERSAMPLING, ground_truth_path=GROUND_TRUTH_PATH, repeats=1):
+    payloads, vectors = load_corpus(distractors)
+    ground_truth = get_ground_truth(ground_truth_path)
+    questions = [q.get("question", "") for q in ground_truth]
+    query_vectors = [v.tolist() for v in embed_queries(questions)]
+    logging.info(f"{len(payloads)} vectors x {vectors.shape[1]}, {len(questions)} questions")
+
+    report = {"documents": len(payloads), "dim": int(vectors.shape[1]), "questions": len(questions),
+              "top_k": top_k, "rescore": rescore, "oversampling": oversampling, "results": []}
+    for backend in backends:
+        for quantization in modes:
+            start = time.perf_counter()
+            index, memory = build_backend(backend, quantization, payloads, vectors, rescore, oversampling)
+            build_s = time.perf_counter() - start
+            rag.search_backend = index
+            ranks = relevant_ranks(ground_truth, top_k, vectors=query_vectors, mode="vector")
+            metrics = metrics_at_k(ranks, [top_k])
+            report["results"].append({
+                "backend": backend,
+                "quantization": quantization,
+                "build_s": round(build_s, 2),
+                **memory,
+                **query_latency(index, query_vectors, top_k, repeats),
+                "hit_rate": round(float(metrics["hit_rate"].iloc[0]), 4),
+                "mrr": round(float(metrics["mrr"].iloc[0]), 4),
+            })
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vector quantization modes on the ground-truth set.")
+    parser.add_argument("--backends", default="local", help="comma-separated: local, qdrant")
+    parser.add_argument("--modes", default=",".join(QUANTIZATION_MODES), help="comma-separated quantization modes")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--distractors", type=int, default=0, help="random distractor vectors to add per recipe")
+    parser.add_argument("--no-rescore", action="store_true", help="rank on the quantized vectors only")
+    parser.add_argument("--oversampling", type=float, default=QUANTIZATION_OVERSAMPLING)
+    parser.add_argument("--repeats", type=int, default=1, help="passes over the questions for the latency figures")
+    parser.add_argument("--ground-truth", default=GROUND_TRUTH_PATH)
+    parser.add_argument("--output", default=None, help="also write the report as JSON to this file")
+    args = parser.parse_args()
+
+    report = run(args.backends.split(","), args.modes.split(","), top_k=args.top_k, distractors=args.distractors,
+                 rescore=not args.no_rescore, oversampling=args.oversampling, ground_truth_path=args.ground_truth,
+                 repeats=args.repeats)
+
+    print(f"{'backend':<8} {'mode':<7} {'RAM MB':>8} {'disk MB':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'hit@k':>6} {'MRR':>6}")
+    for r in report["results"]:
+        print(f"{r['backend']:<8} {r['quantization']:<7} {r['index_bytes'] / 1e6:>8.2f} "
+              f"{r['rescore_bytes'] / 1e6:>8.2f} {r['p50_ms']:>8.3f} {r['p95_ms']:>8.3f} "
+              f"{r['hit_rate']:>6.3f} {r['mrr']:>6.3f}")
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
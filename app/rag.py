@@ -1,16 +1,34 @@
 import re
 import json
 import os
-from groq import Groq
+import time
+import asyncio
+import threading
 import logging
-import pandas as pd
-
-
-from fastembed import TextEmbedding
-from qdrant_client import QdrantClient, models
-
-from app.get_data import load_data, create_collection_and_upsert, get_ground_truth
-from app.config_loader import MODEL, COLLECTION_NAME, GROQ_MODEL
+from concurrent.futures import ThreadPoolExecutor
+
+from app.get_data import (load_data, create_collection_and_upsert, get_ground_truth, collection_version,
+                          document_text, document_payload, get_qdrant_client)
+from app.artifacts import load_artifacts, restore_collection
+from app.bm25 import BM25Index
+from app.context import ContextBuilder
+from app.singleflight import SingleFlight, AsyncSingleFlight, prompt_key
+from app.resilience import Deadline, CircuitBreaker, LatencyWindow, HedgePolicy, hedged_call, ahedged_call
+from app.filters import extract_constraints
+from app.metrics import (RAG_STAGE_LATENCY, CONTEXT_CHARACTERS, CONTEXT_DOCUMENTS, PROMPTS_BUILT, CONTEXT_TOKENS,
+                         CONTEXT_TOKENS_SAVED, CONTEXT_TOKENS_ADDED, CONTEXT_HITS_TRIMMED, track_stage, record_usage)
+from app.embedding_store import get_embedding_model, embed_queries, seed_documents
+from app.search_backend import QdrantBackend, LocalBackend
+from app.cache import LRUCache, SemanticCache, normalize_question
+from app.config_loader import (MODEL, COLLECTION_NAME, GROQ_MODEL, QUERY_EMBEDDING_CACHE_SIZE,
+                               ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL, ANSWER_CACHE_THRESHOLD, SEARCH_BACKEND,
+                               RETRIEVAL_MODE, HYBRID_CANDIDATES, HYBRID_DENSE_WEIGHT, HYBRID_LEXICAL_WEIGHT,
+                               RRF_K, STRUCTURED_FILTERS, BATCH_LLM_CONCURRENCY, WARMUP_ROUNDS,
+                               CONTEXT_TOKEN_BUDGET, CONTEXT_SHARED_MIN_SHARE, LLM_SINGLE_FLIGHT, RAG_DEADLINE,
+                               LLM_HEDGE, LLM_HEDGE_PERCENTILE, LLM_HEDGE_DEFAULT_DELAY, LLM_HEDGE_MIN_DELAY,
+                               LLM_CALL_THREADS, BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT,
+                               VECTOR_QUANTIZATION, BATCH_DEADLINE, STARTUP_RETRY_DELAY,
+                               STARTUP_RETRY_MAX_DELAY)
 
 # Setup logging
 logging.basicConfig(
@@ -23,24 +41,151 @@ documents = None
 qd_client = None
 ground_truth = None
 embedding_model = None
+search_backend = None
+lexical_index = None
+context_builder = None
 GROQ_CLIENT = None
+ASYNC_GROQ_CLIENT = None
+
+query_embedding_cache = LRUCache("query_embedding", QUERY_EMBEDDING_CACHE_SIZE)
+# Set once startup() has loaded everything and warmed the model
+READY = threading.Event()
+startup_error = None
+
+llm_flight = SingleFlight("sync")
+allm_flight = AsyncSingleFlight("async")
+
+answer_cache = SemanticCache("semantic_answer", ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL, ANSWER_CACHE_THRESHOLD)
+
+def build_search_backend(documents, backend=SEARCH_BACKEND, bundle=None, quantization=VECTOR_QUANTIZATION):
+    """Index documents and return the configured search backend ("qdrant" or "local").
+
+    With an artifact bundle the precomputed vectors are used instead of running the
+    embedding model, and a missing Qdrant collection is restored from its snapshot.
+    quantization ("none", "scalar" or "binary") applies to either backend.
+    """
+    global qd_client
+    if backend == "local":
+        logging.info("Building in-process search index...")
+        if bundle is not None:
+            return LocalBackend(bundle.vectors, [document_payload(doc) for doc in documents],
+                                quantization=quantization)
+        return LocalBackend.from_documents(documents, quantization=quantization)
+
+    logging.info("Initializing Qdrant client...")
+    if bundle is not None:
+        restore_collection(get_qdrant_client(), bundle)
+        seed_documents([document_text(doc) for doc in documents], bundle.vectors)
+    qd_client = create_collection_and_upsert(documents, quantization=quantization)
+    return QdrantBackend(qd_client, quantization=quantization)
+
+
+def build_lexical_index(documents):
+    """BM25 index over TEXT_FIELDS, returning the same payloads as the vector backends."""
+    return BM25Index([document_text(doc) for doc in documents], [document_payload(doc) for doc in documents])
+
+
+def build_context_builder(documents):
+    """Pre-render every recipe's context block once, with the shared recipe steps factored out."""
+    return ContextBuilder(documents, entry_template, CONTEXT_TOKEN_BUDGET, CONTEXT_SHARED_MIN_SHARE)
+
 
 def initialize_rag_components():
-    """Initialize all RAG components when needed"""
-    global documents, qd_client, ground_truth, embedding_model, GROQ_CLIENT
+    """Initialize all RAG components when needed.
+
+    Nothing is published until every component is built, so a failed attempt can simply be retried.
+    """
+    global documents, ground_truth, embedding_model, search_backend, lexical_index, context_builder
+    global GROQ_CLIENT, ASYNC_GROQ_CLIENT
     
     if documents is None:
         logging.info("Loading documents and ground truth...")
-        documents = load_data()
-        ground_truth = get_ground_truth()
+        bundle = load_artifacts()
+        docs = bundle.documents if bundle is not None else load_data()
+        truth = get_ground_truth()
         
-        logging.info("Initializing Qdrant client...")
-        qd_client = create_collection_and_upsert(documents)
+        backend = build_search_backend(docs, bundle=bundle)
+        lexical = build_lexical_index(docs)
+        builder = build_context_builder(docs)
         
-        logging.info(f"Loading embedding model: {MODEL}")
-        embedding_model = TextEmbedding(MODEL)
+        model = get_embedding_model(MODEL)
         
-        GROQ_CLIENT = Groq(api_key=os.getenv("GROQ_API_KEY"))
+        from groq import Groq, AsyncGroq
+        # GROQ_BASE_URL points the clients at another server, e.g. the offline mock (app.mock_llm)
+        base_url = os.getenv("GROQ_BASE_URL") or None
+        # Retries are done by the hedged second request, within the request's deadline
+        GROQ_CLIENT = Groq(api_key=os.getenv("GROQ_API_KEY"), base_url=base_url, max_retries=0)
+        ASYNC_GROQ_CLIENT = AsyncGroq(api_key=os.getenv("GROQ_API_KEY"), base_url=base_url, max_retries=0)
+
+        answer_cache.set_version(collection_version(docs))
+        ground_truth, embedding_model, search_backend = truth, model, backend
+        lexical_index, context_builder = lexical, builder
+        documents = docs
+
+
+def reindex():
+    """Re-sync the collection with the CSV and drop cached answers if anything changed."""
+    global documents, search_backend, lexical_index, context_builder
+    documents = load_data()
+    search_backend = build_search_backend(documents)
+    lexical_index = build_lexical_index(documents)
+    context_builder = build_context_builder(documents)
+    answer_cache.set_version(collection_version(documents))
+
+
+def warm_up(rounds=WARMUP_ROUNDS):
+    """Run dummy embeddings and searches so the first real request sees steady-state latency.
+
+    Goes around the query caches so warm-up questions never end up in them.
+    """
+    for i in range(rounds):
+        vector = next(iter(embedding_model.embed([f"what can my {6 + i} month old baby eat for dinner"])))
+        search_backend.search(vector.tolist(), top_k=1)
+        lexical_index.search("iron rich dinner", top_k=1)
+
+
+def startup():
+    """Explicit start-up phase: load components, warm up, then mark the worker ready.
+
+    Returns True once ready; on failure the error is kept for /readyz and False returned.
+    """
+    global startup_error
+    try:
+        start = time.time()
+        initialize_rag_components()
+        warm_up()
+        READY.set()
+        startup_error = None
+        logging.info(f"RAG components ready in {time.time() - start:.1f}s")
+        return True
+    except Exception as e:
+        startup_error = str(e)
+        logging.exception(f"Start-up failed: {e}")
+        return False
+
+
+def startup_with_retry(delay=STARTUP_RETRY_DELAY, max_delay=STARTUP_RETRY_MAX_DELAY):
+    """Run startup() until it succeeds, backing off exponentially (up to max_delay seconds) between attempts.
+
+    A dependency that is still coming up (Qdrant, the artifact volume) then only delays readiness.
+    """
+    while not startup():
+        logging.info(f"Retrying start-up in {delay:g}s")
+        time.sleep(delay)
+        delay = min(delay * 2, max_delay)
+
+
+def readiness():
+    """(ready, details) for the /readyz endpoint."""
+    details = {
+        'documents': len(documents) if documents is not None else 0,
+        'search_backend': type(search_backend).__name__ if search_backend is not None else None,
+        'embedding_model': embedding_model is not None,
+        'llm_client': GROQ_CLIENT is not None,
+    }
+    if startup_error:
+        details['error'] = startup_error
+    return READY.is_set(), details
 
 
 # Load data and initialize Qdrant client
@@ -55,25 +200,151 @@ def initialize_rag_components():
 # GROQ_CLIENT = Groq(api_key=os.getenv("GROQ_API_KEY"))
 
 
-def vector_search(question, top_k=1):
-    """Search Qdrant for top_k most relevant documents."""
+def embed_query(question):
+    """Embed a question, served from the in-process LRU cache when possible."""
+    key = normalize_question(question)
+    vector = query_embedding_cache.get(key)
+    if vector is None:
+        with track_stage("embed"):
+            vector = embed_queries([question])[0].tolist()
+        query_embedding_cache.put(key, vector)
+    return vector
+
+
+def likely_cached(question):
+    """Cheap guess whether rag() will be served from the answer cache, without embedding or searching."""
+    vector = query_embedding_cache.peek(normalize_question(question))
+    return vector is not None and answer_cache.has_similar(vector)
+
+
+def embed_query_batch(questions):
+    """Embed many questions with a single model call for everything not in the LRU cache."""
+    keys = [normalize_question(q) for q in questions]
+    vectors = [query_embedding_cache.get(k) for k in keys]
+    missing = {}
+    for q, k, v in zip(questions, keys, vectors):
+        if v is None:
+            missing.setdefault(k, q)
+    if missing:
+        with track_stage("embed"):
+            new_vectors = embed_queries(list(missing.values()))
+        # Taken from here, not re-read from the LRU: a small cache may already have evicted some of them
+        embedded = {k: v.tolist() for k, v in zip(missing, new_vectors)}
+        for k, v in embedded.items():
+            query_embedding_cache.put(k, v)
+        vectors = [v if v is not None else embedded[k] for k, v in zip(keys, vectors)]
+    return vectors
+
+
+def vector_search(question, top_k=1, constraints=None, query_vector=None):
+    """Search the configured backend for top_k most relevant documents."""
     logging.info(f"Running vector search for query: {question}")
 
+    if query_vector is None:
+        query_vector = embed_query(question)
+    with track_stage("search"):
+        results = search_backend.search(query_vector, top_k=top_k, constraints=constraints)
+    logging.info(f"Found {len(results)} results.")
+    return results
+
 
-    query_vector = list(next(embedding_model.embed([question])))
+def _doc_key(doc):
+    return doc.get('id', doc.get('dish_name'))
 
-    query_points = qd_client.query_points(
-        collection_name=COLLECTION_NAME,
-        query=query_vector,
-        limit=top_k,
-        with_payload=True
-    )
 
-    results = [p.payload for p in query_points.points if p.payload]
-    logging.info(f"Found {len(results)} results.")
+def reciprocal_rank_fusion(ranked_lists, weights, k=RRF_K):
+    """Fuse ranked payload lists: score(d) = sum(w / (k + rank))."""
+    scores, docs = {}, {}
+    for results, weight in zip(ranked_lists, weights):
+        for rank, doc in enumerate(results, start=1):
+            key = _doc_key(doc)
+            docs.setdefault(key, doc)
+            scores[key] = scores.get(key, 0.0) + weight / (k + rank)
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [docs[key] for key in ranked]
+
+
+def hybrid_search(question, top_k=1, candidates=HYBRID_CANDIDATES, constraints=None, query_vector=None):
+    """BM25 + dense retrieval fused with reciprocal rank fusion."""
+    logging.info(f"Running hybrid search for query: {question}")
+    timings = {}
+
+    # Logged, not recorded: embed_query() already records the "embed" stage when the model runs
+    t0 = time.perf_counter()
+    if query_vector is None:
+        query_vector = embed_query(question)
+    embed_lookup = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    dense = search_backend.search(query_vector, top_k=candidates, constraints=constraints)
+    timings['search'] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    lexical = lexical_index.search(question, top_k=candidates, constraints=constraints)
+    timings['lexical'] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    results = reciprocal_rank_fusion([dense, lexical], [HYBRID_DENSE_WEIGHT, HYBRID_LEXICAL_WEIGHT])[:top_k]
+    timings['fusion'] = time.perf_counter() - t0
+
+    for stage, seconds in timings.items():
+        RAG_STAGE_LATENCY.labels(stage).observe(seconds)
+    logging.info(
+        "Hybrid search timings (ms): "
+        + ", ".join(f"{stage}={seconds * 1000:.1f}"
+                    for stage, seconds in {'embed_lookup': embed_lookup, **timings}.items())
+    )
     return results
 
 
+def search(question, top_k=1, mode=RETRIEVAL_MODE, use_filters=STRUCTURED_FILTERS, query_vector=None):
+    """Retrieve documents with the configured retrieval mode.
+
+    Structured constraints found in the question (age, allergens, iron, meal type,
+    cooking time) restrict the search to eligible recipes; if nothing matches them
+    the search is repeated without constraints. The question is embedded once
+    (unless query_vector is given) and the vector reused for both attempts.
+    """
+    search_fn = hybrid_search if mode == "hybrid" else vector_search
+    if query_vector is None:
+        query_vector = embed_query(question)
+    constraints = extract_constraints(question) if use_filters else {}
+    if constraints:
+        logging.info(f"Applying constraints: {constraints}")
+        results = search_fn(question, top_k=top_k, constraints=constraints, query_vector=query_vector)
+        if results:
+            return results
+        logging.info("No recipe matches the constraints, searching without them.")
+    return search_fn(question, top_k=top_k, query_vector=query_vector)
+
+
+def search_many(questions, top_k=1, mode=RETRIEVAL_MODE, use_filters=STRUCTURED_FILTERS, vectors=None):
+    """Batched search(): one embedding call and one batched vector query for all questions."""
+    if vectors is None:
+        vectors = embed_query_batch(questions)
+    constraints = [extract_constraints(q) if use_filters else {} for q in questions]
+    depth = HYBRID_CANDIDATES if mode == "hybrid" else top_k
+
+    with track_stage("search"):
+        dense = search_backend.search_batch(vectors, top_k=depth, constraints=constraints)
+    retry = [i for i, (c, r) in enumerate(zip(constraints, dense)) if c and not r]
+    if retry:
+        logging.info(f"{len(retry)} questions match no recipe under their constraints, searching without them.")
+        for i, results in zip(retry, search_backend.search_batch([vectors[i] for i in retry], top_k=depth)):
+            dense[i] = results
+            constraints[i] = {}
+
+    if mode != "hybrid":
+        return dense
+    return [
+        reciprocal_rank_fusion(
+            [d, lexical_index.search(q, top_k=depth, constraints=c)],
+            [HYBRID_DENSE_WEIGHT, HYBRID_LEXICAL_WEIGHT]
+        )[:top_k]
+        for q, d, c in zip(questions, dense, constraints)
+    ]
+
+
 prompt_template = """
 You are a helpful AI food assistant. Answer the QUESTION using only the information in CONTEXT. 
 If the answer is not in CONTEXT, say you don't know.
@@ -103,29 +374,285 @@ Recipe: {recipe}
 
 def build_prompt(query, search_results):
     """Build a structured prompt for the LLM."""
+    with track_stage("build_prompt"):
+        prompt, context, stats = _build_prompt(query, search_results)
+    PROMPTS_BUILT.inc()
+    CONTEXT_DOCUMENTS.inc(stats["included"])
+    CONTEXT_CHARACTERS.inc(len(context))
+    CONTEXT_TOKENS.inc(stats["tokens"])
+    # Signed: negative when the context came out larger than the plain entries
+    CONTEXT_TOKENS_SAVED.inc(max(0, stats["tokens_saved"]))
+    CONTEXT_TOKENS_ADDED.inc(max(0, -stats["tokens_saved"]))
+    CONTEXT_HITS_TRIMMED.labels("truncated").inc(stats["truncated"])
+    CONTEXT_HITS_TRIMMED.labels("dropped").inc(stats["dropped"])
+    logging.info(f"Context: {stats['included']}/{stats['hits']} hits, ~{stats['tokens']} tokens "
+                 f"(~{stats['tokens_saved']} saved)")
+    return prompt
+
+
+def _build_prompt(query, search_results):
+    """Render the prompt; also returns the context block and its ContextBuilder stats."""
+    global context_builder
     logging.info("Building prompt...")
-    context = ""
-    for hit in search_results:
-        doc = hit if isinstance(hit, dict) else getattr(hit, "payload", {}) or {}
-        safe_doc = {k: doc.get(k, "N/A") for k in [
-            "dish_name", "baby_age", "iron_rich", "allergen", "ingredients",
-            "cooking_time", "texture", "meal_type", "calories", "preparation_difficulty", "recipe"
-        ]}
-        context += entry_template.format(**safe_doc) + "\n\n"
+    if context_builder is None:
+        context_builder = build_context_builder(documents or [])
+    context, stats = context_builder.build(search_results)
+    return prompt_template.format(question=query, context=context), context, stats
+
+
+def strip_think(answer):
+    """Remove <think>...</think> reasoning blocks from a model answer."""
+    return re.sub(r"<think>.*?</think>\s*", "", answer, flags=re.DOTALL).strip()
+
 
-    return prompt_template.format(question=query, context=context.strip())
+def _llm_error_kind(error):
+    """Map a Groq client error onto the error kinds used by the breaker and the hedge."""
+    import groq
 
+    if isinstance(error, groq.APITimeoutError):
+        return "timeout"
+    if isinstance(error, groq.APIConnectionError):
+        return "unavailable"
+    if isinstance(error, groq.RateLimitError):
+        return "rate_limited"
+    if isinstance(error, groq.APIStatusError):
+        return "unavailable" if error.status_code >= 500 else "client_error"
+    return "error"
 
-def llm(prompt):
-    """Call the Groq LLM for inference."""
+
+llm_breaker = CircuitBreaker("groq", BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+llm_latencies = LatencyWindow()
+llm_hedge = HedgePolicy("sync", llm_breaker, llm_latencies, LLM_HEDGE_PERCENTILE, LLM_HEDGE_DEFAULT_DELAY,
+                        LLM_HEDGE_MIN_DELAY, LLM_HEDGE, classify=_llm_error_kind)
+allm_hedge = HedgePolicy("async", llm_breaker, llm_latencies, LLM_HEDGE_PERCENTILE, LLM_HEDGE_DEFAULT_DELAY,
+                         LLM_HEDGE_MIN_DELAY, LLM_HEDGE, classify=_llm_error_kind)
+llm_executor = ThreadPoolExecutor(max_workers=LLM_CALL_THREADS, thread_name_prefix="llm")
+
+
+def llm(prompt, deadline=None):
+    """Call the Groq LLM for inference; identical prompts in flight at once share one call.
+
+    The call is bounded by the deadline (RAG_DEADLINE from now by default), hedged, and
+    fails fast with CircuitOpenError while the breaker is open.
+    """
     logging.info("Querying Groq LLM...")
+    deadline = deadline or Deadline(RAG_DEADLINE)
+    with track_stage("llm"):
+        if not LLM_SINGLE_FLIGHT:
+            return _complete(prompt, deadline)
+        return llm_flight.do(prompt_key(GROQ_MODEL, prompt), _complete, prompt, deadline, deadline=deadline)
+
+
+def _complete(prompt, deadline):
+    return hedged_call(lambda timeout: _completion(prompt, timeout), deadline, llm_hedge, llm_executor)
+
+
+def _completion(prompt, timeout):
     response = GROQ_CLIENT.chat.completions.create(
         model=GROQ_MODEL,
-        messages=[{"role": "user", "content": prompt}]
+        messages=[{"role": "user", "content": prompt}],
+        timeout=timeout
     )
+    record_usage(getattr(response, "usage", None))
     final_answer = response.choices[0].message.content
-    clean_answer = re.sub(r"<think>.*?</think>\s*", "", final_answer, flags=re.DOTALL).strip()
-    return clean_answer
+    return strip_think(final_answer)
+
+
+class ThinkStripper:
+    """Streaming counterpart of strip_think().
+
+    Feed it chunks as they arrive; it returns the visible text, dropping
+    <think>...</think> blocks even when a tag is split across chunks.
+    """
+
+    OPEN = "<think>"
+    CLOSE = "</think>"
+
+    def __init__(self):
+        self._buf = ""
+        self._in_think = False
+        self._skip_ws = False
+        self._started = False
+
+    @staticmethod
+    def _partial_tag(text, tag):
+        """Length of the longest suffix of text that is a proper prefix of tag."""
+        for k in range(min(len(tag) - 1, len(text)), 0, -1):
+            if text.endswith(tag[:k]):
+                return k
+        return 0
+
+    def feed(self, chunk):
+        self._buf += chunk
+        out = []
+        while self._buf:
+            if self._in_think:
+                i = self._buf.find(self.CLOSE)
+                if i == -1:
+                    keep = self._partial_tag(self._buf, self.CLOSE)
+                    self._buf = self._buf[len(self._buf) - keep:] if keep else ""
+                    break
+                self._buf = self._buf[i + len(self.CLOSE):]
+                self._in_think = False
+                self._skip_ws = True
+                continue
+
+            if self._skip_ws:
+                self._buf = self._buf.lstrip()
+                if not self._buf:
+                    break
+                self._skip_ws = False
+
+            i = self._buf.find(self.OPEN)
+            if i == -1:
+                keep = self._partial_tag(self._buf, self.OPEN)
+                out.append(self._buf[:len(self._buf) - keep])
+                self._buf = self._buf[len(self._buf) - keep:]
+                break
+            out.append(self._buf[:i])
+            self._buf = self._buf[i + len(self.OPEN):]
+            self._in_think = True
+        return self._visible("".join(out))
+
+    def flush(self):
+        """Return whatever is still buffered once the stream has ended."""
+        rest = "" if self._in_think else self._buf
+        self._buf = ""
+        return self._visible(rest)
+
+    def _visible(self, text):
+        # Like strip_think(), drop leading whitespace before the first visible character
+        if not self._started:
+            text = text.lstrip()
+            self._started = bool(text)
+        return text
+
+
+def _stream_usage(chunk):
+    """Usage block of a streamed chunk; Groq only attaches it (under x_groq) to the last one."""
+    x_groq = getattr(chunk, "x_groq", None)
+    return getattr(x_groq, "usage", None) or getattr(chunk, "usage", None)
+
+
+def llm_stream(prompt, deadline=None):
+    """Stream visible answer text from Groq, with reasoning blocks removed.
+
+    Streams aren't hedged, but they respect the deadline and the circuit breaker.
+    """
+    logging.info("Querying Groq LLM (streaming)...")
+    deadline = deadline or Deadline(RAG_DEADLINE)
+    deadline.check("llm")
+    llm_breaker.allow()
+    started = time.monotonic()
+    consumer = 0.0  # time spent suspended at yield
+    try:
+        response = GROQ_CLIENT.chat.completions.create(
+            model=GROQ_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True,
+            timeout=deadline.remaining()
+        )
+        stripper = ThinkStripper()
+        try:
+            for chunk in response:
+                # The timeout bounds each read; this bounds the whole stream
+                deadline.check("llm")
+                record_usage(_stream_usage(chunk))
+                if not chunk.choices:
+                    continue
+                text = stripper.feed(chunk.choices[0].delta.content or "")
+                if text:
+                    paused = time.monotonic()
+                    try:
+                        yield text
+                    finally:
+                        consumer += time.monotonic() - paused
+        finally:
+            response.close()
+    except Exception as e:
+        llm_hedge.record("stream", started, e)
+        raise
+    except BaseException:
+        # Closed early by the consumer (GeneratorExit): end a half-open trial all the same
+        llm_hedge.abandon("stream")
+        raise
+    finally:
+        # Upstream time only: how long the consumer takes with each chunk isn't the LLM's
+        RAG_STAGE_LATENCY.labels("llm").observe(time.monotonic() - started - consumer)
+    llm_hedge.record("stream", started)
+    tail = stripper.flush()
+    if tail:
+        yield tail
+
+
+async def allm_stream(prompt, deadline=None):
+    """Async variant of llm_stream()."""
+    logging.info("Querying Groq LLM (async streaming)...")
+    deadline = deadline or Deadline(RAG_DEADLINE)
+    deadline.check("llm")
+    llm_breaker.allow()
+    started = time.monotonic()
+    consumer = 0.0
+    try:
+        response = await ASYNC_GROQ_CLIENT.chat.completions.create(
+            model=GROQ_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            stream=True,
+            timeout=deadline.remaining()
+        )
+        stripper = ThinkStripper()
+        try:
+            async for chunk in response:
+                deadline.check("llm")
+                record_usage(_stream_usage(chunk))
+                if not chunk.choices:
+                    continue
+                text = stripper.feed(chunk.choices[0].delta.content or "")
+                if text:
+                    paused = time.monotonic()
+                    try:
+                        yield text
+                    finally:
+                        consumer += time.monotonic() - paused
+        finally:
+            await response.close()
+    except Exception as e:
+        allm_hedge.record("stream", started, e)
+        raise
+    except BaseException:
+        allm_hedge.abandon("stream")
+        raise
+    finally:
+        RAG_STAGE_LATENCY.labels("llm").observe(time.monotonic() - started - consumer)
+    allm_hedge.record("stream", started)
+    tail = stripper.flush()
+    if tail:
+        yield tail
+
+
+async def allm(prompt, deadline=None):
+    """Async variant of llm() using the AsyncGroq client."""
+    logging.info("Querying Groq LLM (async)...")
+    deadline = deadline or Deadline(RAG_DEADLINE)
+    with track_stage("llm"):
+        if not LLM_SINGLE_FLIGHT:
+            return await _acomplete(prompt, deadline)
+        return await allm_flight.do(prompt_key(GROQ_MODEL, prompt), _acomplete, prompt, deadline,
+                                    deadline=deadline)
+
+
+async def _acomplete(prompt, deadline):
+    return await ahedged_call(lambda timeout: _acompletion(prompt, timeout), deadline, allm_hedge)
+
+
+async def _acompletion(prompt, timeout):
+    response = await ASYNC_GROQ_CLIENT.chat.completions.create(
+        model=GROQ_MODEL,
+        messages=[{"role": "user", "content": prompt}],
+        timeout=timeout
+    )
+    record_usage(getattr(response, "usage", None))
+    return strip_think(response.choices[0].message.content)
 
 
 def hit_rate(relevance_total):
@@ -161,16 +688,169 @@ def evaluate(ground_truth, search_function):
     }
 
 
-def rag(query):
-    """Run full RAG pipeline: search -> prompt -> LLM answer."""
+def retrieve(query):
+    """Search step of rag(): returns (search_results, doc_ids, query_vector, cached_answer)."""
+    query_vector = embed_query(query)
+    search_results = search(query, query_vector=query_vector)
+    doc_ids = [d.get('id') for d in search_results]
+
+    with track_stage("cache_lookup"):
+        cached = answer_cache.get(query_vector, doc_ids)
+    if cached is not None:
+        logging.info("Serving answer from semantic cache.")
+    return search_results, doc_ids, query_vector, cached
+
+
+def rag(query, deadline=None):
+    """Run full RAG pipeline: search -> prompt -> LLM answer, within the deadline budget."""
     logging.info(f"Running RAG pipeline for query: {query}")
-    #initialize_rag_components()
-    search_results = vector_search(query)
+    deadline = deadline or Deadline(RAG_DEADLINE)
+    search_results, doc_ids, query_vector, cached = retrieve(query)
+    if cached is not None:
+        return cached
+
+    prompt = build_prompt(query, search_results)
+    answer = llm(prompt, deadline)
+    answer_cache.put(query_vector, doc_ids, answer)
+    return answer
+
+
+def rag_stream(query, deadline=None):
+    """Streaming RAG pipeline: yields answer text as it arrives and caches the full answer at the end."""
+    logging.info(f"Running streaming RAG pipeline for query: {query}")
+    deadline = deadline or Deadline(RAG_DEADLINE)
+    search_results, doc_ids, query_vector, cached = retrieve(query)
+    if cached is not None:
+        yield cached
+        return
+
+    parts = []
+    for text in llm_stream(build_prompt(query, search_results), deadline):
+        parts.append(text)
+        yield text
+    answer_cache.put(query_vector, doc_ids, "".join(parts).strip())
+
+
+async def arag_stream(query, deadline=None):
+    """Async variant of rag_stream()."""
+    logging.info(f"Running async streaming RAG pipeline for query: {query}")
+    deadline = deadline or Deadline(RAG_DEADLINE)
+    loop = asyncio.get_running_loop()
+    search_results, doc_ids, query_vector, cached = await loop.run_in_executor(None, retrieve, query)
+    if cached is not None:
+        yield cached
+        return
+
+    parts = []
+    async for text in allm_stream(build_prompt(query, search_results), deadline):
+        parts.append(text)
+        yield text
+    answer_cache.put(query_vector, doc_ids, "".join(parts).strip())
+
+
+def retrieve_many(questions):
+    """Batched retrieve(): one (search_results, doc_ids, query_vector, cached_answer) tuple per question."""
+    vectors = embed_query_batch(questions)
+    prepared = []
+    for search_results, query_vector in zip(search_many(questions, vectors=vectors), vectors):
+        doc_ids = [d.get('id') for d in search_results]
+        prepared.append((search_results, doc_ids, query_vector, answer_cache.get(query_vector, doc_ids)))
+    return prepared
+
+
+def rag_batch(questions, max_concurrency=BATCH_LLM_CONCURRENCY, deadline=None):
+    """Answer many questions: batched retrieval, then at most max_concurrency LLM calls at a time.
+
+    Returns one {'answer': ...} or {'error': ...} dict per question, in order. The deadline
+    (BATCH_DEADLINE from now by default) covers the whole batch; questions still waiting
+    for the LLM when it runs out get an error.
+    """
+    logging.info(f"Running batch RAG pipeline for {len(questions)} questions")
+    deadline = deadline or Deadline(BATCH_DEADLINE)
+    prepared = retrieve_many(questions)
+
+    def answer(item):
+        (search_results, doc_ids, query_vector, cached), query = item
+        if cached is not None:
+            return {'answer': cached}
+        try:
+            result = llm(build_prompt(query, search_results), deadline)
+        except Exception as e:
+            logging.error(f"Batch question failed: {e}")
+            return {'error': str(e)}
+        answer_cache.put(query_vector, doc_ids, result)
+        return {'answer': result}
+
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        return list(pool.map(answer, zip(prepared, questions)))
+
+
+async def arag_batch(questions, max_concurrency=BATCH_LLM_CONCURRENCY, deadline=None):
+    """Async variant of rag_batch(); LLM calls are limited by a semaphore."""
+    logging.info(f"Running async batch RAG pipeline for {len(questions)} questions")
+    deadline = deadline or Deadline(BATCH_DEADLINE)
+    loop = asyncio.get_running_loop()
+    prepared = await loop.run_in_executor(None, retrieve_many, questions)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def answer(item, query):
+        search_results, doc_ids, query_vector, cached = item
+        if cached is not None:
+            return {'answer': cached}
+        try:
+            async with semaphore:
+                result = await allm(build_prompt(query, search_results), deadline)
+        except Exception as e:
+            logging.error(f"Batch question failed: {e}")
+            return {'error': str(e)}
+        answer_cache.put(query_vector, doc_ids, result)
+        return {'answer': result}
+
+    return await asyncio.gather(*(answer(item, q) for item, q in zip(prepared, questions)))
+
+
+async def arag(query, deadline=None):
+    """Async RAG pipeline: embedding and search run on the executor, the LLM call is awaited."""
+    logging.info(f"Running async RAG pipeline for query: {query}")
+    deadline = deadline or Deadline(RAG_DEADLINE)
+    loop = asyncio.get_running_loop()
+    search_results, doc_ids, query_vector, cached = await loop.run_in_executor(None, retrieve, query)
+    if cached is not None:
+        return cached
+
     prompt = build_prompt(query, search_results)
-    answer = llm(prompt)
+    answer = await allm(prompt, deadline)
+    answer_cache.put(query_vector, doc_ids, answer)
     return answer
 
 
+def original_answer(doc):
+    """Reference answer text built from the source recipe."""
+    return (
+        f"{doc.get('dish_name', '')}. "
+        f"{doc.get('baby_age', '')}. "
+        f"{doc.get('iron_rich', '')} "
+        f"{doc.get('allergen', '')}. "
+        f"{doc.get('ingredients', '')}. "
+        f"{doc.get('recipe', '')} "
+        f"{doc.get('texture', '')}. "
+        f"{doc.get('meal_type', '')}. "
+        f"{doc.get('preparation_difficulty', '')}"
+    ).strip()
+
+
+def answer_similarity(answers_llm, answers_orig):
+    """Cosine similarity between each LLM answer and its reference answer."""
+    import numpy as np
+    model = embedding_model or get_embedding_model(MODEL)
+    v_orig = np.array(list(model.embed(answers_orig)))
+    v_llm = np.array(list(model.embed(answers_llm)))
+
+    norm_orig = v_orig / np.linalg.norm(v_orig, axis=1, keepdims=True)
+    norm_llm = v_llm / np.linalg.norm(v_llm, axis=1, keepdims=True)
+    return (norm_llm * norm_orig).sum(axis=1)
+
+
 def cosine_similarity(ground_truth, documents):
     """Compare LLM answers and original answers using cosine similarity."""
     logging.info("Calculating cosine similarity...")
@@ -183,18 +863,7 @@ def cosine_similarity(ground_truth, documents):
 
         answer_llm = rag(rec.get('question', ''))
         doc_id = rec.get('id')
-        original_doc = doc_idx.get(doc_id, {})
-        answer_orig = (
-            f"{original_doc.get('dish_name', '')}. "
-            f"{original_doc.get('baby_age', '')}. "
-            f"{original_doc.get('iron_rich', '')} "
-            f"{original_doc.get('allergen', '')}. "
-            f"{original_doc.get('ingredients', '')}. "
-            f"{original_doc.get('recipe', '')} "
-            f"{original_doc.get('texture', '')}. "
-            f"{original_doc.get('meal_type', '')}. "
-            f"{original_doc.get('preparation_difficulty', '')}"
-        ).strip()
+        answer_orig = original_answer(doc_idx.get(doc_id, {}))
 
         answers[i] = {
             'answer_llm': answer_llm,
@@ -203,19 +872,9 @@ def cosine_similarity(ground_truth, documents):
             'question': rec.get('question', '')
         }
 
+    import pandas as pd
     df_groq = pd.DataFrame(answers).T
     answers_orig = df_groq['answer_orig'].astype(str).tolist()
     answers_llm = df_groq['answer_llm'].astype(str).tolist()
 
-    v_orig = list(embedding_model.embed(answers_orig))
-    v_llm = list(embedding_model.embed(answers_llm))
-
-    import numpy as np
-    v_orig = np.array(v_orig)
-    v_llm = np.array(v_llm)
-
-    norm_orig = v_orig / np.linalg.norm(v_orig, axis=1, keepdims=True)
-    norm_llm = v_llm / np.linalg.norm(v_llm, axis=1, keepdims=True)
-    similarity = (norm_llm * norm_orig).sum(axis=1)
-
-    return similarity
+    return answer_similarity(answers_llm, answers_orig)
@@ -0,0 +1,301 @@
+import time
+import asyncio
+import logging
+import threading
+from collections import deque
+from concurrent.futures import wait, FIRST_COMPLETED
+
+import numpy as np
+
+from app.metrics import (LLM_ATTEMPTS, LLM_HEDGE_WINS, DEADLINE_EXCEEDED, BREAKER_STATE, BREAKER_TRANSITIONS,
+                         BREAKER_REJECTED)
+
+# Error kinds (see classify in hedged_call); these count against the breaker
+FAILURE_KINDS = {"timeout", "unavailable", "rate_limited"}
+# ... and these are retried right away by the hedged attempt
+RETRYABLE_KINDS = {"timeout", "unavailable"}
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's deadline budget ran out."""
+
+
+class CircuitOpenError(RuntimeError):
+    """The circuit breaker is open; retry_after is the number of seconds until it half-opens."""
+
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} is unavailable (circuit open), retry in {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class Deadline:
+    """Absolute time budget for one request, passed down the pipeline."""
+
+    def __init__(self, seconds):
+        self.expires = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(0.0, self.expires - time.monotonic())
+
+    def check(self, stage):
+        """Raise DeadlineExceeded (counted under `stage`) when the budget is used up."""
+        if self.remaining() <= 0:
+            raise self.exceeded(stage)
+
+    def exceeded(self, stage):
+        """Count a deadline miss under `stage` and return the DeadlineExceeded to raise."""
+        DEADLINE_EXCEEDED.labels(stage).inc()
+        return DeadlineExceeded(f"Deadline exceeded before {stage}")
+
+
+class CircuitBreaker:
+    """Closed -> open after `failure_threshold` consecutive failures; half-open after `reset_timeout`.
+
+    While open every call is rejected at once. In half-open one trial call is let through:
+    success closes the breaker, failure opens it again, and an abandoned trial (cancelled,
+    or a stream closed early) lets the next call try instead.
+    """
+
+    STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        # Start of the half-open trial call; a trial that never reports back expires after reset_timeout
+        self._trial_at = None
+        self._lock = threading.Lock()
+        BREAKER_STATE.labels(name).set(0)
+
+    def _set(self, state):
+        if state != self.state:
+            logging.warning(f"Circuit breaker {self.name}: {self.state} -> {state}")
+            self.state = state
+            BREAKER_STATE.labels(self.name).set(self.STATES[state])
+            BREAKER_TRANSITIONS.labels(self.name, state).inc()
+
+    def allow(self):
+        """Raise CircuitOpenError unless a call may go through now."""
+        with self._lock:
+            if self.state == "open":
+                waited = time.monotonic() - self.opened_at
+                if waited < self.reset_timeout:
+                    BREAKER_REJECTED.labels(self.name).inc()
+                    raise CircuitOpenError(self.name, self.reset_timeout - waited)
+                self._set("half_open")
+                self._trial_at = None
+            if self.state == "half_open":
+                now = time.monotonic()
+                if self._trial_at is not None and now - self._trial_at < self.reset_timeout:
+                    BREAKER_REJECTED.labels(self.name).inc()
+                    raise CircuitOpenError(self.name, 1.0)
+                self._trial_at = now
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._trial_at = None
+            self._set("closed")
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_at = None
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._set("open")
+
+    def release_trial(self):
+        """A call ended without telling whether the upstream is healthy."""
+        with self._lock:
+            self._trial_at = None
+
+
+class LatencyWindow:
+    """Recent successful call latencies, for a percentile-based hedge delay."""
+
+    def __init__(self, size=200, min_samples=20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q, default):
+        with self._lock:
+            samples = list(self._samples)
+        if len(samples) < self.min_samples:
+            return default
+        return float(np.percentile(samples, q))
+
+
+class HedgePolicy:
+    """Everything hedged_call() needs besides the call itself."""
+
+    def __init__(self, name, breaker, window, percentile=95, default_delay=2.0, min_delay=0.2, enabled=True,
+                 classify=lambda e: "error"):
+        self.name = name
+        self.breaker = breaker
+        self.window = window
+        self.percentile = percentile
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.enabled = enabled
+        self.classify = classify
+
+    def delay(self):
+        return max(self.min_delay, self.window.percentile(self.percentile, self.default_delay))
+
+    def record(self, kind, started, error=None):
+        """Book-keeping after one attempt; returns the error kind (None on success)."""
+        if error is None:
+            self.breaker.record_success()
+            self.window.add(time.monotonic() - started)
+            LLM_ATTEMPTS.labels(kind, "success").inc()
+            return None
+        error_kind = "timeout" if isinstance(error, TimeoutError) else self.classify(error)
+        if error_kind in FAILURE_KINDS:
+            self.breaker.record_failure()
+        else:
+            # Client errors and the like don't say the upstream is down; a half-open trial still has to end
+            self.breaker.record_success()
+        LLM_ATTEMPTS.labels(kind, error_kind).inc()
+        return error_kind
+
+    def abandon(self, kind):
+        """Book-keeping for an attempt that was cancelled or closed before it finished."""
+        self.breaker.release_trial()
+        LLM_ATTEMPTS.labels(kind, "abandoned").inc()
+
+
+def _attempt(fn, deadline, policy, kind):
+    started = time.monotonic()
+    try:
+        result = fn(deadline.remaining())
+    except Exception as e:
+        e.error_kind = policy.record(kind, started, e)
+        raise
+    policy.record(kind, started)
+    return result
+
+
+def hedged_call(fn, deadline, policy, executor):
+    """Call fn(timeout) on `executor`, hedged and bounded by the deadline.
+
+    If the primary hasn't answered after policy.delay() seconds (or failed with a retryable
+    error), a second attempt is started and the first successful answer wins. Raises
+    DeadlineExceeded when neither answers in time and CircuitOpenError while the breaker is open.
+    """
+    deadline.check("llm")
+    policy.breaker.allow()
+    pending = {executor.submit(_attempt, fn, deadline, policy, "primary"): "primary"}
+    hedge_at = time.monotonic() + policy.delay() if policy.enabled else None
+    last_error, hedged = None, False
+
+    while pending or hedge_at is not None:
+        remaining = deadline.remaining()
+        if remaining <= 0:
+            break
+        timeout = remaining if hedge_at is None else min(remaining, max(0.0, hedge_at - time.monotonic()))
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            kind = pending.pop(future)
+            try:
+                result = future.result()
+            except Exception as e:
+                last_error = e
+                if getattr(e, "error_kind", None) not in RETRYABLE_KINDS:
+                    raise
+                if hedge_at is not None:
+                    hedge_at = time.monotonic()
+                continue
+            if hedged:
+                LLM_HEDGE_WINS.labels(policy.name, kind).inc()
+            return result
+
+        if hedge_at is not None and time.monotonic() >= hedge_at:
+            hedge_at = None
+            try:
+                policy.breaker.allow()
+            except CircuitOpenError:
+                if not pending:
+                    raise
+                continue
+            pending[executor.submit(_attempt, fn, deadline, policy, "hedge")] = "hedge"
+            hedged = True
+
+    if last_error is not None and not pending:
+        raise last_error
+    DEADLINE_EXCEEDED.labels("llm").inc()
+    raise DeadlineExceeded("Deadline exceeded waiting for the LLM")
+
+
+async def _aattempt(fn, deadline, policy, kind):
+    started = time.monotonic()
+    try:
+        result = await fn(deadline.remaining())
+    except asyncio.CancelledError:
+        policy.abandon(kind)
+        raise
+    except Exception as e:
+        e.error_kind = policy.record(kind, started, e)
+        raise
+    policy.record(kind, started)
+    return result
+
+
+async def ahedged_call(fn, deadline, policy):
+    """asyncio counterpart of hedged_call(); the losing attempt is cancelled."""
+    deadline.check("llm")
+    policy.breaker.allow()
+    pending = {asyncio.ensure_future(_aattempt(fn, deadline, policy, "primary")): "primary"}
+    hedge_at = time.monotonic() + policy.delay() if policy.enabled else None
+    last_error, hedged = None, False
+
+    try:
+        while pending or hedge_at is not None:
+            remaining = deadline.remaining()
+            if remaining <= 0:
+                break
+            timeout = remaining if hedge_at is None else min(remaining, max(0.0, hedge_at - time.monotonic()))
+            done = set()
+            if pending:
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                kind = pending.pop(task)
+                try:
+                    result = task.result()
+                except Exception as e:
+                    last_error = e
+                    if getattr(e, "error_kind", None) not in RETRYABLE_KINDS:
+                        raise
+                    if hedge_at is not None:
+                        hedge_at = time.monotonic()
+                    continue
+                if hedged:
+                    LLM_HEDGE_WINS.labels(policy.name, kind).inc()
+                return result
+
+            if hedge_at is not None and time.monotonic() >= hedge_at:
+                hedge_at = None
+                try:
+                    policy.breaker.allow()
+                except CircuitOpenError:
+                    if not pending:
+                        raise
+                    continue
+                pending[asyncio.ensure_future(_aattempt(fn, deadline, policy, "hedge"))] = "hedge"
+                hedged = True
+    finally:
+        for task in pending:
+            task.cancel()
+
+    if last_error is not None and not pending:
+        raise last_error
+    DEADLINE_EXCEEDED.labels("llm").inc()
+    raise DeadlineExceeded("Deadline exceeded waiting for the LLM")
@@ -0,0 +1,190 @@
+import math
+import logging
+import tempfile
+
+import numpy as np
+
+from app.config_loader import COLLECTION_NAME, VECTOR_QUANTIZATION, QUANTIZATION_RESCORE, QUANTIZATION_OVERSAMPLING
+from app.filters import PayloadColumns, to_qdrant_filter
+
+QUANTIZATION_MODES = ("none", "scalar", "binary")
+# Share of values inside the int8 range for scalar quantization; the rest are clipped
+SCALAR_QUANTILE = 0.99
+# Rows scored per step on quantized codes, bounding the float32 temporaries
+SCORE_BLOCK = 8192
+# Set bits in every byte value, for Hamming distances on packed binary codes
+POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+
+
+def quantization_search_params(quantization, rescore=QUANTIZATION_RESCORE, oversampling=QUANTIZATION_OVERSAMPLING):
+    """Qdrant search params for a quantized collection (None when it isn't quantized)."""
+    if quantization == "none":
+        return None
+    from qdrant_client import models
+
+    return models.SearchParams(
+        quantization=models.QuantizationSearchParams(ignore=False, rescore=rescore, oversampling=oversampling)
+    )
+
+
+class QdrantBackend:
+    """Search the Qdrant collection over HTTP."""
+
+    def __init__(self, client, collection_name=COLLECTION_NAME, quantization=VECTOR_QUANTIZATION,
+                 rescore=QUANTIZATION_RESCORE, oversampling=QUANTIZATION_OVERSAMPLING):
+        self.client = client
+        self.collection_name = collection_name
+        self.search_params = quantization_search_params(quantization, rescore, oversampling)
+
+    def search(self, query_vector, top_k=1, constraints=None):
+        query_points = self.client.query_points(
+            collection_name=self.collection_name,
+            query=list(query_vector),
+            query_filter=to_qdrant_filter(constraints),
+            search_params=self.search_params,
+            limit=top_k,
+            with_payload=True
+        )
+        return [p.payload for p in query_points.points if p.payload]
+
+    def search_batch(self, query_vectors, top_k=1, constraints=None):
+        """One batched request; constraints is None or a list with one entry per query."""
+        from qdrant_client import models
+
+        constraints = constraints or [None] * len(query_vectors)
+        responses = self.client.query_batch_points(
+            collection_name=self.collection_name,
+            requests=[
+                models.QueryRequest(query=list(v), filter=to_qdrant_filter(c), params=self.search_params, limit=top_k,
+                                    with_payload=True)
+                for v, c in zip(query_vectors, constraints)
+            ]
+        )
+        return [[p.payload for p in r.points if p.payload] for r in responses]
+
+
+class LocalBackend:
+    """In-process cosine search, exact over one contiguous, L2-normalized float32 matrix by default.
+
+    With quantization="scalar" the index is an int8 matrix (4x smaller), with "binary"
+    one sign bit per dimension (32x smaller, scored by Hamming distance). With rescore
+    the best k * oversampling candidates are re-ranked on the float32 vectors, which
+    are then kept in a memory-mapped temporary file instead of RAM.
+    """
+
+    def __init__(self, vectors, payloads, quantization=VECTOR_QUANTIZATION, rescore=QUANTIZATION_RESCORE,
+                 oversampling=QUANTIZATION_OVERSAMPLING):
+        if quantization not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization {quantization!r}, expected one of {QUANTIZATION_MODES}")
+        matrix = np.ascontiguousarray(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix = matrix / norms
+        self.quantization = quantization
+        self.rescore = rescore and quantization != "none"
+        self.oversampling = oversampling
+        self.payloads = list(payloads)
+        self.columns = PayloadColumns(self.payloads)
+
+        self.matrix = matrix if quantization == "none" else None
+        self.codes = None
+        self.originals = None
+        if quantization == "scalar":
+            # Map [-bound, bound] linearly onto [-127, 127]
+            self.bound = float(np.quantile(np.abs(matrix), SCALAR_QUANTILE)) or 1.0
+            self.codes = np.clip(np.rint(matrix * (127 / self.bound)), -127, 127).astype(np.int8)
+        elif quantization == "binary":
+            self.codes = np.packbits(matrix > 0, axis=1)
+            self.dim = matrix.shape[1]
+        if self.rescore:
+            self._originals_file = tempfile.TemporaryFile(prefix="local-index-")
+            self.originals = np.memmap(self._originals_file, dtype=np.float32, mode="w+", shape=matrix.shape)
+            self.originals[:] = matrix
+            self.originals.flush()
+        logging.info(f"Local search index ready: {matrix.shape[0]} x {matrix.shape[1]} "
+                     f"({quantization}, {self.memory()['index_bytes'] / 1e6:.1f} MB in RAM)")
+
+    @classmethod
+    def from_documents(cls, documents, **kwargs):
+        from app.get_data import document_text, document_payload
+        from app.embedding_store import embed_documents
+
+        vectors = embed_documents([document_text(doc) for doc in documents])
+        return cls(np.vstack(vectors), [document_payload(doc) for doc in documents], **kwargs)
+
+    def __len__(self):
+        return len(self.payloads)
+
+    def memory(self):
+        """Bytes of the in-RAM index and of the memory-mapped rescoring vectors."""
+        index = self.matrix if self.codes is None else self.codes
+        return {"index_bytes": int(index.nbytes),
+                "rescore_bytes": int(self.originals.nbytes) if self.originals is not None else 0}
+
+    def _scores(self, q, rows=None):
+        """Similarity of the unit query q with every (or every eligible) row; approximate when quantized."""
+        if self.codes is None:
+            matrix = self.matrix if rows is None else self.matrix[rows]
+            return matrix @ q
+        codes = self.codes if rows is None else self.codes[rows]
+        scores = np.empty(len(codes), dtype=np.float32)
+        if self.quantization == "scalar":
+            q = q * (self.bound / 127)
+            for b in range(0, len(codes), SCORE_BLOCK):
+                scores[b:b + SCORE_BLOCK] = codes[b:b + SCORE_BLOCK].astype(np.float32) @ q
+        else:
+            q_bits = np.packbits(q > 0)
+            for b in range(0, len(codes), SCORE_BLOCK):
+                distance = POPCOUNT[codes[b:b + SCORE_BLOCK] ^ q_bits].sum(axis=1, dtype=np.int32)
+                scores[b:b + SCORE_BLOCK] = 1.0 - 2.0 * distance / self.dim
+        return scores
+
+    def _top_k(self, q, scores, top_k, rows=None):
+        k = min(top_k, scores.shape[-1])
+        if k <= 0:
+            return []
+        if self.rescore:
+            # Re-rank the best candidates on the full-precision vectors
+            n = min(scores.shape[-1], max(k, math.ceil(k * self.oversampling)))
+            candidates = np.argpartition(-scores, n - 1)[:n]
+            # Sorted, so the memory-mapped rows are read in file order
+            ids = np.sort(candidates if rows is None else rows[candidates])
+            exact = np.asarray(self.originals[ids]) @ q
+            idx = ids[np.argsort(-exact)[:k]]
+            return [self.payloads[i] for i in idx]
+        idx = np.argpartition(-scores, k - 1)[:k]
+        idx = idx[np.argsort(-scores[idx])]
+        if rows is not None:
+            idx = rows[idx]
+        return [self.payloads[i] for i in idx]
+
+    def search(self, query_vector, top_k=1, constraints=None):
+        q = np.asarray(query_vector, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+        mask = self.columns.mask(constraints)
+        if mask is None:
+            return self._top_k(q, self._scores(q), top_k)
+        # Only score the eligible rows
+        rows = np.flatnonzero(mask)
+        return self._top_k(q, self._scores(q, rows), top_k, rows)
+
+    def search_batch(self, query_vectors, top_k=1, constraints=None):
+        """Score all queries with one matrix product (one at a time when quantized).
+
+        constraints is None or a list with one entry per query.
+        """
+        Q = np.asarray(query_vectors, dtype=np.float32)
+        Q = Q / np.maximum(np.linalg.norm(Q, axis=1, keepdims=True), 1e-12)
+        constraints = constraints or [None] * len(Q)
+        if self.codes is not None:
+            return [self.search(q, top_k, c) for q, c in zip(Q, constraints)]
+        scores = Q @ self.matrix.T
+        results = []
+        for q, row, c in zip(Q, scores, constraints):
+            mask = self.columns.mask(c)
+            if mask is None:
+                results.append(self._top_k(q, row, top_k))
+            else:
+                rows = np.flatnonzero(mask)
+                results.append(self._top_k(q, row[rows], top_k, rows))
+        return results
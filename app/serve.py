@@ -0,0 +1,30 @@
+"""Production launcher: serves app.async_app with several Hypercorn worker processes.
+
+    python -m app.serve
+
+WEB_CONCURRENCY sets the number of workers and PORT the listen port. Metrics from
+all workers are aggregated through PROMETHEUS_MULTIPROC_DIR.
+"""
+import os
+import sys
+import shutil
+import tempfile
+
+
+def main():
+    workers = os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1))
+    port = os.getenv("PORT", "5000")
+
+    # Every worker writes its metrics here; start from an empty directory so stale PIDs don't linger
+    multiproc_dir = os.environ.setdefault(
+        "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "babyfood_prometheus")
+    )
+    shutil.rmtree(multiproc_dir, ignore_errors=True)
+    os.makedirs(multiproc_dir, exist_ok=True)
+
+    args = ["hypercorn", "app.async_app:app", "--bind", f"0.0.0.0:{port}", "--workers", workers]
+    os.execvp(sys.executable, [sys.executable, "-m", *args])
+
+
+if __name__ == "__main__":
+    main()
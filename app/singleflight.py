@@ -0,0 +1,102 @@
+import asyncio
+import hashlib
+import threading
+
+from app.metrics import SINGLE_FLIGHT_CALLS, SINGLE_FLIGHT_IN_FLIGHT
+
+
+def prompt_key(*parts):
+    """Compact key for a prompt (and whatever else selects the completion, e.g. the model)."""
+    return hashlib.sha1("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key in this process into one.
+
+    The first caller runs fn; callers arriving while it is in flight wait for it and get
+    the same result, or the same exception. Nothing is kept once the call has finished.
+    A waiter with a deadline stops waiting when its own deadline runs out, even if the
+    call it joined was started with a longer one.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn, *args, deadline=None):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                SINGLE_FLIGHT_IN_FLIGHT.labels(self.name).inc()
+
+        if not leader:
+            SINGLE_FLIGHT_CALLS.labels(self.name, "coalesced").inc()
+            if not call.done.wait(deadline.remaining() if deadline is not None else None):
+                raise deadline.exceeded("single_flight")
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        SINGLE_FLIGHT_CALLS.labels(self.name, "executed").inc()
+        try:
+            call.result = fn(*args)
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                SINGLE_FLIGHT_IN_FLIGHT.labels(self.name).dec()
+            call.done.set()
+
+
+class AsyncSingleFlight:
+    """asyncio counterpart of SingleFlight, for one event loop.
+
+    The shared call runs as its own task, so a caller that is cancelled (e.g. the client
+    went away) doesn't cancel it for the others.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._tasks = {}
+
+    def _finished(self, key, task):
+        # Mark the error as retrieved even when every caller was cancelled before it arrived
+        if not task.cancelled():
+            task.exception()
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+            SINGLE_FLIGHT_IN_FLIGHT.labels(self.name).dec()
+
+    async def do(self, key, fn, *args, deadline=None):
+        task = self._tasks.get(key)
+        if task is not None:
+            SINGLE_FLIGHT_CALLS.labels(self.name, "coalesced").inc()
+        else:
+            SINGLE_FLIGHT_CALLS.labels(self.name, "executed").inc()
+            SINGLE_FLIGHT_IN_FLIGHT.labels(self.name).inc()
+            task = self._tasks[key] = asyncio.ensure_future(fn(*args))
+            task.add_done_callback(lambda t: self._finished(key, t))
+        if deadline is None:
+            return await asyncio.shield(task)
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), deadline.remaining())
+        except asyncio.TimeoutError:
+            if task.done():
+                # The shared call itself timed out; pass its own error on
+                raise
+            raise deadline.exceeded("single_flight") from None
@@ -0,0 +1,206 @@
+import os
+import time
+import uuid
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime, timezone
+
+from psycopg2.extras import execute_values
+from prometheus_client import Gauge, Histogram, Counter
+
+from app.db import pooled_connection
+from app.metrics import DB_WRITE_LATENCY, track_latency
+
+WRITE_QUEUE_DEPTH = Gauge("db_write_queue_depth", "Records waiting to be written to Postgres",
+                          multiprocess_mode="livesum")
+WRITE_FLUSH_LATENCY = Histogram("db_write_flush_latency_seconds", "Time to write one batch to Postgres")
+WRITE_FLUSH_SIZE = Histogram("db_write_flush_size", "Records per flushed batch", buckets=(1, 5, 10, 25, 50, 100, 250, 500))
+WRITE_FLUSH_RETRIES = Counter("db_write_flush_retries_total", "Batch writes that were retried")
+WRITE_DROPPED = Counter("db_write_dropped_total",
+                        "Records not written: queue full, retries exhausted or feedback for an unknown conversation",
+                        ["table", "reason"])
+
+BATCH_SIZE = int(os.getenv("DB_WRITE_BATCH_SIZE", 100))
+FLUSH_INTERVAL = float(os.getenv("DB_WRITE_FLUSH_INTERVAL", 1.0))
+MAX_RETRIES = int(os.getenv("DB_WRITE_MAX_RETRIES", 3))
+QUEUE_MAX_SIZE = int(os.getenv("DB_WRITE_QUEUE_MAX", 10000))
+
+
+def write_batch(conversations, feedback):
+    """Write one batch in a single transaction; conversations first so feedback foreign keys resolve.
+
+    Returns the number of feedback rows skipped because their conversation doesn't exist.
+    """
+    skipped = 0
+    with track_latency(DB_WRITE_LATENCY, "write_batch"), pooled_connection() as conn:
+        with conn.cursor() as cur:
+            if conversations:
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO conversations (id, question, answer, created_at)
+                    VALUES %s
+                    ON CONFLICT (id) DO NOTHING;
+                    """,
+                    conversations
+                )
+            if feedback:
+                # Feedback for unknown conversations would abort the whole batch, so it is skipped instead
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO feedback (conversation_id, feedback, created_at)
+                    SELECT v.conversation_id::uuid, v.feedback, v.created_at::timestamp
+                    FROM (VALUES %s) AS v(conversation_id, feedback, created_at)
+                    WHERE EXISTS (SELECT 1 FROM conversations c WHERE c.id = v.conversation_id::uuid);
+                    """,
+                    feedback,
+                    page_size=len(feedback)  # one statement, so rowcount covers every row
+                )
+                skipped = len(feedback) - cur.rowcount
+        conn.commit()
+    return skipped
+
+
+class WriteBehindQueue:
+    """Buffers conversation/feedback records in memory and writes them in batches from a background thread.
+
+    A batch is flushed once BATCH_SIZE records are queued or FLUSH_INTERVAL seconds
+    have passed. Records keep their enqueue order, and within a batch conversations
+    are inserted before feedback, so a feedback row never precedes its conversation.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE, flush_interval=FLUSH_INTERVAL, max_retries=MAX_RETRIES,
+                 maxsize=QUEUE_MAX_SIZE, writer=write_batch):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.writer = writer
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        # The worker thread does not survive a fork, so each process starts its own
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is None or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+                self._thread.start()
+
+    def put(self, table, row):
+        """Queue a record without blocking; returns False (and counts a drop) when the queue is full."""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((table, row))
+        except queue.Full:
+            WRITE_DROPPED.labels(table, "queue_full").inc()
+            logging.warning(f"Write-behind queue full, dropping a {table} record")
+            return False
+        WRITE_QUEUE_DEPTH.set(self._queue.qsize())
+        return True
+
+    def _next_batch(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._flush(batch)
+        self._drain()
+
+    def _drain(self):
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+        if batch:
+            self._flush(batch)
+
+    def _flush(self, batch):
+        conversations = [row for table, row in batch if table == "conversations"]
+        feedback = [row for table, row in batch if table == "feedback"]
+        start = time.time()
+        for attempt in range(self.max_retries + 1):
+            try:
+                skipped = self.writer(conversations, feedback)
+                if skipped:
+                    logging.warning(f"Skipped {skipped} feedback records for unknown conversations")
+                    WRITE_DROPPED.labels("feedback", "unknown_conversation").inc(skipped)
+                break
+            except Exception as e:
+                if attempt == self.max_retries:
+                    logging.error(f"Dropping batch of {len(batch)} records after {attempt + 1} attempts: {e}")
+                    WRITE_DROPPED.labels("conversations", "retries_exhausted").inc(len(conversations))
+                    WRITE_DROPPED.labels("feedback", "retries_exhausted").inc(len(feedback))
+                    break
+                WRITE_FLUSH_RETRIES.inc()
+                logging.warning(f"Batch write failed (attempt {attempt + 1}), retrying: {e}")
+                time.sleep(min(0.1 * 2 ** attempt, 5))
+        WRITE_FLUSH_LATENCY.observe(time.time() - start)
+        WRITE_FLUSH_SIZE.observe(len(batch))
+        WRITE_QUEUE_DEPTH.set(self._queue.qsize())
+
+    def close(self, timeout=30):
+        """Stop the worker after writing everything that is still queued."""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+
+_writer = WriteBehindQueue()
+atexit.register(_writer.close)
+
+
+def enqueue_conversation(conversation_id, question, answer, timestamp=None):
+    """Queue a conversation record for a batched insert."""
+    _writer.put("conversations", (conversation_id, question, answer, timestamp or datetime.now(timezone.utc)))
+
+
+def parse_conversation_id(value):
+    """Canonical form of a conversation id; raises ValueError unless it is a UUID string."""
+    if not isinstance(value, str):
+        raise ValueError("conversation_id must be a UUID")
+    try:
+        return str(uuid.UUID(value))
+    except ValueError:
+        raise ValueError("conversation_id must be a UUID") from None
+
+
+def enqueue_feedback(conversation_id, feedback, timestamp=None):
+    """Queue a feedback record for a batched insert; raises ValueError for a malformed conversation_id.
+
+    Validated here because one bad id would make the ::uuid cast fail the whole batch.
+    """
+    conversation_id = parse_conversation_id(conversation_id)
+    _writer.put("feedback", (conversation_id, feedback, timestamp or datetime.now(timezone.utc)))
+
+
+def flush_writes(timeout=30):
+    """Write out everything queued so far and stop the worker (used on shutdown)."""
+    _writer.close(timeout)
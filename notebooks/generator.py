@@ -1,6 +1,29 @@
-import pandas as pd
+"""Synthetic baby-recipe corpus generator, from the curated 500 rows up to millions for scale tests.
+
+    python notebooks/generator.py                                   # 500 recipes -> data/baby_recipes_500.csv
+    python notebooks/generator.py --rows 1000000 --output data/synthetic/recipes.csv \
+        --ground-truth data/synthetic/ground-truth.csv --questions-per-recipe 2 --ground-truth-fraction 0.01
+    python notebooks/generator.py --rows 10000000 --output data/synthetic/recipes.parquet --chunk-size 200000
+
+Rows are produced lazily and written in chunks (CSV with ';' or Parquet row groups, which
+needs pyarrow), so memory stays flat whatever --rows is. The same --seed always gives the
+same corpus. The first rows are the curated bases and their variants, as before; past
+those, every recipe is a base with random ingredient swaps plus three extra ingredients,
+a label and a suffix. Rows are numbered through a seeded permutation of all
+(base, label, suffix, extras) combinations, so dish names and ingredient lists never
+repeat: up to RANDOM_CAPACITY random rows. Ground-truth questions name the dish, so each
+one points at exactly one recipe. By default the columns match the cleaned CSV the app
+indexes (id;dish_name;...); --raw-headers writes the original "Dish Name;..." layout.
+"""
+import os
+import re
+import csv
+import math
 import random
-from itertools import product
+import argparse
+from functools import lru_cache
+from itertools import islice, combinations
+
 
 # -------------------- Curated recipe bases (realistic) --------------------
 # These reflect common baby/toddler recipes seen across NHS/BBC Good Food/parenting sites.
@@ -126,109 +149,151 @@ ALLERGEN_WORDS = {
     "Soy": ["soy", "soy sauce", "tofu"],
 }
 
+
+# Keyword groups used for tagging, timing, calories and instructions
+TAG_GROUPS = {
+    **{f"allergen:{tag}": words for tag, words in ALLERGEN_WORDS.items()},
+    **{f"iron:{kind}": words for kind, words in IRON_SOURCES.items()},
+    "grain": ["rice", "pasta", "quinoa", "couscous", "arborio"],
+    "cooked_grain": ["rice", "pasta", "arborio", "couscous", "oats"],
+    "protein": IRON_SOURCES["meat_fish"] + ["tofu"],
+    "dairy": ["cheese", "milk", "yogurt", "butter", "coconut milk"],
+    "carbs": ["rice", "pasta", "oats", "quinoa", "couscous", "potato", "sweet potato", "bread", "waffles", "pancakes"],
+    "pulses": ["lentils", "chickpeas", "beans"],
+    "meat": ["chicken", "turkey", "beef", "lamb"],
+    "fish": ["salmon", "cod", "white fish", "fish"],
+}
+
+
+class KeywordMatcher:
+    """Finds which keyword groups occur in a text, with one precompiled regex pass.
+
+    Same result as `any(k in text for k in words)` per group: the lookahead reports a match
+    at every position, and each keyword also carries the groups of keywords that are its
+    prefixes, since those match at the same position.
+    """
+
+    def __init__(self, groups):
+        owners = {}
+        for group, words in groups.items():
+            for word in words:
+                owners.setdefault(word, set()).add(group)
+        self.groups = {word: frozenset().union(*(owners[w] for w in owners if word.startswith(w)))
+                       for word in owners}
+        alternation = "|".join(re.escape(w) for w in sorted(owners, key=len, reverse=True))
+        self.pattern = re.compile(f"(?=({alternation}))")
+
+    def match(self, text):
+        found = set()
+        for word in self.pattern.findall(text):
+            found |= self.groups[word]
+        return frozenset(found)
+
+
+MATCHER = KeywordMatcher(TAG_GROUPS)
+
+
+@lru_cache(maxsize=4096)
+def features(ingredients):
+    """Keyword groups found in a tuple of ingredients; curated lists come up again and again."""
+    return MATCHER.match(" ".join(ingredients).lower())
+
+
 def get_allergens(ingredients):
-    ing = " ".join(ingredients).lower()
-    tags = []
-    for tag, keywords in ALLERGEN_WORDS.items():
-        if any(k in ing for k in keywords):
-            tags.append(tag)
-    return "None" if not tags else ",".join(sorted(set(tags)))
+    tags = sorted(g.split(":", 1)[1] for g in features(tuple(ingredients)) if g.startswith("allergen:"))
+    return "None" if not tags else ",".join(tags)
+
 
 def iron_rich(ingredients):
-    ing = " ".join(ingredients).lower()
-    for k in IRON_SOURCES:
-        if any(s in ing for s in IRON_SOURCES[k]):
-            return "Yes"
-    return "No"
+    return "Yes" if any(g.startswith("iron:") for g in features(tuple(ingredients))) else "No"
+
 
 def time_and_calories(ingredients, texture, meal_type):
-    ing = " ".join(ingredients).lower()
+    found = features(tuple(ingredients))
     # Time baseline
     t = {"Purée": 15, "Mash": 20, "Finger Food": 25, "Soft Pieces": 20}[texture]
-    if any(p in ing for p in IRON_SOURCES["meat_fish"]):
+    if "iron:meat_fish" in found:
         t += 5
-    if any(g in ing for g in ["rice", "pasta", "quinoa", "couscous", "arborio"]):
+    if "grain" in found:
         t += 5
     t = max(5, min(60, t))
     # Calories baseline
     cals = 90 if meal_type in ["Breakfast", "Snack"] else 150
-    if any(p in ing for p in IRON_SOURCES["meat_fish"] + ["tofu"]):
+    if "protein" in found:
         cals += 40
-    if any(d in ing for d in ["cheese", "milk", "yogurt", "butter", "coconut milk"]):
+    if "dairy" in found:
         cals += 40
-    if any(c in ing for c in ["rice", "pasta", "oats", "quinoa", "couscous", "potato", "sweet potato", "bread", "waffles", "pancakes"]):
+    if "carbs" in found:
         cals += 30
     return t, min(300, cals)
 
+
+TEXTURE_STEPS = {
+    "Purée": "Blend with a splash of cooking water or breastmilk/formula until smooth.",
+    "Mash": "Drain and mash to a soft, lumpy texture that holds together.",
+    "Finger Food": "Shape into small patties/strips and cook on low heat or bake until set and soft inside.",
+    "Soft Pieces": "Chop into pea-sized pieces and cook until very tender; pieces should squash between fingers.",
+}
+
+
 def build_instructions(ingredients, texture):
-    ing_list = ", ".join(ingredients)
-    steps = []
-    steps.append(f"Wash and prep ingredients: {ing_list}.")
-    lower = " ".join(ingredients).lower()
-    if any(x in lower for x in ["rice", "pasta", "arborio", "couscous", "oats"]):
+    found = features(tuple(ingredients))
+    steps = [f"Wash and prep ingredients: {', '.join(ingredients)}."]
+    if "cooked_grain" in found:
         steps.append("Cook grains in plenty of water or milk (no added salt) until very soft.")
-    if any(x in lower for x in ["lentils", "chickpeas", "beans"]):
+    if "pulses" in found:
         steps.append("Rinse pulses; simmer until tender and skins split easily.")
-    if any(x in lower for x in ["chicken", "turkey", "beef", "lamb"]):
+    if "meat" in found:
         steps.append("Dice meat small and simmer/steam until fully cooked through (juices run clear).")
-    if any(x in lower for x in ["salmon", "cod", "white fish", "fish"]):
+    if "fish" in found:
         steps.append("Steam fish until it flakes; carefully remove any bones.")
     steps.append("Steam or gently simmer vegetables/fruit until fork-tender.")
-    if texture == "Purée":
-        steps.append("Blend with a splash of cooking water or breastmilk/formula until smooth.")
-    elif texture == "Mash":
-        steps.append("Drain and mash to a soft, lumpy texture that holds together.")
-    elif texture == "Finger Food":
-        steps.append("Shape into small patties/strips and cook on low heat or bake until set and soft inside.")
-    elif texture == "Soft Pieces":
-        steps.append("Chop into pea-sized pieces and cook until very tender; pieces should squash between fingers.")
+    if texture in TEXTURE_STEPS:
+        steps.append(TEXTURE_STEPS[texture])
     steps.append("Cool before serving. Store in the fridge up to 2 days or freeze portions up to 1 month.")
     return " ".join(steps)
 
+
 def difficulty_by_time(t):
     return "Easy" if t <= 20 else "Medium"
 
-# Add a single row per named dish to avoid duplicates
-def add_named_recipe(rows, seen_names, name, age, texture, meal_type, ingredients):
-    if name in seen_names:
-        return
-    allergens = get_allergens(ingredients)
-    iron = iron_rich(ingredients)
+
+COLUMNS = ["id", "dish_name", "baby_age", "iron_rich", "allergen", "ingredients", "cooking_time", "recipe",
+           "texture", "meal_type", "calories", "preparation_difficulty"]
+RAW_COLUMNS = ["Dish Name", "Baby Age", "Iron-Rich", "Allergen", "Ingredients", "Cooking Time (mins)",
+               "Recipe", "Texture", "Meal Type", "Calories (approx)", "Preparation Difficulty"]
+
+
+@lru_cache(maxsize=4096)
+def _derived(ingredients, texture, meal_type):
     t, cal = time_and_calories(ingredients, texture, meal_type)
-    instr = build_instructions(ingredients, texture)
-    rows.append([
-        name, age, iron, allergens, ", ".join(ingredients),
-        t, instr, texture, meal_type, cal, difficulty_by_time(t)
-    ])
-    seen_names.add(name)
-
-# Seed with one canonical row per base item
-rows, seen = [], set()
-for g in STAGES.values():
-    for (name, ing) in g["items"]:
-        # pick the first sensible (age, meal) combo to create a single canonical entry
-        add_named_recipe(rows, seen, name, g["ages"][0], g["texture"], g["meals"][0], ing)
-
-# Build realistic variants (ingredient swaps + name update)
-def smart_variant(base_name, base_ing, texture, ages, meals, swaps, label=None):
+    return (iron_rich(ingredients), get_allergens(ingredients), ", ".join(ingredients), t,
+            build_instructions(ingredients, texture), cal, difficulty_by_time(t))
+
+
+def make_recipe(name, age, texture, meal_type, ingredients):
+    """One row (without id), in RAW_COLUMNS order."""
+    iron, allergens, ingredient_text, t, instructions, cal, difficulty = _derived(tuple(ingredients), texture,
+                                                                                  meal_type)
+    return [name, age, iron, allergens, ingredient_text, t, instructions, texture, meal_type, cal, difficulty]
+
+
+def smart_variant(base_name, base_ing, swaps, label=None):
+    """Apply ingredient swaps and name the dish after the swapped ingredient (or the label)."""
     new_ing = []
     for item in base_ing:
-        repl = item
         l = item.lower()
         for old, new in swaps:
             if old in l:
                 l = l.replace(old, new)
         new_ing.append(l)
-    # craft a name reflecting the key swapped ingredient if present
     new_name = base_name
     for old, new in swaps:
         new_name = new_name.replace(old.title(), new.title()).replace(old, new.title())
     if new_name == base_name and label:
         new_name = f"{base_name} ({label})"
-    # choose sensible (age, meal)
-    age = ages[min(0, 0)]
-    meal = meals[min(0, 0)]
-    return new_name, new_ing, age, meal, texture
+    return new_name, new_ing
+
 
 veg_swaps = [("carrot","parsnip"),("zucchini","courgette"),("pumpkin","butternut squash"),
              ("broccoli","cauliflower"),("spinach","kale"),("peas","sweetcorn")]
@@ -236,48 +301,257 @@ protein_swaps = [("chicken","turkey"),("beef","lamb"),("salmon","cod"),("white f
 grain_swaps = [("rice","quinoa"),("pasta","small pasta"),("couscous","millet")]
 
 labels = ["Family Style","Toddler Favorite","Hidden Veg","Freezer-Friendly","Mild Curry","One-Pot"]
+safe_suffixes = ["No-Salt", "Extra Soft", "Olive Oil Drizzle", "Steamed", "Baked", "Slow Simmered"]
+
+# Three of these are added to every random recipe; which three is what keeps rows distinct
+EXTRA_INGREDIENTS = [
+    "kale", "spinach", "parsnip", "beetroot", "cauliflower", "green beans", "butternut squash", "sweetcorn",
+    "leek", "red pepper", "mushroom", "tomato", "courgette", "celery", "swede", "apple", "pear", "mango",
+    "blueberries", "raspberries", "peach", "apricot", "plum", "prunes", "banana", "thyme", "basil", "parsley",
+    "dill", "mint", "cinnamon", "nutmeg", "cumin", "mild paprika", "ginger", "garlic", "coriander", "oregano",
+    "olive oil", "unsalted butter", "chia seeds", "ground flaxseed", "hemp seeds", "plain yogurt",
+    "grated cheese", "ricotta", "hummus", "smooth peanut butter",
+]
+EXTRAS_PER_RECIPE = 3
+
+PROTEIN_WORDS = ["chicken","turkey","beef","lamb","salmon","cod","fish","tofu"]
+GRAIN_WORDS = ["rice","pasta","couscous"]
+
+
+def _swap_options(rng, ing):
+    text = " ".join(ing).lower()
+    return [
+        [rng.choice(veg_swaps)],
+        [rng.choice(protein_swaps)] if any(p in text for p in PROTEIN_WORDS) else [],
+        [rng.choice(grain_swaps)] if any(p in text for p in GRAIN_WORDS) else [],
+    ]
+
 
-def expand_from_bases(target_count=500):
-    global rows, seen
-    # generate variants for each group
-    for key, g in STAGES.items():
-        for (name, ing) in g["items"]:
-            # make a handful of safe variants
-            for swaps in [
-                [random.choice(veg_swaps)],
-                [random.choice(protein_swaps)] if any(p in " ".join(ing).lower() for p in ["chicken","turkey","beef","lamb","salmon","cod","fish","tofu"]) else [],
-                [random.choice(grain_swaps)] if any(p in " ".join(ing).lower() for p in ["rice","pasta","couscous"] ) else [],
-            ]:
+def curated_recipes(rng, max_fill=10000):
+    """The curated corpus: one row per base, its swap/label variants, then suffixed variants.
+
+    Dish names are unique; stops after max_fill attempts at suffixed variants.
+    """
+    seen = set()
+
+    def named(name, *rest):
+        if name in seen:
+            return None
+        seen.add(name)
+        return make_recipe(name, *rest)
+
+    # Seed with one canonical row per base item
+    for g in STAGES.values():
+        for name, ing in g["items"]:
+            row = named(name, g["ages"][0], g["texture"], g["meals"][0], ing)
+            if row is not None:
+                yield row
+
+    # Build realistic variants (ingredient swaps + name update)
+    for g in STAGES.values():
+        for name, ing in g["items"]:
+            for swaps in _swap_options(rng, ing):
                 if not swaps:
                     continue
-                new_name, new_ing, age, meal, texture = smart_variant(name, ing, g["texture"], g["ages"], g["meals"], swaps, random.choice(labels))
-                add_named_recipe(rows, seen, new_name, g["ages"][0], g["texture"], g["meals"][0], new_ing)
+                new_name, new_ing = smart_variant(name, ing, swaps, rng.choice(labels))
+                row = named(new_name, g["ages"][0], g["texture"], g["meals"][0], new_ing)
+                if row is not None:
+                    yield row
             # labeled variant without ingredient change
-            labeled = f"{name} ({random.choice(labels)})"
-            add_named_recipe(rows, seen, labeled, g["ages"][-1], g["texture"], g["meals"][-1], ing)
-
-    # If we still need more, create extra descriptive variants safely
-    safe_suffixes = ["No-Salt", "Extra Soft", "Olive Oil Drizzle", "Steamed", "Baked", "Slow Simmered"]
-    i = 0
-    base_list = [(k, item, g) for k, g in STAGES.items() for item in g["items"]]
-    while len(rows) < target_count and i < 10000:
-        i += 1
-        k, (name, ing), g = random.choice(base_list)
-        suffix = random.choice(safe_suffixes)
-        new_name = f"{name} ({suffix})"
-        if new_name in seen:
-            continue
-        add_named_recipe(rows, seen, new_name, random.choice(g["ages"]), g["texture"], random.choice(g["meals"]), ing)
-
-expand_from_bases(target_count=500)
-
-# Ensure exactly 500 unique dish names
-df = pd.DataFrame(rows, columns=[
-    "Dish Name","Baby Age","Iron-Rich","Allergen","Ingredients","Cooking Time (mins)",
-    "Recipe","Texture","Meal Type","Calories (approx)","Preparation Difficulty"
-]).drop_duplicates(subset=["Dish Name"]).head(500)
-
-# Save CSV with semicolon separator
-out_path = "../data/baby_recipes_500.csv"
-df.to_csv(out_path, sep=";", index=False)
-print(f"Created {len(df)} recipes -> {out_path}")
+            row = named(f"{name} ({rng.choice(labels)})", g["ages"][-1], g["texture"], g["meals"][-1], ing)
+            if row is not None:
+                yield row
+
+    # Extra descriptive variants
+    base_list = [(item, g) for g in STAGES.values() for item in g["items"]]
+    for _ in range(max_fill):
+        (name, ing), g = rng.choice(base_list)
+        row = named(f"{name} ({rng.choice(safe_suffixes)})", rng.choice(g["ages"]), g["texture"],
+                    rng.choice(g["meals"]), ing)
+        if row is not None:
+            yield row
+
+
+BASE_LIST = [(item, g) for g in STAGES.values() for item in g["items"]]
+EXTRA_COMBINATIONS = list(combinations(EXTRA_INGREDIENTS, EXTRAS_PER_RECIPE))
+RANDOM_CAPACITY = len(BASE_LIST) * len(labels) * len(safe_suffixes) * len(EXTRA_COMBINATIONS)
+
+
+def _permutation(rng, size):
+    """A seeded bijection on range(size): i -> (a * i + c) % size with a coprime to size."""
+    a = rng.randrange(1, size)
+    while math.gcd(a, size) != 1:
+        a = rng.randrange(1, size)
+    c = rng.randrange(size)
+    return lambda i: (a * i + c) % size
+
+
+def _with_extras(name, extras):
+    joined = f"{', '.join(extras[:-1])} & {extras[-1]}"
+    return f"{name}, {joined}" if " with " in name else f"{name} with {joined}"
+
+
+def random_recipes(rng):
+    """Random variants of the bases, all distinct: the n-th row gets the n-th (permuted) combination
+    of base, label, suffix and extra ingredients; swaps, age and meal type are drawn at random.
+
+    The extras, label and suffix are part of the dish name, so names (and ingredient lists)
+    never repeat, and they can't clash with curated names, which have at most one label.
+    """
+    permute = _permutation(rng, RANDOM_CAPACITY)
+    for n in range(RANDOM_CAPACITY):
+        key = permute(n)
+        key, base = divmod(key, len(BASE_LIST))
+        key, label = divmod(key, len(labels))
+        combination, suffix = divmod(key, len(safe_suffixes))
+        extras = list(EXTRA_COMBINATIONS[combination])
+        rng.shuffle(extras)
+
+        (name, ing), g = BASE_LIST[base]
+        swaps = [s[0] for s in _swap_options(rng, ing) if s and rng.random() < 0.5]
+        new_name, new_ing = smart_variant(name, ing, swaps)
+        new_name = f"{_with_extras(new_name, extras)} ({labels[label]}, {safe_suffixes[suffix]})"
+        new_ing += [e for e in extras if e not in new_ing]
+        yield make_recipe(new_name, rng.choice(g["ages"]), g["texture"], rng.choice(g["meals"]), new_ing)
+
+
+def generate_recipes(rows, seed=42):
+    """The first `rows` recipes (without ids) for this seed: curated ones first, then random variants."""
+    if rows > RANDOM_CAPACITY:
+        raise ValueError(f"At most {RANDOM_CAPACITY:,} distinct random recipes can be generated")
+    rng = random.Random(seed)
+
+    def stream():
+        yield from curated_recipes(rng)
+        yield from random_recipes(rng)
+
+    return islice(stream(), rows)
+
+
+# Ground-truth questions, filled from a recipe row. Each one names the dish, as dish names
+# are unique while ages, meals and ingredients are shared by many recipes.
+QUESTION_TEMPLATES = [
+    "How do I make {dish}?",
+    "How long does {dish} take to cook?",
+    "What goes into {dish} besides {ingredient}?",
+    "Can I give {dish} to my {age} old?",
+    "How do I get {dish} to a {texture} texture?",
+    "Is {dish} a good {meal} with {ingredient2}?",
+]
+IRON_TEMPLATE = "Is {dish} a good iron-rich {meal} for my {age} old?"
+
+
+def ground_truth_questions(recipe_id, row, rng, count):
+    """`count` template questions that should retrieve this recipe, and only this one."""
+    name, age, iron, _, ingredient_text, _, _, texture, meal_type = row[:9]
+    ingredients = ingredient_text.split(", ")
+    values = {
+        "dish": name,
+        "age": age.split(" ")[0].split("-")[0] + " month" if "month" in age else age,
+        "texture": texture.lower(),
+        "meal": meal_type.lower(),
+        "ingredient": ingredients[0],
+        "ingredient2": ingredients[1] if len(ingredients) > 1 else ingredients[0],
+    }
+    templates = QUESTION_TEMPLATES + ([IRON_TEMPLATE] if iron == "Yes" else [])
+    return [(recipe_id, t.format(**values)) for t in rng.sample(templates, min(count, len(templates)))]
+
+
+class ChunkWriter:
+    """Appends lists of rows to a ';'-separated CSV or, for .parquet paths, as Parquet row groups."""
+
+    def __init__(self, path, columns, sep=";"):
+        self.path = path
+        self.columns = columns
+        self.parquet = path.endswith(".parquet")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if self.parquet:
+            try:
+                import pyarrow.parquet  # noqa: F401
+            except ImportError:
+                raise SystemExit("Writing Parquet needs pyarrow (pip install pyarrow)")
+            self._writer = None
+        else:
+            self._file = open(path, "w", newline="", encoding="utf-8")
+            self._writer = csv.writer(self._file, delimiter=sep)
+            self._writer.writerow(columns)
+
+    def write(self, rows):
+        if not self.parquet:
+            self._writer.writerows(rows)
+            return
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pydict({c: list(v) for c, v in zip(self.columns, zip(*rows))})
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, table.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self.parquet:
+            if self._writer is not None:
+                self._writer.close()
+        else:
+            self._file.close()
+
+
+def write_corpus(output, rows, seed=42, chunk_size=50000, raw_headers=False, ground_truth=None,
+                 questions_per_recipe=5, ground_truth_fraction=1.0):
+    """Stream `rows` recipes to output (and questions to ground_truth) chunk by chunk; returns the counts."""
+    recipes = ChunkWriter(output, RAW_COLUMNS if raw_headers else COLUMNS)
+    questions = ChunkWriter(ground_truth, ["id", "question"], sep=",") if ground_truth else None
+    # Separate stream, so the corpus is the same with or without ground truth
+    question_rng = random.Random(seed + 1)
+    written = asked = 0
+    source = generate_recipes(rows, seed)
+    try:
+        while True:
+            chunk = list(islice(source, chunk_size))
+            if not chunk:
+                break
+            ids = range(written + 1, written + len(chunk) + 1)
+            recipes.write(chunk if raw_headers else [[i, *row] for i, row in zip(ids, chunk)])
+            if questions is not None:
+                pairs = [q for i, row in zip(ids, chunk) if question_rng.random() < ground_truth_fraction
+                         for q in ground_truth_questions(i, row, question_rng, questions_per_recipe)]
+                questions.write(pairs)
+                asked += len(pairs)
+            written += len(chunk)
+            print(f"{written:,} recipes written", end="\r", flush=True)
+    finally:
+        recipes.close()
+        if questions is not None:
+            questions.close()
+    return written, asked
+
+
+def main():
+    data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data")
+    parser = argparse.ArgumentParser(description="Generate a synthetic baby-recipe corpus.")
+    parser.add_argument("--rows", type=int, default=500, help="number of recipes")
+    parser.add_argument("--output", default=os.path.join(data_dir, "baby_recipes_500.csv"),
+                        help="recipes file; .parquet writes Parquet, anything else ';'-separated CSV")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=50000, help="rows generated and written at a time")
+    parser.add_argument("--raw-headers", action="store_true",
+                        help="original 'Dish Name;...' columns without ids instead of the cleaned layout")
+    parser.add_argument("--ground-truth", default=None, help="also write id,question pairs to this file")
+    parser.add_argument("--questions-per-recipe", type=int, default=5)
+    parser.add_argument("--ground-truth-fraction", type=float, default=1.0,
+                        help="share of recipes that get questions, to keep large ground-truth sets manageable")
+    args = parser.parse_args()
+    if args.ground_truth and args.raw_headers:
+        parser.error("--ground-truth needs recipe ids, which --raw-headers leaves out")
+
+    written, asked = write_corpus(args.output, args.rows, seed=args.seed, chunk_size=args.chunk_size,
+                                  raw_headers=args.raw_headers, ground_truth=args.ground_truth,
+                                  questions_per_recipe=args.questions_per_recipe,
+                                  ground_truth_fraction=args.ground_truth_fraction)
+    print(f"\nCreated {written:,} recipes -> {args.output}")
+    if args.ground_truth:
+        print(f"Created {asked:,} ground-truth questions -> {args.ground_truth}")
+
+
+if __name__ == "__main__":
+    main()